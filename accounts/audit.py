@@ -0,0 +1,217 @@
+"""
+Buffered audit log writer.
+
+``log_event(request, ...)`` replaces direct ``AuditLog.objects.create``
+calls. It fills in the user, IP address and user agent from the request and
+hands the entry to a per-process ``AuditBuffer``.
+
+Buffering is opt-in: with ``AUDIT_BUFFER_SIZE = 1`` (the default) every
+event is saved immediately in the caller's transaction, as before. With a
+larger size, an entry joins the buffer only once the caller's transaction
+commits, so rolled-back requests leave no audit rows. It is appended to a
+spool file first, and a background flush thread writes the buffer with one
+``bulk_create`` on its own connection once ``AUDIT_BUFFER_SIZE`` entries
+have accumulated or every ``AUDIT_FLUSH_SECONDS``. Request threads never
+flush, so one request's rollback cannot discard another's entries. The
+spool is truncated only after the insert has committed; if the process dies
+before a flush, the spool file survives and ``replay_audit_spool`` loads
+it.
+"""
+import atexit
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT_MAX_LENGTH = 500
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR') or None
+
+
+def make_entry(event_type, description, user=None, ip_address=None, user_agent=None, metadata=None):
+    return AuditLog(
+        id=uuid.uuid4(),
+        user=user,
+        event_type=event_type,
+        description=description,
+        ip_address=ip_address,
+        user_agent=user_agent,
+        metadata=metadata or {},
+        created_at=timezone.now(),
+    )
+
+
+def serialize_entry(entry):
+    return {
+        'id': str(entry.id),
+        'user_id': str(entry.user_id) if entry.user_id else None,
+        'event_type': entry.event_type,
+        'description': entry.description,
+        'ip_address': entry.ip_address,
+        'user_agent': entry.user_agent,
+        'metadata': entry.metadata,
+        'created_at': entry.created_at.isoformat(),
+    }
+
+
+def deserialize_entry(data):
+    return AuditLog(**{**data, 'created_at': parse_datetime(data['created_at'])})
+
+
+def spool_dir():
+    return Path(settings.AUDIT_SPOOL_DIR)
+
+
+def spool_path(pid=None):
+    return spool_dir() / f'audit-{socket.gethostname()}-{pid or os.getpid()}.jsonl'
+
+
+class AuditBuffer:
+    """Thread-safe in-process buffer flushed by a background thread on size
+    or age."""
+
+    def __init__(self, max_size, max_age):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.entries = []
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.flusher = None
+
+    def add(self, entry):
+        if self.max_size <= 1:
+            entry.save(force_insert=True)
+            return
+        transaction.on_commit(lambda: self.enqueue(entry))
+
+    def enqueue(self, entry):
+        with self.lock:
+            self.spool([entry])
+            self.entries.append(entry)
+            full = len(self.entries) >= self.max_size
+        self.start_flusher()
+        if full:
+            self.wake.set()
+
+    def spool(self, entries):
+        path = spool_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open('a') as spool:
+            for entry in entries:
+                spool.write(json.dumps(serialize_entry(entry)) + '\n')
+            spool.flush()
+
+    def flush(self):
+        """Write buffered entries with one ``bulk_create`` and truncate the
+        spool once it has committed. On failure the entries stay buffered
+        (and spooled) for the next attempt. Called from the flush thread and
+        at exit, never from inside a request's transaction."""
+        with self.lock:
+            if not self.entries:
+                return 0
+            entries = self.entries
+            try:
+                with transaction.atomic():
+                    AuditLog.objects.bulk_create(entries, ignore_conflicts=True)
+            except DatabaseError:
+                logger.exception('Could not flush %d audit log entries; keeping them spooled', len(entries))
+                return 0
+            self.entries = []
+            spool_path().unlink(missing_ok=True)
+            return len(entries)
+
+    def start_flusher(self):
+        with self.lock:
+            if self.flusher is not None and self.flusher.is_alive():
+                return
+            self.flusher = threading.Thread(target=self.run_flusher, name='audit-flush', daemon=True)
+            self.flusher.start()
+
+    def run_flusher(self):
+        while True:
+            self.wake.wait(self.max_age)
+            self.wake.clear()
+            try:
+                self.flush()
+            finally:
+                # This thread holds its own connection; don't keep it open between flushes.
+                connection.close()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = AuditBuffer(settings.AUDIT_BUFFER_SIZE, settings.AUDIT_FLUSH_SECONDS)
+            atexit.register(_buffer.flush)
+        return _buffer
+
+
+def record_event(event_type, description, user=None, ip_address=None, user_agent=None, metadata=None):
+    """Buffer an audit entry that is not tied to a request."""
+    entry = make_entry(event_type, description, user, ip_address, user_agent, metadata)
+    get_buffer().add(entry)
+    return entry
+
+
+def log_event(request, event_type, description, metadata=None, user=None):
+    """Buffer an audit entry for ``request``. ``user`` defaults to the
+    authenticated request user."""
+    if user is None and request.user.is_authenticated:
+        user = request.user
+    return record_event(
+        event_type,
+        description,
+        user=user,
+        ip_address=client_ip(request),
+        user_agent=request.META.get('HTTP_USER_AGENT', '')[:USER_AGENT_MAX_LENGTH],
+        metadata=metadata,
+    )
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def replay_audit_spool(include_live=False):
+    """Load spool files left behind by processes on this host that exited
+    without flushing. Returns ``(files, entries)`` replayed."""
+    prefix = f'audit-{socket.gethostname()}-'
+    files = entries = 0
+    if not spool_dir().exists():
+        return files, entries
+    for path in sorted(spool_dir().glob(f'{prefix}*.jsonl')):
+        pid = int(path.stem[len(prefix):])
+        if pid == os.getpid() or (not include_live and pid_alive(pid)):
+            continue
+        with path.open() as spool:
+            rows = [deserialize_entry(json.loads(line)) for line in spool if line.strip()]
+        AuditLog.objects.bulk_create(rows, ignore_conflicts=True, batch_size=500)
+        path.unlink()
+        files += 1
+        entries += len(rows)
+    return files, entries
@@ -0,0 +1,202 @@
+"""
+AuditLog storage: monthly partitions, retention and archival.
+
+On PostgreSQL ``accounts_audit_log`` is range-partitioned by month on
+``created_at`` (migration 0004), with a default partition catching rows
+outside the monthly ones. ``ensure_partitions`` creates upcoming months
+ahead of time; it runs after every ``migrate`` as well as from
+``archive_audit_log``. If neither has run for a while, that month's rows
+land in the default partition, and a plain ``CREATE TABLE ... PARTITION
+OF`` for the month would then fail, so ``ensure_partitions`` moves those
+rows into the new partition before attaching it. Archiving a month
+detaches and drops its partition instead of deleting row by row. On other databases the table is a plain
+table and archived months are deleted in batches.
+
+Each archived month is streamed to ``audit-log-YYYY-MM.jsonl.gz`` before
+anything is removed.
+"""
+import gzip
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from pathlib import Path
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .audit import serialize_entry
+from .models import AuditLog
+
+TABLE = AuditLog._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+
+@dataclass
+class ArchivedMonth:
+    month: object
+    path: Path
+    rows: int
+    dropped_partition: bool = False
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def month_bounds(month):
+    start = timezone.make_aware(datetime.combine(month.replace(day=1), time.min))
+    return start, timezone.make_aware(datetime.combine(add_months(month, 1), time.min))
+
+
+def partition_name(month):
+    return f'{TABLE}_y{month:%Y}m{month:%m}'
+
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = %s',
+            [TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def monthly_partitions():
+    """Names of the attached monthly partitions."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits i '
+            'JOIN pg_class parent ON parent.oid = i.inhparent '
+            'JOIN pg_class child ON child.oid = i.inhrelid '
+            'WHERE parent.relname = %s',
+            [TABLE]
+        )
+        prefix = f'{TABLE}_y'
+        return {name for name, in cursor.fetchall() if name.startswith(prefix)}
+
+
+def ensure_partitions(months_ahead=3, today=None):
+    """Create monthly partitions from the current month through
+    ``months_ahead`` months ahead, moving any of the month's rows out of the
+    default partition. Returns the names created."""
+    if not is_partitioned():
+        return []
+    this_month = (today or timezone.localdate()).replace(day=1)
+    existing = monthly_partitions()
+    created = []
+    quote = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        for offset in range(months_ahead + 1):
+            month = add_months(this_month, offset)
+            name = partition_name(month)
+            if name in existing:
+                continue
+            start, end = month_bounds(month)
+            # Build the partition beside the table and fill it from the
+            # default partition, so attaching it finds no overlapping rows.
+            cursor.execute(f'CREATE TABLE {quote(name)} (LIKE {quote(TABLE)} INCLUDING DEFAULTS)')
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM {quote(DEFAULT_PARTITION)} '
+                f'WHERE created_at >= %s AND created_at < %s RETURNING *) '
+                f'INSERT INTO {quote(name)} SELECT * FROM moved',
+                [start, end]
+            )
+            cursor.execute(
+                f'ALTER TABLE {quote(TABLE)} ATTACH PARTITION {quote(name)} FOR VALUES FROM (%s) TO (%s)',
+                [start, end]
+            )
+            created.append(name)
+    return created
+
+
+def create_upcoming_partitions(sender, using='default', **kwargs):
+    """``post_migrate`` handler, so deploys keep partitions ahead even if
+    ``archive_audit_log`` stops running."""
+    if using == 'default':
+        ensure_partitions()
+
+
+def archive_path(output_dir, month):
+    path = Path(output_dir) / f'audit-log-{month:%Y-%m}.jsonl.gz'
+    suffix = 1
+    while path.exists():
+        suffix += 1
+        path = Path(output_dir) / f'audit-log-{month:%Y-%m}.{suffix}.jsonl.gz'
+    return path
+
+
+def export_month(month, output_dir, batch_size):
+    """Stream one month of entries to a gzipped JSONL file."""
+    start, end = month_bounds(month)
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    path = archive_path(output_dir, month)
+    partial = path.with_name(path.name + '.partial')
+    rows = 0
+    with gzip.open(partial, 'wt', encoding='utf-8') as archive:
+        entries = AuditLog.objects.filter(
+            created_at__gte=start, created_at__lt=end
+        ).order_by('created_at', 'id').iterator(chunk_size=batch_size)
+        for entry in entries:
+            archive.write(json.dumps(serialize_entry(entry)) + '\n')
+            rows += 1
+    os.replace(partial, path)
+    return path, rows
+
+
+def drop_month(month, batch_size, partitioned):
+    """Remove a month's entries: drop its partition if it has one, then
+    delete anything left (default partition or unpartitioned table) in
+    batches."""
+    dropped = False
+    if partitioned and partition_name(month) in monthly_partitions():
+        quote = connection.ops.quote_name
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(partition_name(month))}')
+            cursor.execute(f'DROP TABLE {quote(partition_name(month))}')
+        dropped = True
+
+    start, end = month_bounds(month)
+    remaining = AuditLog.objects.filter(created_at__gte=start, created_at__lt=end)
+    while True:
+        ids = list(remaining.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        AuditLog.objects.filter(id__in=ids).delete()
+    return dropped
+
+
+def months_to_archive(cutoff, partitioned):
+    months = {
+        day.replace(day=1)
+        for day in AuditLog.objects.filter(created_at__lt=month_bounds(cutoff)[0]).dates('created_at', 'month')
+    }
+    if partitioned:
+        # Empty partitions past retention are dropped too.
+        for name in monthly_partitions():
+            month = datetime.strptime(name[len(TABLE) + 2:], '%Ym%m').date()
+            if month < cutoff:
+                months.add(month)
+    return sorted(months)
+
+
+def archive_audit_log(retention_days, output_dir, batch_size=2000, dry_run=False, today=None):
+    """Archive and remove every whole month that ends before the retention
+    window. Returns a list of ``ArchivedMonth``."""
+    today = today or timezone.localdate()
+    cutoff = (today - timedelta(days=retention_days)).replace(day=1)
+    partitioned = is_partitioned()
+    archived = []
+    for month in months_to_archive(cutoff, partitioned):
+        if dry_run:
+            start, end = month_bounds(month)
+            rows = AuditLog.objects.filter(created_at__gte=start, created_at__lt=end).count()
+            archived.append(ArchivedMonth(month, archive_path(output_dir, month), rows))
+            continue
+        path, rows = export_month(month, output_dir, batch_size)
+        dropped = drop_month(month, batch_size, partitioned)
+        archived.append(ArchivedMonth(month, path, rows, dropped))
+    return archived
@@ -0,0 +1,60 @@
+"""
+Management command to archive audit log months past the retention period.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from accounts.audit_archive import archive_audit_log, ensure_partitions
+
+
+class Command(BaseCommand):
+    help = 'Streams audit log months older than the retention period to compressed JSONL files and removes them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            default=settings.AUDIT_LOG_RETENTION_DAYS,
+            help='Keep every month that overlaps this many most recent days',
+        )
+        parser.add_argument(
+            '--output-dir',
+            default=settings.AUDIT_ARCHIVE_DIR,
+            help='Directory the audit-log-YYYY-MM.jsonl.gz files are written to',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Rows fetched per chunk while exporting and deleted per batch',
+        )
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=3,
+            help='Monthly partitions to create ahead of time (PostgreSQL only)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be archived without writing or deleting anything',
+        )
+
+    def handle(self, *args, **options):
+        if not options['dry_run']:
+            for name in ensure_partitions(months_ahead=options['months_ahead']):
+                self.stdout.write(f'Created partition {name}')
+
+        archived = archive_audit_log(
+            options['retention_days'],
+            options['output_dir'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+        )
+        for month in archived:
+            how = 'dropped partition' if month.dropped_partition else 'deleted rows'
+            action = 'Would archive' if options['dry_run'] else f'Archived ({how})'
+            self.stdout.write(f'{action} {month.month:%Y-%m}: {month.rows} entries -> {month.path}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(archived)} months, {sum(month.rows for month in archived)} entries archived.'
+        ))
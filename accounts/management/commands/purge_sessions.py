@@ -0,0 +1,34 @@
+"""
+Management command to delete expired sessions.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.sessions import PURGE_BATCH_SIZE, clear_expired_sessions
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired rows from the session table in batches (a periodic clearsessions)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=PURGE_BATCH_SIZE,
+            help='Number of sessions deleted per statement',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep running, purging every N seconds (0 purges once)',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            deleted = clear_expired_sessions(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired sessions.'))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
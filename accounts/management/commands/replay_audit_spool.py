@@ -0,0 +1,21 @@
+"""
+Management command to load audit log entries left in spool files.
+"""
+from django.core.management.base import BaseCommand
+
+from accounts.audit import replay_audit_spool
+
+
+class Command(BaseCommand):
+    help = 'Writes audit log entries spooled by processes that exited before flushing their buffer'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--include-live',
+            action='store_true',
+            help='Also replay spool files of processes that are still running (entries are deduplicated by id)',
+        )
+
+    def handle(self, *args, **options):
+        files, entries = replay_audit_spool(include_live=options['include_live'])
+        self.stdout.write(self.style.SUCCESS(f'Replayed {entries} audit log entries from {files} spool files.'))
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:19
+
+from datetime import date, datetime, time, timezone
+
+from django.db import migrations, models
+
+MONTHS_AHEAD = 3
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_start(month):
+    return datetime.combine(month, time.min, tzinfo=timezone.utc)
+
+
+def partition_audit_log(apps, schema_editor):
+    """Rebuild accounts_audit_log on PostgreSQL as a table range-partitioned
+    by month on created_at. The partition key has to be part of the primary
+    key, so it becomes (id, created_at); ids are still unique UUIDs."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = 'accounts_audit_log'
+    old = f'{table}_unpartitioned'
+    execute = schema_editor.execute
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT LIKE %s',
+            [table, '%_pkey']
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            'SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint '
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [table]
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f'SELECT min(created_at) FROM {table}')
+        oldest = cursor.fetchone()[0]
+
+    execute(f'ALTER TABLE {table} RENAME TO {old}')
+    execute(f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)')
+    execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id, created_at)')
+    execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+    this_month = datetime.now(timezone.utc).date().replace(day=1)
+    month = (oldest.date() if oldest else this_month).replace(day=1)
+    while month <= add_months(this_month, MONTHS_AHEAD):
+        execute(
+            f'CREATE TABLE {table}_y{month:%Y}m{month:%m} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)',
+            [month_start(month), month_start(add_months(month, 1))]
+        )
+        month = add_months(month, 1)
+    execute(f'INSERT INTO {table} SELECT * FROM {old}')
+    execute(f'DROP TABLE {old}')
+    # Definitions were read before the rename, so they already name the new
+    # table; on a partitioned table they cascade to every partition.
+    for name, definition in indexes:
+        execute(definition)
+    for name, definition in foreign_keys:
+        execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} {definition}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_auditlog_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['created_at'], name='audit_log_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['event_type', 'created_at'], name='audit_log_event_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['user', 'created_at'], name='audit_log_user_created_idx'),
+        ),
+        migrations.RunPython(partition_audit_log, migrations.RunPython.noop),
+    ]
@@ -127,11 +127,17 @@ class AuditLog(models.Model):
     ip_address = models.GenericIPAddressField(blank=True, null=True)
     user_agent = models.TextField(blank=True, null=True)
     metadata = models.JSONField(default=dict, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the event happens, not when a buffered entry is flushed.
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         db_table = 'accounts_audit_log'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='audit_log_created_idx'),
+            models.Index(fields=['event_type', 'created_at'], name='audit_log_event_created_idx'),
+            models.Index(fields=['user', 'created_at'], name='audit_log_user_created_idx'),
+        ]
 
     def __str__(self):
         return f'{self.event_type} - {self.user} - {self.created_at}'
@@ -0,0 +1,77 @@
+"""
+Session engine with selectable storage and write coalescing.
+
+``SESSION_ENGINE = 'accounts.sessions'`` stores sessions according to
+``SESSION_STORE``:
+
+- ``db``: the ``django_session`` table (Django's default)
+- ``cached_db``: write-through to the table, reads served from the
+  ``SESSION_CACHE_ALIAS`` cache
+- ``cache``: the cache only; sessions are lost if the cache is flushed
+
+In every mode ``save`` is skipped when the session data is the same as
+when it was loaded, so views that re-assign unchanged values do not cause a
+write. Expired rows are removed by the ``purge_sessions`` command.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.sessions.backends import cache, cached_db, db
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+SESSION_STORES = {
+    'db': db.SessionStore,
+    'cached_db': cached_db.SessionStore,
+    'cache': cache.SessionStore,
+}
+PURGE_BATCH_SIZE = 5000
+
+
+def base_store():
+    try:
+        return SESSION_STORES[settings.SESSION_STORE]
+    except KeyError:
+        raise ValueError(
+            f'SESSION_STORE must be one of {", ".join(SESSION_STORES)}, not {settings.SESSION_STORE!r}'
+        ) from None
+
+
+class SessionStore(base_store()):
+    _loaded_fingerprint = None
+
+    def fingerprint(self, data):
+        return hashlib.sha1(self.serializer().dumps({key: data[key] for key in sorted(data)})).hexdigest()
+
+    def load(self):
+        data = super().load()
+        self._loaded_fingerprint = self.fingerprint(data) if self.session_key else None
+        return data
+
+    def save(self, must_create=False):
+        data = self._get_session(no_load=must_create)
+        fingerprint = self.fingerprint(data)
+        if not must_create and self.session_key and fingerprint == self._loaded_fingerprint:
+            return
+        super().save(must_create=must_create)
+        self._loaded_fingerprint = fingerprint
+
+    @classmethod
+    def clear_expired(cls):
+        if issubclass(cls, db.SessionStore):
+            clear_expired_sessions()
+
+
+def clear_expired_sessions(batch_size=PURGE_BATCH_SIZE, now=None):
+    """Delete expired ``django_session`` rows ``batch_size`` at a time so no
+    single statement holds locks on the whole table. Returns the number
+    deleted."""
+    now = now or timezone.now()
+    deleted = 0
+    while True:
+        keys = list(
+            Session.objects.filter(expire_date__lt=now).values_list('session_key', flat=True)[:batch_size]
+        )
+        if not keys:
+            return deleted
+        deleted += Session.objects.filter(session_key__in=keys).delete()[0]
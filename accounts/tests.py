@@ -1,10 +1,20 @@
 """
 Tests for accounts app.
 """
+import gzip
+import json
+from datetime import timedelta
+from io import StringIO
+
 import pytest
-from django.test import Client
+from django.core.management import call_command
+from django.contrib.sessions.models import Session
+from django.test import Client, RequestFactory
 from django.urls import reverse
-from accounts.models import User
+from django.utils import timezone
+from accounts.audit import AuditBuffer, log_event, make_entry, spool_path
+from accounts.models import AuditLog, User
+from accounts.sessions import SessionStore
 
 
 @pytest.fixture
@@ -94,3 +104,123 @@ class TestNavbarForAdminUsers:
         assert response.status_code == 200
         content = response.content.decode()
         assert 'Request expert matching' in content
+
+
+@pytest.mark.django_db
+class TestAuditBuffer:
+    @pytest.fixture(autouse=True)
+    def spool(self, settings, tmp_path):
+        settings.AUDIT_SPOOL_DIR = str(tmp_path)
+        return tmp_path
+
+    def test_log_event_fills_request_details(self, test_user):
+        request = RequestFactory().get('/', HTTP_USER_AGENT='Browser/1.0', REMOTE_ADDR='10.0.0.7')
+        request.user = test_user
+        log_event(request, AuditLog.EventType.PROFILE_UPDATED, 'Profile updated')
+
+        entry = AuditLog.objects.get()
+        assert (entry.user, entry.ip_address, entry.user_agent) == (test_user, '10.0.0.7', 'Browser/1.0')
+
+    @pytest.fixture
+    def buffer(self, monkeypatch):
+        # Flushes normally run on the background thread; tests call flush().
+        monkeypatch.setattr(AuditBuffer, 'start_flusher', lambda self: None)
+        return AuditBuffer(max_size=3, max_age=3600)
+
+    def test_flushes_in_bulk_once_full(self, buffer, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            for i in range(2):
+                buffer.add(make_entry(AuditLog.EventType.USER_LOGIN, f'Login {i}'))
+        assert AuditLog.objects.count() == 0
+        assert len(spool_path().read_text().splitlines()) == 2
+        assert not buffer.wake.is_set()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            buffer.add(make_entry(AuditLog.EventType.USER_LOGIN, 'Login 2'))
+        assert buffer.wake.is_set()
+        assert AuditLog.objects.count() == 0
+        assert buffer.flush() == 3
+        assert AuditLog.objects.count() == 3
+        assert not spool_path().exists()
+
+    def test_entries_wait_for_the_callers_commit(self, buffer, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks() as callbacks:
+            buffer.add(make_entry(AuditLog.EventType.USER_LOGIN, 'Login'))
+        assert (buffer.entries, spool_path().exists()) == ([], False)
+
+        # A rolled-back request never runs its callbacks; a committed one does.
+        callbacks[0]()
+        assert len(buffer.entries) == 1
+
+    def test_spooled_entries_survive_a_crash(self, spool, buffer, django_capture_on_commit_callbacks):
+        entry = make_entry(AuditLog.EventType.USER_LOGOUT, 'Logout')
+        with django_capture_on_commit_callbacks(execute=True):
+            buffer.add(entry)
+        # Simulate the process dying before its buffer was flushed.
+        buffer.entries = []
+        spool_path().rename(spool_path(pid=2 ** 22 + 1))
+
+        out = StringIO()
+        call_command('replay_audit_spool', stdout=out)
+        assert 'Replayed 1 audit log entries from 1 spool files' in out.getvalue()
+        assert AuditLog.objects.get().created_at == entry.created_at
+        assert list(spool.iterdir()) == []
+
+
+@pytest.mark.django_db
+class TestArchiveAuditLog:
+    def entry(self, when, description):
+        entry = AuditLog.objects.create(event_type=AuditLog.EventType.USER_LOGIN, description=description)
+        AuditLog.objects.filter(pk=entry.pk).update(created_at=when)
+        return entry
+
+    def test_archives_whole_months_past_retention(self, tmp_path):
+        now = timezone.now()
+        self.entry(now - timedelta(days=800), 'Very old')
+        self.entry(now - timedelta(days=900), 'Old')
+        recent = self.entry(now - timedelta(days=10), 'Recent')
+
+        out = StringIO()
+        call_command('archive_audit_log', '--retention-days', '730', '--output-dir', str(tmp_path),
+                     '--dry-run', stdout=out)
+        assert '2 entries archived' in out.getvalue()
+        assert AuditLog.objects.count() == 3
+
+        call_command('archive_audit_log', '--retention-days', '730', '--output-dir', str(tmp_path),
+                     stdout=StringIO())
+        assert list(AuditLog.objects.values_list('pk', flat=True)) == [recent.pk]
+        archived = []
+        for path in sorted(tmp_path.glob('audit-log-*.jsonl.gz')):
+            with gzip.open(path, 'rt') as archive:
+                archived += [json.loads(line)['description'] for line in archive]
+        assert sorted(archived) == ['Old', 'Very old']
+
+
+@pytest.mark.django_db
+class TestSessionStore:
+    def test_unchanged_session_is_not_saved(self, django_assert_num_queries):
+        session = SessionStore()
+        session['cart'] = ['a']
+        session.save()
+
+        session = SessionStore(session.session_key)
+        session['cart'] = ['a']
+        with django_assert_num_queries(0):
+            session.save()
+
+        session['cart'] = ['a', 'b']
+        session.save()
+        assert SessionStore(session.session_key)['cart'] == ['a', 'b']
+
+    def test_purge_sessions_deletes_expired_rows(self):
+        for index in range(3):
+            session = SessionStore()
+            session['index'] = index
+            session.save()
+        Session.objects.filter(session_key__in=Session.objects.values('session_key')[:2]).update(
+            expire_date=timezone.now() - timedelta(days=1)
+        )
+        out = StringIO()
+        call_command('purge_sessions', '--batch-size', '1', stdout=out)
+        assert 'Deleted 2 expired sessions' in out.getvalue()
+        assert Session.objects.count() == 1
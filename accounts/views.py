@@ -5,14 +5,17 @@ from django.contrib import messages
 from django.contrib.auth import login, get_user_model
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.views import LoginView, LogoutView, PasswordResetView, PasswordResetConfirmView
-from django.core.mail import send_mail
 from django.conf import settings
+from django.db import transaction
 from django.shortcuts import render, redirect
 from django.urls import reverse_lazy
 from django.utils import timezone
 from django.views.generic import CreateView
 
+from core.outbox import queue_email
+
 from .forms import SignUpForm, LoginForm, ProfileUpdateForm, DeletionRequestForm, CustomPasswordResetForm, CustomSetPasswordForm
+from .audit import log_event
 from .models import AuditLog
 
 User = get_user_model()
@@ -25,12 +28,11 @@ class SignUpView(CreateView):
 
     def form_valid(self, form):
         user = form.save()
-        AuditLog.objects.create(
-            user=user,
+        log_event(
+            self.request,
             event_type=AuditLog.EventType.USER_CREATED,
             description=f'User created with role: {user.role}',
-            ip_address=self.request.META.get('REMOTE_ADDR'),
-            user_agent=self.request.META.get('HTTP_USER_AGENT', '')[:500]
+            user=user
         )
         login(self.request, user)
         messages.success(self.request, 'Welcome to Kairos! Your account has been created.')
@@ -48,12 +50,10 @@ class CustomLoginView(LoginView):
 
     def form_valid(self, form):
         response = super().form_valid(form)
-        AuditLog.objects.create(
-            user=self.request.user,
+        log_event(
+            self.request,
             event_type=AuditLog.EventType.USER_LOGIN,
-            description='User logged in',
-            ip_address=self.request.META.get('REMOTE_ADDR'),
-            user_agent=self.request.META.get('HTTP_USER_AGENT', '')[:500]
+            description='User logged in'
         )
         return response
 
@@ -72,12 +72,10 @@ class CustomLogoutView(LogoutView):
 
     def dispatch(self, request, *args, **kwargs):
         if request.user.is_authenticated:
-            AuditLog.objects.create(
-                user=request.user,
+            log_event(
+                request,
                 event_type=AuditLog.EventType.USER_LOGOUT,
-                description='User logged out',
-                ip_address=request.META.get('REMOTE_ADDR'),
-                user_agent=request.META.get('HTTP_USER_AGENT', '')[:500]
+                description='User logged out'
             )
         messages.success(request, 'You have been successfully logged out.')
         return super().dispatch(request, *args, **kwargs)
@@ -130,11 +128,10 @@ def profile_settings(request):
         form = ProfileUpdateForm(request.POST, instance=request.user)
         if form.is_valid():
             form.save()
-            AuditLog.objects.create(
-                user=request.user,
+            log_event(
+                request,
                 event_type=AuditLog.EventType.PROFILE_UPDATED,
-                description='Profile updated',
-                ip_address=request.META.get('REMOTE_ADDR')
+                description='Profile updated'
             )
             messages.success(request, 'Your profile has been updated.')
             return redirect('accounts:profile_settings')
@@ -144,6 +141,7 @@ def profile_settings(request):
 
 
 @login_required
+@transaction.atomic
 def request_deletion(request):
     if request.method == 'POST':
         form = DeletionRequestForm(request.user, request.POST)
@@ -151,18 +149,15 @@ def request_deletion(request):
             request.user.deletion_requested = True
             request.user.deletion_requested_date = timezone.now()
             request.user.save()
-            AuditLog.objects.create(
-                user=request.user,
+            log_event(
+                request,
                 event_type=AuditLog.EventType.DELETION_REQUESTED,
-                description=f'Deletion requested. Reason: {form.cleaned_data.get("reason", "Not provided")}',
-                ip_address=request.META.get('REMOTE_ADDR')
+                description=f'Deletion requested. Reason: {form.cleaned_data.get("reason", "Not provided")}'
             )
-            send_mail(
+            queue_email(
                 subject='Account deletion request - Kairos',
                 message=f'User {request.user.email} has requested account deletion.\n\nReason: {form.cleaned_data.get("reason", "Not provided")}',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[settings.DEFAULT_FROM_EMAIL],
-                fail_silently=True
+                recipient_list=[settings.DEFAULT_FROM_EMAIL]
             )
             messages.info(request, 'Your deletion request has been submitted. Our team will process it within 30 days.')
             return redirect('accounts:dashboard')
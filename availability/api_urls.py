@@ -6,4 +6,5 @@ from . import views
 
 urlpatterns = [
     path('experts/<uuid:expert_id>/slots/', views.get_available_slots, name='get_slots'),
+    path('experts/availability/', views.get_experts_availability, name='get_experts_availability'),
 ]
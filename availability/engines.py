@@ -0,0 +1,326 @@
+"""
+Availability engines.
+
+Two interchangeable ways of answering "when is this expert free?", chosen
+with the ``AVAILABILITY_ENGINE`` setting:
+
+- ``slots`` (default) reads the materialised 30-minute ``TimeSlot`` rows
+  maintained by ``availability.slots``.
+- ``intervals`` stores nothing but bookings: free time is computed on the
+  fly as recurring ``AvailabilityBlock``s minus ``BlockedDate``s minus busy
+  ``Booking`` intervals, using sorted interval arithmetic.
+
+Both expose the same methods, so views and the ``/api/experts/<id>/slots/``
+endpoint do not care which one is configured.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Count, Min
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import AvailabilityBlock, BlockedDate, TimeSlot
+from .slots import DEFAULT_DAYS_AHEAD, SLOT_MINUTES, materialise_slots
+
+BUSY_BOOKING_STATUSES = ['requested', 'accepted', 'scheduled', 'in_session']
+
+
+@dataclass(frozen=True)
+class OpenSlot:
+    """A bookable start time. ``pk`` is the first ``TimeSlot`` id when the
+    slot table engine produced it, otherwise ``None``."""
+    start_datetime: datetime
+    end_datetime: datetime
+    pk: object = None
+
+
+@dataclass
+class AvailabilitySummary:
+    """Earliest free slot and free minutes per local day for one expert."""
+    earliest: datetime = None
+    free_minutes: dict = field(default_factory=dict)
+
+    def add(self, start, minutes, day=None):
+        if self.earliest is None or start < self.earliest:
+            self.earliest = start
+        day = day or timezone.localtime(start).date()
+        self.free_minutes[day] = self.free_minutes.get(day, 0) + minutes
+
+    @property
+    def free_hours(self):
+        return sum(self.free_minutes.values()) / 60
+
+
+def merge_intervals(intervals):
+    """Sort ``(start, end)`` pairs and coalesce overlapping or touching ones."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(intervals, busy):
+    """Remove every ``busy`` interval from ``intervals``.
+
+    Both inputs are merged first; a single sweep then walks them together,
+    so the cost is linear after sorting.
+    """
+    busy = merge_intervals(busy)
+    free = []
+    i = 0
+    for start, end in merge_intervals(intervals):
+        while i < len(busy) and busy[i][1] <= start:
+            i += 1
+        j = i
+        while j < len(busy) and busy[j][0] < end:
+            if busy[j][0] > start:
+                free.append((start, busy[j][0]))
+            start = max(start, busy[j][1])
+            j += 1
+        if start < end:
+            free.append((start, end))
+    return free
+
+
+def fitting_starts(runs, durations):
+    """Start times from which each of ``durations`` (minutes) fits.
+
+    ``runs`` yields ``(start, run_end, pk)`` in start order, where
+    ``run_end`` is the end of the contiguous free stretch that begins at or
+    contains ``start``. Returns ``{duration: [OpenSlot, ...]}``.
+    """
+    lengths = {duration: timedelta(minutes=duration) for duration in durations}
+    fitting = {duration: [] for duration in durations}
+    for start, run_end, pk in runs:
+        for duration, length in lengths.items():
+            if start + length <= run_end:
+                fitting[duration].append(OpenSlot(start, start + length, pk))
+    return fitting
+
+
+class AvailabilityEngine:
+    name = None
+
+    def available_slots(self, expert_id, start, end, duration):
+        return self.available_slots_for_durations(expert_id, start, end, [duration])[duration]
+
+
+class SlotTableEngine(AvailabilityEngine):
+    name = 'slots'
+
+    def refresh(self, profile):
+        materialise_slots(profile)
+
+    def available_slots_for_durations(self, expert_id, start, end, durations):
+        """One query, then a single backwards pass computes where each
+        contiguous run of available slots ends, so every duration is
+        checked in O(1) per slot."""
+        slots = list(TimeSlot.objects.filter(
+            expert_id=expert_id,
+            status=TimeSlot.Status.AVAILABLE,
+            start_datetime__gte=start,
+            start_datetime__lt=end
+        ).order_by('start_datetime').values_list('start_datetime', 'end_datetime', 'id'))
+
+        run_ends = [None] * len(slots)
+        run_end = None
+        for i in range(len(slots) - 1, -1, -1):
+            _, slot_end, _ = slots[i]
+            if run_end is None or slots[i + 1][0] != slot_end:
+                run_end = slot_end
+            run_ends[i] = run_end
+
+        return fitting_starts(
+            ((slot_start, run_ends[i], pk) for i, (slot_start, _, pk) in enumerate(slots)), durations
+        )
+
+    def availability_summaries(self, expert_ids, start, end):
+        """One grouped query: earliest available slot and slot count per
+        expert per day."""
+        summaries = {expert_id: AvailabilitySummary() for expert_id in expert_ids}
+        rows = TimeSlot.objects.filter(
+            expert_id__in=expert_ids,
+            status=TimeSlot.Status.AVAILABLE,
+            start_datetime__gte=start,
+            start_datetime__lt=end
+        ).annotate(day=TruncDate('start_datetime')).values('expert_id', 'day').annotate(
+            earliest=Min('start_datetime'), slots=Count('id')
+        ).order_by()
+        for row in rows:
+            summaries[row['expert_id']].add(row['earliest'], row['slots'] * SLOT_MINUTES, day=row['day'])
+        return summaries
+
+    def next_available(self, expert_id, after):
+        return TimeSlot.objects.filter(
+            expert_id=expert_id,
+            status=TimeSlot.Status.AVAILABLE,
+            start_datetime__gte=after
+        ).order_by('start_datetime').values_list('start_datetime', flat=True).first()
+
+    def is_free(self, expert_id, start, end):
+        needed = int((end - start).total_seconds() // 60) // SLOT_MINUTES
+        # Fetch the ids rather than count(): Django drops FOR UPDATE from
+        # aggregate queries, and the slots must stay locked until reserve().
+        locked = TimeSlot.objects.select_for_update().filter(
+            expert_id=expert_id,
+            status=TimeSlot.Status.AVAILABLE,
+            start_datetime__gte=start,
+            start_datetime__lt=end
+        ).values_list('pk', flat=True)
+        return len(list(locked)) == needed
+
+    def reserve(self, booking):
+        """Mark the slots covered by ``booking`` as booked."""
+        TimeSlot.objects.filter(
+            expert_id=booking.expert_id,
+            status=TimeSlot.Status.AVAILABLE,
+            start_datetime__gte=booking.scheduled_start,
+            start_datetime__lt=booking.scheduled_end
+        ).update(status=TimeSlot.Status.BOOKED, booking=booking, updated_at=timezone.now())
+
+    def release(self, booking):
+        TimeSlot.objects.filter(booking=booking).update(
+            status=TimeSlot.Status.AVAILABLE, booking=None, updated_at=timezone.now()
+        )
+
+
+class IntervalEngine(AvailabilityEngine):
+    name = 'intervals'
+
+    def refresh(self, profile):
+        from experts.listings import refresh_next_available_slot
+        refresh_next_available_slot(profile.pk)
+
+    def free_intervals_for_experts(self, expert_ids, start, end):
+        """Free ``(start, end)`` intervals per expert for days overlapping
+        the window, loading blocks, blocked dates and bookings for all of
+        ``expert_ids`` with one query each.
+
+        Intervals keep their block boundaries rather than being clipped to
+        ``start``, so callers can step through them on the block's grid.
+        """
+        from consultations.models import Booking
+
+        first_day = timezone.localtime(start).date()
+        last_day = timezone.localtime(end).date()
+        blocks = defaultdict(lambda: defaultdict(list))
+        for block in AvailabilityBlock.objects.filter(expert_id__in=expert_ids, is_active=True):
+            blocks[block.expert_id][block.day_of_week].append(block)
+        blocked_dates = defaultdict(set)
+        for expert_id, date in BlockedDate.objects.filter(
+            expert_id__in=expert_ids, date__gte=first_day, date__lte=last_day
+        ).values_list('expert_id', 'date'):
+            blocked_dates[expert_id].add(date)
+
+        open_intervals = defaultdict(list)
+        day = first_day
+        while day <= last_day:
+            for expert_id, days in blocks.items():
+                if day in blocked_dates[expert_id]:
+                    continue
+                for block in days.get(day.weekday(), ()):
+                    open_intervals[expert_id].append((
+                        timezone.make_aware(datetime.combine(day, block.start_time)),
+                        timezone.make_aware(datetime.combine(day, block.end_time)),
+                    ))
+            day += timedelta(days=1)
+        if not open_intervals:
+            return {expert_id: [] for expert_id in expert_ids}
+
+        window_start = min(interval[0] for intervals in open_intervals.values() for interval in intervals)
+        window_end = max(interval[1] for intervals in open_intervals.values() for interval in intervals)
+        busy = defaultdict(list)
+        for expert_id, busy_start, busy_end in Booking.objects.filter(
+            expert_id__in=list(open_intervals),
+            status__in=BUSY_BOOKING_STATUSES,
+            scheduled_start__lt=window_end,
+            scheduled_end__gt=window_start
+        ).values_list('expert_id', 'scheduled_start', 'scheduled_end'):
+            busy[expert_id].append((busy_start, busy_end))
+        return {
+            expert_id: subtract_intervals(open_intervals[expert_id], busy[expert_id])
+            for expert_id in expert_ids
+        }
+
+    def free_intervals(self, expert_id, start, end):
+        return self.free_intervals_for_experts([expert_id], start, end)[expert_id]
+
+    def grid_starts(self, intervals, start, end):
+        """Yield ``(slot_start, interval_end)`` on each interval's
+        ``SLOT_MINUTES`` grid for starts inside ``[start, end)``."""
+        step = timedelta(minutes=SLOT_MINUTES)
+        for free_start, free_end in intervals:
+            current = free_start
+            while current < free_end and current < end:
+                if current >= start:
+                    yield current, free_end
+                current += step
+
+    def available_slots_for_durations(self, expert_id, start, end, durations):
+        intervals = self.free_intervals(expert_id, start, end)
+        return fitting_starts(
+            ((slot_start, free_end, None) for slot_start, free_end in self.grid_starts(intervals, start, end)),
+            durations
+        )
+
+    def availability_summaries(self, expert_ids, start, end):
+        length = timedelta(minutes=SLOT_MINUTES)
+        summaries = {expert_id: AvailabilitySummary() for expert_id in expert_ids}
+        for expert_id, intervals in self.free_intervals_for_experts(expert_ids, start, end).items():
+            summary = summaries[expert_id]
+            for slot_start, free_end in self.grid_starts(intervals, start, end):
+                if slot_start + length <= free_end:
+                    summary.add(slot_start, SLOT_MINUTES)
+        return summaries
+
+    def next_available(self, expert_id, after):
+        slots = self.available_slots(
+            expert_id, after, after + timedelta(days=DEFAULT_DAYS_AHEAD), SLOT_MINUTES
+        )
+        return slots[0].start_datetime if slots else None
+
+    def is_free(self, expert_id, start, end):
+        return any(
+            free_start <= start and end <= free_end
+            for free_start, free_end in self.free_intervals(expert_id, start, end)
+        )
+
+    def reserve(self, booking):
+        """Nothing to persist beyond the booking itself."""
+
+    def release(self, booking):
+        """Cancelled bookings stop counting as busy on their own."""
+
+
+def rank_by_availability(summaries):
+    """Sort ``{expert_id: AvailabilitySummary}`` items soonest-free first,
+    then by most free hours, with fully booked experts last."""
+    return sorted(
+        summaries.items(),
+        key=lambda item: (
+            item[1].earliest is None,
+            item[1].earliest.timestamp() if item[1].earliest else 0,
+            -item[1].free_hours,
+        )
+    )
+
+
+ENGINES = {engine.name: engine for engine in (SlotTableEngine, IntervalEngine)}
+
+
+def get_availability_engine():
+    name = getattr(settings, 'AVAILABILITY_ENGINE', SlotTableEngine.name)
+    try:
+        return ENGINES[name]()
+    except KeyError:
+        raise ImproperlyConfigured(
+            f'AVAILABILITY_ENGINE must be one of {", ".join(ENGINES)}, not {name!r}.'
+        )
@@ -0,0 +1,92 @@
+"""
+Management command to roll every expert's time slot horizon forward.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+from availability.engines import SlotTableEngine, get_availability_engine
+from availability.slots import DEFAULT_DAYS_AHEAD, SlotChanges, expert_id_batches, extend_slot_horizons
+
+
+def extend_chunk(expert_ids, days_ahead):
+    try:
+        return extend_slot_horizons(expert_ids, days_ahead=days_ahead)
+    finally:
+        # Worker threads open their own connections; don't leak them.
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Materialises time slots for the days that have newly entered each expert\'s booking horizon'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=DEFAULT_DAYS_AHEAD,
+            help='How many days ahead slots should exist',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=200,
+            help='Number of experts materialised per chunk',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of chunks processed in parallel (always 1 on SQLite)',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep running, repeating every N seconds (0 runs once)',
+        )
+
+    def handle(self, *args, **options):
+        if get_availability_engine().name != SlotTableEngine.name:
+            self.stdout.write('The configured availability engine does not materialise slots; nothing to do.')
+            return
+
+        workers = options['workers']
+        if connection.vendor == 'sqlite' and workers > 1:
+            self.stdout.write('SQLite allows a single writer; running chunks sequentially.')
+            workers = 1
+
+        while True:
+            self.extend(options['days'], options['chunk_size'], workers)
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def extend(self, days_ahead, chunk_size, workers):
+        started = time.monotonic()
+        changes, experts, extended = SlotChanges(), 0, 0
+
+        chunks = expert_id_batches(chunk_size)
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = executor.map(lambda chunk: (len(chunk), extend_chunk(chunk, days_ahead)), chunks)
+                for size, (chunk_changes, chunk_extended) in results:
+                    experts += size
+                    changes += chunk_changes
+                    extended += chunk_extended
+        else:
+            for chunk in chunks:
+                chunk_changes, chunk_extended = extend_slot_horizons(chunk, days_ahead=days_ahead)
+                experts += len(chunk)
+                changes += chunk_changes
+                extended += chunk_extended
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(self.style.SUCCESS(
+            f'Extended {extended} of {experts} experts in {elapsed:.2f}s '
+            f'({experts / elapsed:.1f} experts/s, {changes.created / elapsed:.1f} slots/s): '
+            f'{changes.created} created, {changes.deleted} removed, '
+            f'{changes.blocked} blocked, {changes.released} released.'
+        ))
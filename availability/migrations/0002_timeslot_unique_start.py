@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:48
+
+from django.db import migrations, models
+
+
+def remove_duplicate_slots(apps, schema_editor):
+    """Keep one slot per (expert, start_datetime), preferring booked over
+    blocked over available, then the oldest row."""
+    TimeSlot = apps.get_model('availability', 'TimeSlot')
+    precedence = {'booked': 0, 'blocked': 1, 'available': 2}
+    duplicates = (
+        TimeSlot.objects.values('expert_id', 'start_datetime')
+        .annotate(rows=models.Count('id'))
+        .filter(rows__gt=1)
+    )
+    for group in duplicates.iterator():
+        slots = sorted(
+            TimeSlot.objects.filter(expert_id=group['expert_id'], start_datetime=group['start_datetime']),
+            key=lambda slot: (precedence.get(slot.status, 3), slot.created_at),
+        )
+        TimeSlot.objects.filter(pk__in=[slot.pk for slot in slots[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('availability', '0001_initial'),
+        ('consultations', '0004_add_phone_budget_file_consent'),
+        ('experts', '0006_expertlisting'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_slots, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='timeslot',
+            constraint=models.UniqueConstraint(fields=('expert', 'start_datetime'), name='availability_unique_expert_slot_start'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('availability', '0002_timeslot_unique_start'),
+        ('experts', '0006_expertlisting'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotHorizon',
+            fields=[
+                ('expert', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='slot_horizon', serialize=False, to='experts.expertprofile')),
+                ('generated_until', models.DateField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'availability_slot_horizon',
+            },
+        ),
+    ]
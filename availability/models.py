@@ -52,6 +52,9 @@ class TimeSlot(models.Model):
     class Meta:
         db_table = 'availability_time_slot'
         ordering = ['start_datetime']
+        constraints = [
+            models.UniqueConstraint(fields=['expert', 'start_datetime'], name='availability_unique_expert_slot_start'),
+        ]
 
     def __str__(self):
         return f'{self.expert} - {self.start_datetime}'
@@ -79,3 +82,21 @@ class BlockedDate(models.Model):
 
     def __str__(self):
         return f'{self.expert} - {self.date}'
+
+
+class SlotHorizon(models.Model):
+    """How far ahead an expert's time slots have been materialised.
+
+    ``generated_until`` is exclusive: slots exist for every day before it.
+    """
+    expert = models.OneToOneField(
+        'experts.ExpertProfile', on_delete=models.CASCADE, primary_key=True, related_name='slot_horizon'
+    )
+    generated_until = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'availability_slot_horizon'
+
+    def __str__(self):
+        return f'{self.expert} - {self.generated_until}'
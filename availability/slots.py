@@ -0,0 +1,237 @@
+"""
+Slot materialisation engine.
+
+Turns an expert's recurring ``AvailabilityBlock``s and ``BlockedDate``s into
+concrete 30-minute ``TimeSlot`` rows for a window of days. The target slot
+set is computed in memory, diffed against the existing rows fetched with a
+single range query, and applied with bulk statements:
+
+- missing slots are inserted with ``bulk_create(ignore_conflicts=True)``;
+- available slots no longer covered by any block are deleted;
+- available slots on blocked dates are marked blocked, and blocked slots on
+  dates that have since been unblocked are released again.
+
+Booked slots are never touched.
+
+``SlotHorizon`` records how far ahead each expert has been materialised so
+the nightly ``extend_slot_horizon`` run only generates newly uncovered days.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AvailabilityBlock, BlockedDate, SlotHorizon, TimeSlot
+
+SLOT_MINUTES = 30
+DEFAULT_DAYS_AHEAD = 30
+
+
+@dataclass
+class SlotChanges:
+    created: int = 0
+    deleted: int = 0
+    blocked: int = 0
+    released: int = 0
+
+    def __add__(self, other):
+        return SlotChanges(
+            self.created + other.created,
+            self.deleted + other.deleted,
+            self.blocked + other.blocked,
+            self.released + other.released,
+        )
+
+    @property
+    def changed(self):
+        return bool(self.created or self.deleted or self.blocked or self.released)
+
+
+def window_bounds(start_date, days):
+    start = timezone.make_aware(datetime.combine(start_date, datetime.min.time()))
+    end = timezone.make_aware(datetime.combine(start_date + timedelta(days=days), datetime.min.time()))
+    return start, end
+
+
+def target_slots(blocks, start_date, days):
+    """Return ``{start_datetime: (end_datetime, date)}`` for every slot the
+    blocks cover between ``start_date`` and ``start_date + days``."""
+    blocks_by_day = defaultdict(list)
+    for block in blocks:
+        blocks_by_day[block.day_of_week].append(block)
+
+    step = timedelta(minutes=SLOT_MINUTES)
+    slots = {}
+    for offset in range(days):
+        date = start_date + timedelta(days=offset)
+        for block in blocks_by_day.get(date.weekday(), ()):
+            current = timezone.make_aware(datetime.combine(date, block.start_time))
+            end = timezone.make_aware(datetime.combine(date, block.end_time))
+            while current + step <= end:
+                slots[current] = (current + step, date)
+                current += step
+    return slots
+
+
+def diff_slots(expert_id, targets, blocked_dates, existing):
+    """Work out the writes needed to bring ``existing`` in line with ``targets``.
+
+    ``existing`` is a list of ``(id, start_datetime, status)`` tuples. Returns
+    ``(to_create, delete_ids, block_ids, release_ids)``.
+    """
+    existing_starts = set()
+    delete_ids, block_ids, release_ids = [], [], []
+    for slot_id, start, status in existing:
+        existing_starts.add(start)
+        local_date = timezone.localtime(start).date()
+        if status == TimeSlot.Status.AVAILABLE:
+            if start not in targets:
+                delete_ids.append(slot_id)
+            elif local_date in blocked_dates:
+                block_ids.append(slot_id)
+        elif status == TimeSlot.Status.BLOCKED and start in targets and local_date not in blocked_dates:
+            release_ids.append(slot_id)
+
+    to_create = [
+        TimeSlot(expert_id=expert_id, start_datetime=start, end_datetime=end, status=TimeSlot.Status.AVAILABLE)
+        for start, (end, date) in targets.items()
+        if start not in existing_starts and date not in blocked_dates
+    ]
+    return to_create, delete_ids, block_ids, release_ids
+
+
+def apply_slot_changes(to_create, delete_ids, block_ids, release_ids):
+    now = timezone.now()
+    TimeSlot.objects.bulk_create(to_create, ignore_conflicts=True)
+    if delete_ids:
+        TimeSlot.objects.filter(pk__in=delete_ids, status=TimeSlot.Status.AVAILABLE).delete()
+    if block_ids:
+        TimeSlot.objects.filter(pk__in=block_ids, status=TimeSlot.Status.AVAILABLE).update(
+            status=TimeSlot.Status.BLOCKED, updated_at=now
+        )
+    if release_ids:
+        TimeSlot.objects.filter(pk__in=release_ids, status=TimeSlot.Status.BLOCKED).update(
+            status=TimeSlot.Status.AVAILABLE, updated_at=now
+        )
+    return SlotChanges(len(to_create), len(delete_ids), len(block_ids), len(release_ids))
+
+
+def record_horizons(expert_ids, generated_until):
+    SlotHorizon.objects.bulk_create(
+        [SlotHorizon(expert_id=expert_id, generated_until=generated_until) for expert_id in expert_ids],
+        update_conflicts=True,
+        unique_fields=['expert'],
+        update_fields=['generated_until', 'updated_at'],
+    )
+
+
+def materialise_slots_for_experts(expert_ids, days_ahead=DEFAULT_DAYS_AHEAD, start_date=None, record_horizon=None):
+    """Materialise slots for a batch of experts with a fixed number of queries.
+
+    Blocks, blocked dates and existing slots for the whole batch are each
+    loaded with one query, and all inserts go through a single bulk insert.
+    The experts' horizons are recorded when the window is contiguous with
+    what already exists, which by default means it starts no later than today.
+    """
+    from experts.listings import refresh_next_available_slot
+
+    expert_ids = list(expert_ids)
+    today = timezone.localdate()
+    start_date = start_date or today
+    if record_horizon is None:
+        record_horizon = start_date <= today
+    window_start, window_end = window_bounds(start_date, days_ahead)
+    end_date = start_date + timedelta(days=days_ahead)
+
+    blocks = defaultdict(list)
+    for block in AvailabilityBlock.objects.filter(expert_id__in=expert_ids, is_active=True):
+        blocks[block.expert_id].append(block)
+
+    blocked_dates = defaultdict(set)
+    for expert_id, date in BlockedDate.objects.filter(
+        expert_id__in=expert_ids, date__gte=start_date, date__lt=end_date
+    ).values_list('expert_id', 'date'):
+        blocked_dates[expert_id].add(date)
+
+    existing = defaultdict(list)
+    for expert_id, slot_id, start, status in TimeSlot.objects.filter(
+        expert_id__in=expert_ids, start_datetime__gte=window_start, start_datetime__lt=window_end
+    ).values_list('expert_id', 'id', 'start_datetime', 'status'):
+        existing[expert_id].append((slot_id, start, status))
+
+    to_create, delete_ids, block_ids, release_ids = [], [], [], []
+    changed_experts = []
+    for expert_id in expert_ids:
+        targets = target_slots(blocks[expert_id], start_date, days_ahead)
+        diff = diff_slots(expert_id, targets, blocked_dates[expert_id], existing[expert_id])
+        if any(diff):
+            changed_experts.append(expert_id)
+        to_create += diff[0]
+        delete_ids += diff[1]
+        block_ids += diff[2]
+        release_ids += diff[3]
+
+    if not changed_experts and not record_horizon:
+        return SlotChanges()
+    with transaction.atomic():
+        changes = apply_slot_changes(to_create, delete_ids, block_ids, release_ids)
+        for expert_id in changed_experts:
+            refresh_next_available_slot(expert_id)
+        if record_horizon:
+            record_horizons(expert_ids, end_date)
+    return changes
+
+
+def materialise_slots(profile, days_ahead=DEFAULT_DAYS_AHEAD, start_date=None):
+    """Bring one expert's slots for the next ``days_ahead`` days up to date."""
+    return materialise_slots_for_experts([profile.pk], days_ahead=days_ahead, start_date=start_date)
+
+
+def expert_id_batches(batch_size):
+    """Yield lists of ids of experts with an active availability block."""
+    expert_ids = AvailabilityBlock.objects.filter(is_active=True).values_list(
+        'expert_id', flat=True
+    ).distinct().order_by('expert_id')
+    batch = []
+    for expert_id in expert_ids.iterator():
+        batch.append(expert_id)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def materialise_all_slots(days_ahead=DEFAULT_DAYS_AHEAD, batch_size=200, start_date=None):
+    """Materialise slots for every expert with an active availability block,
+    ``batch_size`` experts at a time. Yields a ``SlotChanges`` per batch."""
+    for batch in expert_id_batches(batch_size):
+        yield materialise_slots_for_experts(batch, days_ahead=days_ahead, start_date=start_date)
+
+
+def extend_slot_horizons(expert_ids, days_ahead=DEFAULT_DAYS_AHEAD, today=None):
+    """Roll each expert's horizon forward to ``today + days_ahead``.
+
+    Only the days between an expert's recorded horizon and the new one are
+    materialised; experts that have never been materialised get the full
+    window. Experts sharing a horizon are processed together. Returns
+    ``(changes, extended)`` where ``extended`` counts experts that moved.
+    """
+    today = today or timezone.localdate()
+    target = today + timedelta(days=days_ahead)
+    horizons = dict(SlotHorizon.objects.filter(expert_id__in=expert_ids).values_list('expert_id', 'generated_until'))
+
+    by_start = defaultdict(list)
+    for expert_id in expert_ids:
+        start = max(horizons.get(expert_id, today), today)
+        if start < target:
+            by_start[start].append(expert_id)
+
+    changes = SlotChanges()
+    for start, ids in by_start.items():
+        changes += materialise_slots_for_experts(
+            ids, days_ahead=(target - start).days, start_date=start, record_horizon=True
+        )
+    return changes, sum(len(ids) for ids in by_start.values())
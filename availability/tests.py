@@ -1,3 +1,313 @@
-from django.test import TestCase
+"""
+Tests for availability app.
+"""
+from datetime import date, datetime, time, timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from availability.engines import merge_intervals, subtract_intervals
+from availability.models import AvailabilityBlock, BlockedDate, SlotHorizon, TimeSlot
+from availability.slots import extend_slot_horizons, materialise_all_slots, materialise_slots
+from consultations.models import Booking
+from experts.models import ExpertListing
+from experts.tests import make_expert
+
+# A Monday, far enough ahead that every test window is in the future.
+MONDAY = date(2031, 3, 3)
+
+
+class SlotMaterialisationTests(TestCase):
+    def setUp(self):
+        self.expert = make_expert('lerato@test.com', 'Lerato', 'Mokoena')
+        self.block = AvailabilityBlock.objects.create(
+            expert=self.expert,
+            day_of_week=AvailabilityBlock.DayOfWeek.MONDAY,
+            start_time=time(9, 0),
+            end_time=time(11, 0),
+        )
+
+    def slots(self):
+        return TimeSlot.objects.filter(expert=self.expert)
+
+    def test_creates_slots_for_each_matching_day(self):
+        changes = materialise_slots(self.expert, days_ahead=14, start_date=MONDAY)
+        self.assertEqual(changes.created, 8)
+        self.assertEqual(self.slots().count(), 8)
+        self.assertEqual(
+            sorted({slot.start_datetime.date() for slot in self.slots()}),
+            [MONDAY, MONDAY + timedelta(days=7)],
+        )
+        first = self.slots().first()
+        self.assertEqual(first.end_datetime - first.start_datetime, timedelta(minutes=30))
+        self.assertEqual(
+            ExpertListing.objects.get(expert=self.expert).next_available_slot, first.start_datetime
+        )
+
+    def test_rerun_is_a_no_op(self):
+        materialise_slots(self.expert, days_ahead=7, start_date=MONDAY)
+        with self.assertNumQueries(3):
+            changes = materialise_slots(self.expert, days_ahead=7, start_date=MONDAY)
+        self.assertFalse(changes.changed)
+        self.assertEqual(self.slots().count(), 4)
+
+    def test_query_count_does_not_grow_with_slots(self):
+        AvailabilityBlock.objects.create(
+            expert=self.expert,
+            day_of_week=AvailabilityBlock.DayOfWeek.TUESDAY,
+            start_time=time(8, 0),
+            end_time=time(17, 0),
+        )
+        with self.assertNumQueries(8):
+            materialise_slots(self.expert, days_ahead=28, start_date=MONDAY)
+        self.assertEqual(self.slots().count(), 4 * 4 + 18 * 4)
+
+    def test_removed_block_deletes_available_slots_only(self):
+        materialise_slots(self.expert, days_ahead=7, start_date=MONDAY)
+        booked = self.slots().first()
+        booked.status = TimeSlot.Status.BOOKED
+        booked.save()
+
+        self.block.delete()
+        changes = materialise_slots(self.expert, days_ahead=7, start_date=MONDAY)
+        self.assertEqual(changes.deleted, 3)
+        self.assertEqual(list(self.slots()), [booked])
+
+    def test_blocked_date_blocks_and_releases_slots(self):
+        materialise_slots(self.expert, days_ahead=14, start_date=MONDAY)
+        blocked = BlockedDate.objects.create(expert=self.expert, date=MONDAY)
+
+        changes = materialise_slots(self.expert, days_ahead=14, start_date=MONDAY)
+        self.assertEqual(changes.blocked, 4)
+        self.assertEqual(self.slots().filter(status=TimeSlot.Status.BLOCKED).count(), 4)
+
+        blocked.delete()
+        changes = materialise_slots(self.expert, days_ahead=14, start_date=MONDAY)
+        self.assertEqual(changes.released, 4)
+        self.assertEqual(self.slots().filter(status=TimeSlot.Status.AVAILABLE).count(), 8)
+
+    def test_materialise_all_slots_in_batches(self):
+        others = [make_expert(f'expert{i}@test.com', 'Lerato', 'Mokoena') for i in range(3)]
+        for expert in others:
+            AvailabilityBlock.objects.create(
+                expert=expert,
+                day_of_week=AvailabilityBlock.DayOfWeek.MONDAY,
+                start_time=time(14, 0),
+                end_time=time(15, 0),
+            )
+        batches = list(materialise_all_slots(days_ahead=7, batch_size=2, start_date=MONDAY))
+        self.assertEqual(len(batches), 2)
+        self.assertEqual(sum(batch.created for batch in batches), 4 + 3 * 2)
+
+    def test_manage_view_generates_slots(self):
+        self.client.force_login(self.expert.user)
+        response = self.client.post('/availability/manage/', {
+            'action': 'add_block',
+            'day_of_week': AvailabilityBlock.DayOfWeek.WEDNESDAY,
+            'start_time': '10:00',
+            'end_time': '11:00',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(self.slots().exists())
+
+
+class SlotHorizonTests(TestCase):
+    def setUp(self):
+        self.expert = make_expert('lerato@test.com', 'Lerato', 'Mokoena')
+        for day in AvailabilityBlock.DayOfWeek.values:
+            AvailabilityBlock.objects.create(
+                expert=self.expert, day_of_week=day, start_time=time(9, 0), end_time=time(10, 0)
+            )
+
+    def slot_dates(self):
+        return sorted({
+            timezone.localtime(start).date()
+            for start in TimeSlot.objects.filter(expert=self.expert).values_list('start_datetime', flat=True)
+        })
+
+    def test_only_newly_uncovered_days_are_generated(self):
+        changes, extended = extend_slot_horizons([self.expert.pk], days_ahead=7, today=MONDAY)
+        self.assertEqual((changes.created, extended), (14, 1))
+        self.assertEqual(SlotHorizon.objects.get(expert=self.expert).generated_until, MONDAY + timedelta(days=7))
+
+        # A slot removed inside the existing horizon stays removed: the
+        # nightly run only looks at days past the recorded horizon.
+        TimeSlot.objects.filter(expert=self.expert).first().delete()
+        changes, extended = extend_slot_horizons([self.expert.pk], days_ahead=7, today=MONDAY + timedelta(days=2))
+        self.assertEqual((changes.created, extended), (4, 1))
+        self.assertEqual(self.slot_dates()[-1], MONDAY + timedelta(days=8))
+
+        changes, extended = extend_slot_horizons([self.expert.pk], days_ahead=7, today=MONDAY + timedelta(days=2))
+        self.assertEqual((changes.created, extended), (0, 0))
+
+    def test_manage_view_records_horizon(self):
+        materialise_slots(self.expert, days_ahead=5)
+        self.assertEqual(
+            SlotHorizon.objects.get(expert=self.expert).generated_until,
+            timezone.localdate() + timedelta(days=5),
+        )
+
+    def test_command_reports_throughput(self):
+        out = StringIO()
+        call_command('extend_slot_horizon', '--days', '3', stdout=out)
+        self.assertIn('Extended 1 of 1 experts', out.getvalue())
+        self.assertIn('slots/s', out.getvalue())
+        self.assertEqual(len(self.slot_dates()), 3)
+
+
+class IntervalArithmeticTests(TestCase):
+    def test_merge_coalesces_overlapping_and_touching(self):
+        self.assertEqual(merge_intervals([(5, 7), (1, 3), (3, 4), (6, 9)]), [(1, 4), (5, 9)])
+
+    def test_subtract(self):
+        self.assertEqual(subtract_intervals([(0, 10), (12, 20)], [(2, 3), (8, 13), (19, 25)]), [(0, 2), (3, 8), (13, 19)])
+        self.assertEqual(subtract_intervals([(0, 10)], []), [(0, 10)])
+        self.assertEqual(subtract_intervals([(0, 10)], [(0, 10)]), [])
+
+
+class AvailabilityEngineTests(TestCase):
+    def setUp(self):
+        self.expert = make_expert('lerato@test.com', 'Lerato', 'Mokoena')
+        AvailabilityBlock.objects.create(
+            expert=self.expert,
+            day_of_week=AvailabilityBlock.DayOfWeek.MONDAY,
+            start_time=time(9, 0),
+            end_time=time(11, 0),
+        )
+        self.client_user = User.objects.create_user(
+            email='client@test.com', password='testpass123', first_name='C', last_name='L',
+        )
+        self.url = f'/api/experts/{self.expert.pk}/slots/'
+
+    def book(self, hour, minutes=60):
+        start = timezone.make_aware(datetime.combine(MONDAY, time(hour, 0)))
+        return Booking.objects.create(
+            client=self.client_user, expert=self.expert, problem_statement='Help',
+            scheduled_start=start, scheduled_end=start + timedelta(minutes=minutes), status='requested',
+        )
+
+    def starts(self, duration):
+        response = self.client.get(self.url, {'date': MONDAY.isoformat(), 'duration': duration})
+        self.assertEqual(response.status_code, 200)
+        return [slot['display'] for slot in response.json()['slots']]
+
+    def test_engines_agree(self):
+        materialise_slots(self.expert, days_ahead=7, start_date=MONDAY)
+        expected = {30: ['09:00', '09:30', '10:00', '10:30'], 60: ['09:00', '09:30', '10:00'], 90: ['09:00', '09:30']}
+        for engine in ('slots', 'intervals'):
+            with self.subTest(engine=engine), override_settings(AVAILABILITY_ENGINE=engine):
+                for duration, starts in expected.items():
+                    self.assertEqual(self.starts(duration), starts)
+
+    @override_settings(AVAILABILITY_ENGINE='intervals')
+    def test_interval_engine_subtracts_bookings_and_blocked_dates(self):
+        booking = self.book(9, minutes=30)
+        self.assertEqual(self.starts(60), ['09:30', '10:00'])
+
+        booking.status = 'cancelled'
+        booking.save()
+        self.assertEqual(self.starts(60), ['09:00', '09:30', '10:00'])
+
+        BlockedDate.objects.create(expert=self.expert, date=MONDAY)
+        self.assertEqual(self.starts(30), [])
+        self.assertFalse(TimeSlot.objects.exists())
+
+    @override_settings(AVAILABILITY_ENGINE='intervals')
+    def test_interval_engine_booking_flow(self):
+        self.client.force_login(self.client_user)
+        start = timezone.make_aware(datetime.combine(MONDAY, time(9, 30)))
+        data = {'start': start.isoformat(), 'terms_accepted': 'on', 'problem_statement': 'Help'}
+        response = self.client.post(f'/consultations/book/{self.expert.pk}/', data)
+        self.assertEqual(response.status_code, 302)
+        booking = Booking.objects.get()
+        self.assertEqual(booking.scheduled_end - booking.scheduled_start, timedelta(minutes=60))
+        self.assertEqual(self.starts(30), ['09:00', '10:30'])
+
+        # The same time cannot be booked twice.
+        self.client.post(f'/consultations/book/{self.expert.pk}/', data)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_slot_engine_booking_marks_covered_slots(self):
+        materialise_slots(self.expert, days_ahead=7, start_date=MONDAY)
+        self.client.force_login(self.client_user)
+        start = timezone.make_aware(datetime.combine(MONDAY, time(10, 0)))
+        self.client.post(f'/consultations/book/{self.expert.pk}/', {
+            'start': start.isoformat(), 'terms_accepted': 'on', 'problem_statement': 'Help',
+        })
+        booking = Booking.objects.get()
+        self.assertEqual(TimeSlot.objects.filter(booking=booking, status=TimeSlot.Status.BOOKED).count(), 2)
+        self.assertEqual(self.starts(60), ['09:00'])
+
+    def test_multiple_durations_in_one_call(self):
+        # Free 09:00-10:30 only: the 10:30 slot is gone (slots) or booked (intervals).
+        materialise_slots(self.expert, days_ahead=7, start_date=MONDAY)
+        TimeSlot.objects.filter(expert=self.expert, start_datetime__hour=10, start_datetime__minute=30).delete()
+        start = datetime.combine(MONDAY, time(10, 30))
+        Booking.objects.create(
+            client=self.client_user, expert=self.expert, problem_statement='Help', status='scheduled',
+            scheduled_start=timezone.make_aware(start), scheduled_end=timezone.make_aware(start + timedelta(minutes=30)),
+        )
+        for engine, queries in (('slots', 2), ('intervals', 4)):
+            with self.subTest(engine=engine), override_settings(AVAILABILITY_ENGINE=engine):
+                with self.assertNumQueries(queries):
+                    response = self.client.get(self.url, {'date': MONDAY.isoformat(), 'duration': '30,60,90'})
+                durations = response.json()['durations']
+                self.assertEqual(response.json()['slots'], durations['30'])
+                self.assertEqual([slot['display'] for slot in durations['30']], ['09:00', '09:30', '10:00'])
+                self.assertEqual([slot['display'] for slot in durations['60']], ['09:00', '09:30'])
+                self.assertEqual([slot['display'] for slot in durations['90']], ['09:00'])
+
+    def test_invalid_duration_is_rejected(self):
+        for duration in ('45', 'abc', '0', '30,,60', ','.join(['30'] * 7) + ',60,90,120,150,180,210'):
+            response = self.client.get(self.url, {'duration': duration})
+            self.assertEqual(response.status_code, 400)
+
+
+class ExpertsAvailabilityApiTests(TestCase):
+    def setUp(self):
+        self.busy = make_expert('busy@test.com', 'Lerato', 'Mokoena')
+        self.free = make_expert('free@test.com', 'Lerato', 'Mokoena')
+        self.idle = make_expert('idle@test.com', 'Lerato', 'Mokoena')
+        AvailabilityBlock.objects.create(
+            expert=self.busy, day_of_week=AvailabilityBlock.DayOfWeek.TUESDAY,
+            start_time=time(9, 0), end_time=time(17, 0),
+        )
+        AvailabilityBlock.objects.create(
+            expert=self.free, day_of_week=AvailabilityBlock.DayOfWeek.MONDAY,
+            start_time=time(14, 0), end_time=time(15, 0),
+        )
+        for expert in (self.busy, self.free):
+            materialise_slots(expert, days_ahead=7, start_date=MONDAY)
+        self.staff = User.objects.create_user(
+            email='ops@test.com', password='testpass123', first_name='Ops', last_name='Admin',
+            role=User.Role.ADMIN, is_staff=True,
+        )
+        self.client.force_login(self.staff)
+
+    def fetch(self, **params):
+        ids = ','.join(str(expert.pk) for expert in (self.idle, self.busy, self.free))
+        return self.client.get('/api/experts/availability/', {'ids': ids, 'start': MONDAY.isoformat(), **params})
+
+    def test_ranks_experts_by_earliest_free_slot(self):
+        for engine, queries in (('slots', 3), ('intervals', 5)):
+            with self.subTest(engine=engine), override_settings(AVAILABILITY_ENGINE=engine):
+                with self.assertNumQueries(queries):
+                    response = self.fetch()
+                self.assertEqual(response.status_code, 200)
+                experts = response.json()['experts']
+                self.assertEqual([row['id'] for row in experts], [str(self.free.pk), str(self.busy.pk), str(self.idle.pk)])
+                self.assertEqual(experts[0]['free_hours_by_day'], {MONDAY.isoformat(): 1.0})
+                self.assertEqual(experts[1]['free_hours'], 8.0)
+                self.assertIsNone(experts[2]['earliest_slot'])
+
+    def test_rejects_bad_parameters(self):
+        self.assertEqual(self.fetch(end=(MONDAY + timedelta(days=40)).isoformat()).status_code, 400)
+        self.assertEqual(self.client.get('/api/experts/availability/', {'ids': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/experts/availability/').status_code, 400)
+
+    def test_requires_staff(self):
+        self.client.force_login(self.busy.user)
+        self.assertEqual(self.fetch().status_code, 302)
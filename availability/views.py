@@ -1,16 +1,25 @@
 """
 Views for availability management.
 """
+import uuid
+
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils import timezone
 from datetime import datetime, timedelta
 
-from .models import AvailabilityBlock, TimeSlot, BlockedDate
+from .engines import get_availability_engine, rank_by_availability
+from .models import AvailabilityBlock, BlockedDate
+from .slots import SLOT_MINUTES
 from experts.models import ExpertProfile
 
+MAX_DURATIONS = 6
+MAX_BATCH_EXPERTS = 100
+MAX_BATCH_DAYS = 31
+
 
 @login_required
 def manage_availability(request):
@@ -36,11 +45,12 @@ def manage_availability(request):
                 defaults={'is_active': True}
             )
             messages.success(request, 'Availability block added.')
-            generate_time_slots_for_expert(profile)
+            get_availability_engine().refresh(profile)
         
         elif action == 'delete_block':
             block_id = request.POST.get('block_id')
             AvailabilityBlock.objects.filter(pk=block_id, expert=profile).delete()
+            get_availability_engine().refresh(profile)
             messages.success(request, 'Availability block removed.')
         
         elif action == 'block_date':
@@ -52,16 +62,13 @@ def manage_availability(request):
                 date=date,
                 defaults={'reason': reason}
             )
-            TimeSlot.objects.filter(
-                expert=profile,
-                start_datetime__date=date,
-                status='available'
-            ).update(status='blocked')
+            get_availability_engine().refresh(profile)
             messages.success(request, 'Date blocked.')
         
         elif action == 'unblock_date':
             date_id = request.POST.get('date_id')
             BlockedDate.objects.filter(pk=date_id, expert=profile).delete()
+            get_availability_engine().refresh(profile)
             messages.success(request, 'Date unblocked.')
         
         return redirect('availability:manage')
@@ -75,49 +82,48 @@ def manage_availability(request):
     return render(request, 'availability/manage.html', context)
 
 
-def generate_time_slots_for_expert(profile, days_ahead=30):
-    today = timezone.now().date()
-    blocks = AvailabilityBlock.objects.filter(expert=profile, is_active=True)
-    blocked_dates = set(BlockedDate.objects.filter(
-        expert=profile,
-        date__gte=today,
-        date__lte=today + timedelta(days=days_ahead)
-    ).values_list('date', flat=True))
-    
-    for day_offset in range(days_ahead):
-        date = today + timedelta(days=day_offset)
-        if date in blocked_dates:
-            continue
-        
-        day_of_week = date.weekday()
-        day_blocks = blocks.filter(day_of_week=day_of_week)
-        
-        for block in day_blocks:
-            start_dt = timezone.make_aware(datetime.combine(date, block.start_time))
-            end_dt = timezone.make_aware(datetime.combine(date, block.end_time))
-            
-            current = start_dt
-            while current < end_dt:
-                slot_end = current + timedelta(minutes=30)
-                if slot_end > end_dt:
-                    break
-                
-                TimeSlot.objects.get_or_create(
-                    expert=profile,
-                    start_datetime=current,
-                    defaults={
-                        'end_datetime': slot_end,
-                        'status': 'available'
-                    }
-                )
-                current = slot_end
+def parse_durations(value):
+    """Parse ``?duration=30,60,90`` into a de-duplicated list of minutes."""
+    durations = []
+    for part in value.split(','):
+        duration = int(part)
+        if duration <= 0 or duration % SLOT_MINUTES:
+            raise ValueError(part)
+        if duration not in durations:
+            durations.append(duration)
+    if not durations or len(durations) > MAX_DURATIONS:
+        raise ValueError(value)
+    return durations
+
+
+def serialize_slot(slot):
+    return {
+        'id': str(slot.pk) if slot.pk else None,
+        'start': slot.start_datetime.isoformat(),
+        'end': slot.end_datetime.isoformat(),
+        'display': slot.start_datetime.strftime('%H:%M'),
+    }
 
 
 def get_available_slots(request, expert_id):
+    """Bookable start times for one or more durations.
+
+    ``slots`` lists the starts for the first requested duration (the
+    original single-duration contract); ``durations`` maps every requested
+    duration to its starts so the booking page needs one call. The engines
+    use the sync ORM, so this stays a sync view: under ASGI Django runs it
+    in its thread pool rather than on one shared sync thread.
+    """
     profile = get_object_or_404(ExpertProfile, pk=expert_id)
     
     date_str = request.GET.get('date')
-    duration = int(request.GET.get('duration', 60))
+    try:
+        durations = parse_durations(request.GET.get('duration', '60'))
+    except ValueError:
+        return JsonResponse(
+            {'error': f'duration must be up to {MAX_DURATIONS} comma-separated multiples of {SLOT_MINUTES} minutes'},
+            status=400
+        )
     
     if date_str:
         date = datetime.strptime(date_str, '%Y-%m-%d').date()
@@ -127,36 +133,48 @@ def get_available_slots(request, expert_id):
         start = timezone.now()
         end = start + timedelta(days=7)
     
-    slots = TimeSlot.objects.filter(
-        expert=profile,
-        status='available',
-        start_datetime__gte=start,
-        start_datetime__lt=end
-    ).order_by('start_datetime')
+    slots = get_availability_engine().available_slots_for_durations(profile.pk, start, end, durations)
+    by_duration = {
+        str(duration): [serialize_slot(slot) for slot in slots[duration]]
+        for duration in durations
+    }
     
-    consecutive_slots_needed = duration // 30
-    available_slots = []
+    return JsonResponse({'slots': by_duration[str(durations[0])], 'durations': by_duration})
+
+
+@staff_member_required
+def get_experts_availability(request):
+    """Availability for several experts at once, for ranking match candidates.
+
+    ``?ids=<uuid>,<uuid>&start=YYYY-MM-DD&end=YYYY-MM-DD`` (``end`` inclusive,
+    default the next 7 days). Experts are returned earliest free slot first,
+    then by most free hours; experts with nothing free come last.
+    """
+    try:
+        expert_ids = [uuid.UUID(value) for value in request.GET.get('ids', '').split(',') if value]
+        today = timezone.localdate()
+        first_day = datetime.strptime(request.GET['start'], '%Y-%m-%d').date() if request.GET.get('start') else today
+        last_day = datetime.strptime(request.GET['end'], '%Y-%m-%d').date() if request.GET.get('end') else first_day + timedelta(days=6)
+    except ValueError:
+        return JsonResponse({'error': 'ids must be UUIDs and dates YYYY-MM-DD'}, status=400)
+    if not expert_ids or len(expert_ids) > MAX_BATCH_EXPERTS:
+        return JsonResponse({'error': f'Pass between 1 and {MAX_BATCH_EXPERTS} expert ids'}, status=400)
+    if not 0 <= (last_day - first_day).days < MAX_BATCH_DAYS:
+        return JsonResponse({'error': f'The date range must cover 1 to {MAX_BATCH_DAYS} days'}, status=400)
     
-    for i, slot in enumerate(slots):
-        if i + consecutive_slots_needed > len(slots):
-            break
-        
-        is_consecutive = True
-        for j in range(1, consecutive_slots_needed):
-            expected_start = slot.start_datetime + timedelta(minutes=30 * j)
-            if slots[i + j].start_datetime != expected_start:
-                is_consecutive = False
-                break
-            if slots[i + j].status != 'available':
-                is_consecutive = False
-                break
-        
-        if is_consecutive:
-            available_slots.append({
-                'id': str(slot.id),
-                'start': slot.start_datetime.isoformat(),
-                'end': (slot.start_datetime + timedelta(minutes=duration)).isoformat(),
-                'display': slot.start_datetime.strftime('%H:%M'),
-            })
+    start = max(timezone.make_aware(datetime.combine(first_day, datetime.min.time())), timezone.now())
+    end = timezone.make_aware(datetime.combine(last_day + timedelta(days=1), datetime.min.time()))
+    summaries = get_availability_engine().availability_summaries(expert_ids, start, end)
     
-    return JsonResponse({'slots': available_slots})
+    experts = [
+        {
+            'id': str(expert_id),
+            'earliest_slot': summary.earliest.isoformat() if summary.earliest else None,
+            'free_hours': summary.free_hours,
+            'free_hours_by_day': {
+                day.isoformat(): minutes / 60 for day, minutes in sorted(summary.free_minutes.items())
+            },
+        }
+        for expert_id, summary in rank_by_availability(summaries)
+    ]
+    return JsonResponse({'start': first_day.isoformat(), 'end': last_day.isoformat(), 'experts': experts})
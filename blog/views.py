@@ -5,9 +5,12 @@ from django.core.paginator import Paginator
 from django.shortcuts import render, get_object_or_404
 from django.http import Http404
 
+from core.page_cache import cache_public_page
+
 from .models import BlogPost
 
 
+@cache_public_page('blog', params=['page'])
 def blog_index(request):
     posts = BlogPost.objects.filter(
         is_published=True,
@@ -21,6 +24,7 @@ def blog_index(request):
     return render(request, 'blog/index.html', {'posts': posts})
 
 
+@cache_public_page('blog')
 def blog_detail(request, slug):
     post = get_object_or_404(BlogPost, slug=slug)
     
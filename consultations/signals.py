@@ -0,0 +1,52 @@
+"""
+Signal handlers publishing booking status changes and new notes to the
+participants' live event streams.
+"""
+from django.db.models.signals import post_init, post_save
+
+from core.events import publish_to_users
+from experts.models import ExpertProfile
+
+from .models import Booking, BookingNote
+
+
+def expert_user_id(booking):
+    if 'expert' in booking._state.fields_cache:
+        return booking.expert.user_id
+    return ExpertProfile.objects.filter(pk=booking.expert_id).values_list('user_id', flat=True).first()
+
+
+def remember_status(sender, instance, **kwargs):
+    instance._loaded_status = instance.status
+
+
+def booking_saved(sender, instance, created, raw=False, **kwargs):
+    previous = None if created else getattr(instance, '_loaded_status', None)
+    instance._loaded_status = instance.status
+    if raw or previous == instance.status:
+        return
+    publish_to_users([instance.client_id, expert_user_id(instance)], {
+        'type': 'booking.status',
+        'booking': str(instance.pk),
+        'status': instance.status,
+        'previous': previous,
+    })
+
+
+def note_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or not created:
+        return
+    booking = instance.booking
+    expert = expert_user_id(booking)
+    recipients = [expert] if instance.note_type == BookingNote.NoteType.EXPERT_PRIVATE else [booking.client_id, expert]
+    publish_to_users(recipients, {
+        'type': 'booking.note',
+        'booking': str(booking.pk),
+        'note': str(instance.pk),
+        'note_type': instance.note_type,
+    })
+
+
+post_init.connect(remember_status, sender=Booking, dispatch_uid='events-init-booking')
+post_save.connect(booking_saved, sender=Booking, dispatch_uid='events-save-booking')
+post_save.connect(note_saved, sender=BookingNote, dispatch_uid='events-save-booking-note')
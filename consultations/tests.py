@@ -1,3 +1,111 @@
-from django.test import TestCase
+"""
+Tests for consultations app.
+"""
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+
+from accounts.models import AuditLog, User
+from consultations.models import Booking, BookingNote
+from experts.models import ExpertProfile
+from experts.tests import make_expert
+
+
+class SessionRoomTests(TestCase):
+    def setUp(self):
+        self.expert = make_expert('expert@test.com', 'Ayanda', 'Expert')
+        self.client_user = User.objects.create_user(
+            email='client@test.com', password='testpass123', first_name='Carol', last_name='Client',
+        )
+        self.booking = Booking.objects.create(
+            client=self.client_user, expert=self.expert, problem_statement='Help', status='accepted'
+        )
+        BookingNote.objects.create(booking=self.booking, author=self.expert.user, content='Shared agenda')
+        BookingNote.objects.create(
+            booking=self.booking, author=self.expert.user, note_type='expert_private', content='Private prep'
+        )
+        self.url = f'/consultations/booking/{self.booking.pk}/session/'
+
+    def test_opening_the_room_starts_the_session(self):
+        self.client.force_login(self.expert.user)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Shared agenda')
+        self.assertContains(response, 'Private prep')
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, 'in_session')
+        self.assertTrue(AuditLog.objects.filter(
+            user=self.expert.user, event_type=AuditLog.EventType.BOOKING_STATUS_CHANGED
+        ).exists())
+
+    def test_client_does_not_see_private_notes_and_outsiders_are_refused(self):
+        self.client.force_login(self.client_user)
+        self.assertNotContains(self.client.get(self.url), 'Private prep')
+        outsider = User.objects.create_user(
+            email='outsider@test.com', password='testpass123', first_name='Olu', last_name='Outsider',
+        )
+        self.client.force_login(outsider)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class BookingEventTests(TestCase):
+    def setUp(self):
+        self.expert = make_expert('expert@test.com', 'Ayanda', 'Expert')
+        self.client_user = User.objects.create_user(
+            email='client@test.com', password='testpass123', first_name='Carol', last_name='Client',
+        )
+        self.booking = Booking.objects.create(client=self.client_user, expert=self.expert, problem_statement='Help')
+        self.channels = [f'user:{self.client_user.pk}', f'user:{self.expert.user.pk}']
+
+    def published(self, change):
+        with mock.patch('core.events.publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+        return [(channel, event['type']) for channel, event in (call.args for call in publish.call_args_list)]
+
+    def test_booking_page_opens_the_event_stream_only_when_enabled(self):
+        self.client.force_login(self.client_user)
+        url = f'/consultations/booking/{self.booking.pk}/'
+        self.assertNotContains(self.client.get(url), 'EventSource')
+        with override_settings(LIVE_EVENTS=True):
+            self.assertContains(self.client.get(url), 'EventSource')
+
+    def test_status_transition_is_published_to_both_participants(self):
+        booking = Booking.objects.get(pk=self.booking.pk)
+        booking.status = 'accepted'
+        self.assertEqual(
+            self.published(booking.save), [(channel, 'booking.status') for channel in self.channels]
+        )
+        self.assertEqual(self.published(booking.save), [])
+
+    def test_private_notes_only_reach_the_expert(self):
+        def add_notes():
+            BookingNote.objects.create(booking=self.booking, author=self.expert.user, content='Agenda')
+            BookingNote.objects.create(
+                booking=self.booking, author=self.expert.user, note_type='expert_private', content='Prep'
+            )
+
+        self.assertEqual(self.published(add_notes), [
+            (self.channels[0], 'booking.note'), (self.channels[1], 'booking.note'),
+            (self.channels[1], 'booking.note'),
+        ])
+
+
+class MarkCompleteTests(TestCase):
+    def test_completion_counts_once_and_adds_earnings(self):
+        expert = make_expert('expert@test.com', 'Ayanda', 'Expert')
+        client_user = User.objects.create_user(
+            email='client@test.com', password='testpass123', first_name='Carol', last_name='Client',
+        )
+        booking = Booking.objects.create(
+            client=client_user, expert=expert, problem_statement='Help', status='in_session', amount=Decimal('1500.00')
+        )
+        url = f'/consultations/booking/{booking.pk}/complete/'
+        self.client.force_login(expert.user)
+        self.client.post(url)
+        self.client.force_login(client_user)
+        self.client.post(url)
+
+        expert = ExpertProfile.objects.get(pk=expert.pk)
+        self.assertEqual(Booking.objects.get(pk=booking.pk).status, 'completed')
+        self.assertEqual((expert.total_consultations, expert.total_earnings), (1, Decimal('1500.00')))
@@ -3,18 +3,22 @@ Views for consultations, bookings, and reviews.
 """
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.mail import send_mail
 from django.conf import settings
-from django.db import models
+from django.db import transaction
+from django.db.models import F
 from django.http import HttpResponseForbidden
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from datetime import timedelta
 import uuid
 
+from accounts.audit import log_event
 from accounts.models import AuditLog
+from experts.listings import refresh_next_available_slot
 from experts.models import ExpertProfile, ExpertiseTag
-from availability.models import TimeSlot
+from availability.engines import get_availability_engine
+from core.outbox import queue_email
 from messaging.models import MessageThread
 from .models import Booking, BookingNote, BookingAttachment, Review, ExpertClientRating, ConciergeRequest, ClientRequest
 
@@ -24,7 +28,9 @@ def create_booking(request, expert_id):
     expert = get_object_or_404(ExpertProfile, pk=expert_id, verification_status__in=['vetted', 'active'])
     
     if request.method == 'POST':
-        slot_id = request.POST.get('slot_id')
+        start = parse_datetime(request.POST.get('start', ''))
+        if start is not None and timezone.is_naive(start):
+            start = timezone.make_aware(start)
         problem_statement = request.POST.get('problem_statement', '')
         service_type = request.POST.get('service_type', 'consultation')
         terms_accepted = request.POST.get('terms_accepted') == 'on'
@@ -33,52 +39,51 @@ def create_booking(request, expert_id):
             messages.error(request, 'You must accept the terms to proceed.')
             return redirect('consultations:create_booking', expert_id=expert_id)
         
-        slot = get_object_or_404(TimeSlot, pk=slot_id, expert=expert, status='available')
-        
-        booking = Booking.objects.create(
-            client=request.user,
-            expert=expert,
-            service_type=service_type,
-            scheduled_start=slot.start_datetime,
-            scheduled_end=slot.start_datetime + timedelta(minutes=60),
-            problem_statement=problem_statement,
-            amount=0,
-            terms_accepted=True,
-            terms_accepted_at=timezone.now(),
-            status='requested',
-            jitsi_room_id=f'kairos-{uuid.uuid4()}'
-        )
-        
-        slot.status = 'booked'
-        slot.booking = booking
-        slot.save()
+        engine = get_availability_engine()
+        with transaction.atomic():
+            # Lock the expert row so two clients cannot book the same time.
+            ExpertProfile.objects.select_for_update().filter(pk=expert.pk).first()
+            if start is None or not engine.is_free(expert.pk, start, start + timedelta(minutes=60)):
+                messages.error(request, 'That time is no longer available. Please choose another slot.')
+                return redirect('consultations:create_booking', expert_id=expert_id)
+            
+            booking = Booking.objects.create(
+                client=request.user,
+                expert=expert,
+                service_type=service_type,
+                scheduled_start=start,
+                scheduled_end=start + timedelta(minutes=60),
+                problem_statement=problem_statement,
+                amount=0,
+                terms_accepted=True,
+                terms_accepted_at=timezone.now(),
+                status='requested',
+                jitsi_room_id=f'kairos-{uuid.uuid4()}'
+            )
+            engine.reserve(booking)
+            queue_email(
+                subject='New engagement request - Kairos',
+                message=f'You have a new engagement request from {request.user.full_name}.\n\nProblem: {problem_statement}\n\nPlease log in to accept or decline.',
+                recipient_list=[expert.user.email]
+            )
+        refresh_next_available_slot(expert.pk)
         
         MessageThread.objects.create(booking=booking)
         
-        AuditLog.objects.create(
-            user=request.user,
+        log_event(
+            request,
             event_type=AuditLog.EventType.BOOKING_CREATED,
             description=f'Booking created with {expert.user.full_name}',
             metadata={'booking_id': str(booking.id), 'service_type': service_type}
         )
         
-        send_mail(
-            subject='New engagement request - Kairos',
-            message=f'You have a new engagement request from {request.user.full_name}.\n\nProblem: {problem_statement}\n\nPlease log in to accept or decline.',
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[expert.user.email],
-            fail_silently=True
-        )
-        
         messages.success(request, 'Your request has been submitted. The expert will be notified.')
         return redirect('consultations:booking_detail', pk=booking.id)
     
-    from availability.models import TimeSlot
-    available_slots = TimeSlot.objects.filter(
-        expert=expert,
-        status='available',
-        start_datetime__gte=timezone.now()
-    ).order_by('start_datetime')[:50]
+    now = timezone.now()
+    available_slots = get_availability_engine().available_slots(
+        expert.pk, now, now + timedelta(days=30), 60
+    )[:50]
     
     context = {
         'expert': expert,
@@ -121,9 +126,9 @@ def booking_detail(request, pk):
 
 @login_required
 def session_room(request, pk):
-    booking = get_object_or_404(Booking, pk=pk)
+    booking = get_object_or_404(Booking.objects.select_related('client', 'expert__user'), pk=pk)
     
-    if not (request.user == booking.client or request.user == booking.expert.user):
+    if request.user.pk not in (booking.client_id, booking.expert.user_id):
         return HttpResponseForbidden()
     
     if booking.status not in ['scheduled', 'accepted', 'in_session']:
@@ -133,15 +138,15 @@ def session_room(request, pk):
     if booking.status != 'in_session':
         booking.status = 'in_session'
         booking.save()
-        AuditLog.objects.create(
-            user=request.user,
+        log_event(
+            request,
             event_type=AuditLog.EventType.BOOKING_STATUS_CHANGED,
             description=f'Session started',
             metadata={'booking_id': str(booking.id)}
         )
     
     shared_notes = booking.notes.filter(note_type='shared')
-    expert_notes = booking.notes.filter(note_type='expert_private') if request.user == booking.expert.user else None
+    expert_notes = booking.notes.filter(note_type='expert_private') if request.user.pk == booking.expert.user_id else None
     
     context = {
         'booking': booking,
@@ -198,8 +203,8 @@ def upload_attachment(request, pk):
             is_deliverable=is_deliverable
         )
         
-        AuditLog.objects.create(
-            user=request.user,
+        log_event(
+            request,
             event_type=AuditLog.EventType.FILE_UPLOADED,
             description=f'File uploaded: {file.name}',
             metadata={'booking_id': str(booking.id), 'attachment_id': str(attachment.id)}
@@ -210,6 +215,7 @@ def upload_attachment(request, pk):
 
 
 @login_required
+@transaction.atomic
 def mark_complete(request, pk):
     booking = get_object_or_404(Booking, pk=pk)
     
@@ -225,24 +231,22 @@ def mark_complete(request, pk):
         booking.status = 'completed'
         booking.completed_at = timezone.now()
         
-        expert = booking.expert
-        expert.total_consultations += 1
-        expert.total_earnings += booking.amount
-        expert.save()
+        # total_consultations is maintained by the experts.signals aggregates.
+        ExpertProfile.objects.filter(pk=booking.expert_id).update(
+            total_earnings=F('total_earnings') + booking.amount
+        )
         
-        AuditLog.objects.create(
-            user=request.user,
+        log_event(
+            request,
             event_type=AuditLog.EventType.BOOKING_STATUS_CHANGED,
             description='Session completed',
             metadata={'booking_id': str(booking.id)}
         )
         
-        send_mail(
+        queue_email(
             subject='Consultation completed - Kairos',
             message=f'Your consultation has been marked as complete. Please log in to leave a review.',
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[booking.client.email],
-            fail_silently=True
+            recipient_list=[booking.client.email]
         )
     
     booking.save()
@@ -278,12 +282,6 @@ def leave_review(request, pk):
             is_public=True
         )
         
-        expert = booking.expert
-        reviews = Review.objects.filter(reviewee=booking.expert.user, is_public=True)
-        expert.average_rating = reviews.aggregate(avg=models.Avg('rating'))['avg'] or 0
-        expert.total_reviews = reviews.count()
-        expert.save()
-        
         messages.success(request, 'Thank you for your review!')
         return redirect('consultations:booking_detail', pk=pk)
     
@@ -320,6 +318,7 @@ def expert_rate_client(request, pk):
 
 
 @login_required
+@transaction.atomic
 def accept_booking(request, pk):
     booking = get_object_or_404(Booking, pk=pk)
     
@@ -334,19 +333,17 @@ def accept_booking(request, pk):
     booking.responded_at = timezone.now()
     booking.save()
     
-    AuditLog.objects.create(
-        user=request.user,
+    log_event(
+        request,
         event_type=AuditLog.EventType.BOOKING_STATUS_CHANGED,
         description='Booking accepted',
         metadata={'booking_id': str(booking.id)}
     )
     
-    send_mail(
+    queue_email(
         subject='Consultation accepted - Kairos',
         message=f'Your consultation with {booking.expert.user.full_name} has been accepted.',
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[booking.client.email],
-        fail_silently=True
+        recipient_list=[booking.client.email]
     )
     
     messages.success(request, 'Booking accepted.')
@@ -371,13 +368,15 @@ def decline_booking(request, pk):
     booking.cancellation_reason = request.POST.get('reason', 'Declined by expert')
     booking.save()
     
-    TimeSlot.objects.filter(booking=booking).update(status='available', booking=None)
+    get_availability_engine().release(booking)
+    refresh_next_available_slot(booking.expert_id)
     
     messages.success(request, 'Booking declined.')
     return redirect('experts:dashboard')
 
 
 @login_required
+@transaction.atomic
 def create_concierge_request(request):
     if request.method == 'POST':
         description = request.POST.get('description', '')
@@ -393,12 +392,10 @@ def create_concierge_request(request):
             timeline=timeline
         )
         
-        send_mail(
+        queue_email(
             subject='New concierge request - Kairos',
             message=f'New concierge request from {request.user.full_name}:\n\n{description}',
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[settings.DEFAULT_FROM_EMAIL],
-            fail_silently=True
+            recipient_list=[settings.DEFAULT_FROM_EMAIL]
         )
         
         messages.success(request, 'Your request has been submitted. Our team will match you with the right expert.')
@@ -423,6 +420,7 @@ def my_bookings(request):
     return render(request, 'consultations/my_bookings.html', {'bookings': bookings})
 
 
+@transaction.atomic
 def submit_client_request(request):
     """Submit a client request for expert matching - concierge flow.
     Supports pre-selecting an expert via ?expert_id=<uuid> query param.
@@ -483,12 +481,10 @@ def submit_client_request(request):
             matched_expert=preferred_expert_obj  # Save preferred expert
         )
         
-        send_mail(
+        queue_email(
             subject='New client request - Kairos',
             message=f'New client request from {company} ({name}):\n\nPhone: {phone}\n\n{problem_description}\n\nEngagement type: {engagement_type}\nUrgency: {timeline_urgency}\nBudget: {budget_range or "Not specified"}\nPreferred expert: {preferred_expert_obj.user.full_name if preferred_expert_obj else "None"}',
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[settings.DEFAULT_FROM_EMAIL],
-            fail_silently=True
+            recipient_list=[settings.DEFAULT_FROM_EMAIL]
         )
         
         messages.success(request, 'Your request has been submitted. We will respond within 24 hours.')
@@ -9,5 +9,6 @@ def site_settings(request):
         'SITE_NAME': 'Kairos',
         'TAGLINE': "don't guess. know",
         'PAYMENTS_ENABLED': settings.PAYMENTS_ENABLED,
+        'LIVE_EVENTS': settings.LIVE_EVENTS,
         'STRIPE_PUBLIC_KEY': settings.STRIPE_PUBLIC_KEY,
     }
@@ -0,0 +1,28 @@
+"""
+Per-user live events.
+
+Changes that a signed-in user's open pages care about are published on
+``user:<id>`` after the transaction commits. ``core.views.event_stream``
+relays them to the browser as server-sent events. These changes are
+booking status transitions, new messages and new booking notes.
+"""
+from django.db import transaction
+
+from .pubsub import publish
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def publish_to_users(user_ids, event):
+    """Publish ``event`` to each user's channel once the current
+    transaction commits (immediately outside one)."""
+    user_ids = [user_id for user_id in dict.fromkeys(user_ids) if user_id is not None]
+
+    def send():
+        for user_id in user_ids:
+            publish(user_channel(user_id), event)
+
+    if user_ids:
+        transaction.on_commit(send)
@@ -0,0 +1,67 @@
+"""
+Streaming exports for compliance requests.
+
+Rows are read with ``.iterator(chunk_size=...)`` and written one at a time
+into a ``StreamingHttpResponse``, so memory stays flat however many rows
+are exported.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from accounts.models import AuditLog
+
+EXPORT_CHUNK_SIZE = 2000
+AUDIT_EXPORT_FIELDS = [
+    'id', 'created_at', 'user_id', 'user__email', 'event_type',
+    'description', 'ip_address', 'user_agent', 'metadata',
+]
+AUDIT_EXPORT_HEADER = [
+    'id', 'created_at', 'user_id', 'user_email', 'event_type',
+    'description', 'ip_address', 'user_agent', 'metadata',
+]
+
+
+class Echo:
+    """File-like object whose ``write`` returns the value, so ``csv.writer``
+    yields each encoded line instead of buffering it."""
+
+    def write(self, value):
+        return value
+
+
+def audit_log_export_rows(user=None, event_type=None, start=None, end=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield audit entries as tuples in ``AUDIT_EXPORT_HEADER`` order,
+    oldest first. ``end`` is exclusive."""
+    queryset = AuditLog.objects.order_by('created_at', 'id')
+    if user is not None:
+        queryset = queryset.filter(user=user)
+    if event_type:
+        queryset = queryset.filter(event_type=event_type)
+    if start is not None:
+        queryset = queryset.filter(created_at__gte=start)
+    if end is not None:
+        queryset = queryset.filter(created_at__lt=end)
+    return queryset.values_list(*AUDIT_EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def stream_csv(rows, header=AUDIT_EXPORT_HEADER):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([
+            json.dumps(value, cls=DjangoJSONEncoder) if isinstance(value, (dict, list)) else value
+            for value in row
+        ])
+
+
+def stream_jsonl(rows, header=AUDIT_EXPORT_HEADER):
+    for row in rows:
+        yield json.dumps(dict(zip(header, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv'),
+    'jsonl': (stream_jsonl, 'application/x-ndjson'),
+}
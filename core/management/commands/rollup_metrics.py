@@ -0,0 +1,52 @@
+"""
+Management command to roll up daily KPIs for the trend charts.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from core.rollups import rollup_metrics
+
+
+class Command(BaseCommand):
+    help = 'Rolls bookings, revenue, client requests and reviews up into daily KPI rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backfill',
+            action='store_true',
+            help='Recompute every day since the earliest activity',
+        )
+        parser.add_argument(
+            '--since',
+            help='Recompute every day from this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--lookback',
+            type=int,
+            default=2,
+            help='Days already rolled up to recompute for late changes',
+        )
+        parser.add_argument(
+            '--chunk-days',
+            type=int,
+            default=31,
+            help='Days rolled up per set of grouped queries',
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError('--since must be a YYYY-MM-DD date.')
+
+        first, last, rows = rollup_metrics(
+            backfill=options['backfill'],
+            since=since,
+            lookback_days=options['lookback'],
+            chunk_days=options['chunk_days'],
+        )
+        if first is None:
+            self.stdout.write('No activity to roll up.')
+            return
+        self.stdout.write(self.style.SUCCESS(f'Rolled up {rows} days from {first} to {last}.'))
@@ -0,0 +1,50 @@
+"""
+Management command to deliver queued outbox emails.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.outbox import MAX_ATTEMPTS, deliver_queued_emails
+
+
+class Command(BaseCommand):
+    help = 'Sends due emails from the outbox in batches, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of emails sent per SMTP connection',
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=MAX_ATTEMPTS,
+            help='Give up on an email after this many failed attempts',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep running, polling every N seconds (0 drains once)',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            self.drain(options['batch_size'], options['max_attempts'])
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def drain(self, batch_size, max_attempts):
+        sent = retrying = failed = 0
+        while True:
+            batch = deliver_queued_emails(batch_size=batch_size, max_attempts=max_attempts)
+            sent, retrying, failed = sent + batch[0], retrying + batch[1], failed + batch[2]
+            if sum(batch) < batch_size:
+                break
+        self.stdout.write(self.style.SUCCESS(
+            f'Sent {sent} emails; {retrying} will be retried, {failed} failed permanently.'
+        ))
@@ -0,0 +1,93 @@
+"""
+Operations dashboard metrics.
+
+The KPI tiles on the admin dashboard are read from a ``MetricsSnapshot``
+row, cached in the shared cache for ``DASHBOARD_METRICS_TTL`` seconds.
+Saving or deleting users, expert profiles, bookings, payments or concierge
+requests marks the snapshot stale (see ``core.signals``), and the next
+dashboard load recomputes it with one aggregate query per table.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import MetricsSnapshot
+
+CACHE_KEY = 'core:dashboard-metrics'
+SNAPSHOT_PK = 1
+METRIC_FIELDS = [
+    'total_users', 'total_experts', 'total_bookings', 'recent_bookings', 'revenue_30d',
+    'pending_verifications', 'pending_concierge', 'disputed_bookings',
+]
+LISTED_STATUSES = ['vetted', 'active']
+PENDING_VERIFICATION_STATUSES = ['applied']
+
+
+def metrics_ttl():
+    return settings.DASHBOARD_METRICS_TTL
+
+
+def compute_metrics(now=None):
+    from accounts.models import User
+    from consultations.models import Booking, ConciergeRequest
+    from experts.models import ExpertProfile
+    from payments.models import Payment
+
+    now = now or timezone.now()
+    thirty_days_ago = now - timedelta(days=30)
+    experts = ExpertProfile.objects.aggregate(
+        total_experts=Count('pk', filter=Q(verification_status__in=LISTED_STATUSES)),
+        pending_verifications=Count('pk', filter=Q(verification_status__in=PENDING_VERIFICATION_STATUSES)),
+    )
+    bookings = Booking.objects.aggregate(
+        total_bookings=Count('pk'),
+        recent_bookings=Count('pk', filter=Q(created_at__gte=thirty_days_ago)),
+        disputed_bookings=Count('pk', filter=Q(status='disputed')),
+    )
+    revenue = Payment.objects.filter(
+        status='completed', paid_at__gte=thirty_days_ago
+    ).aggregate(total=Sum('amount'))['total']
+    return {
+        'total_users': User.objects.count(),
+        **experts,
+        **bookings,
+        'revenue_30d': revenue or 0,
+        'pending_concierge': ConciergeRequest.objects.filter(status='pending').count(),
+    }
+
+
+def refresh_metrics_snapshot(now=None):
+    now = now or timezone.now()
+    values = compute_metrics(now)
+    MetricsSnapshot.objects.update_or_create(
+        pk=SNAPSHOT_PK, defaults={**values, 'stale': False, 'computed_at': now}
+    )
+    cache.set(CACHE_KEY, values, metrics_ttl())
+    return values
+
+
+def get_dashboard_metrics():
+    """KPI values for the dashboard: from the cache, else from a fresh
+    snapshot row, else recomputed."""
+    values = cache.get(CACHE_KEY)
+    if values is not None:
+        return values
+    snapshot = MetricsSnapshot.objects.filter(pk=SNAPSHOT_PK).first()
+    if (
+        snapshot is not None
+        and not snapshot.stale
+        and snapshot.computed_at >= timezone.now() - timedelta(seconds=metrics_ttl())
+    ):
+        values = {name: getattr(snapshot, name) for name in METRIC_FIELDS}
+        cache.set(CACHE_KEY, values, metrics_ttl())
+        return values
+    return refresh_metrics_snapshot()
+
+
+def invalidate_dashboard_metrics():
+    cache.delete(CACHE_KEY)
+    # Matches nothing once the snapshot is already stale.
+    MetricsSnapshot.objects.filter(pk=SNAPSHOT_PK, stale=False).update(stale=True)
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_outboundemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricsSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_users', models.IntegerField(default=0)),
+                ('total_experts', models.IntegerField(default=0)),
+                ('total_bookings', models.IntegerField(default=0)),
+                ('recent_bookings', models.IntegerField(default=0, help_text='Bookings created in the last 30 days')),
+                ('revenue_30d', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('pending_verifications', models.IntegerField(default=0)),
+                ('pending_concierge', models.IntegerField(default=0)),
+                ('disputed_bookings', models.IntegerField(default=0)),
+                ('stale', models.BooleanField(default=True)),
+                ('computed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'core_metrics_snapshot',
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_metricssnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyKpi',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False)),
+                ('bookings_created', models.IntegerField(default=0)),
+                ('bookings_completed', models.IntegerField(default=0)),
+                ('payments_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('requests_submitted', models.IntegerField(default=0)),
+                ('requests_matched', models.IntegerField(default=0, help_text='Client requests whose first expert was proposed this day')),
+                ('match_seconds', models.BigIntegerField(default=0, help_text='Total submission-to-first-proposal time of requests matched this day')),
+                ('reviews_count', models.IntegerField(default=0)),
+                ('review_rating_sum', models.IntegerField(default=0)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'core_daily_kpi',
+                'ordering': ['day'],
+            },
+        ),
+    ]
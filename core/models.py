@@ -3,6 +3,7 @@ Core models for the Kairos platform.
 """
 import uuid
 from django.db import models
+from django.utils import timezone
 
 
 class ContactInquiry(models.Model):
@@ -57,3 +58,79 @@ class SiteSettings(models.Model):
     def get_settings(cls):
         settings, _ = cls.objects.get_or_create(pk=1)
         return settings
+
+
+class OutboundEmail(models.Model):
+    """A notification queued in the same transaction as the change that
+    triggered it and delivered later by ``send_queued_emails``."""
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'Queued'
+        SENT = 'sent', 'Sent'
+        FAILED = 'failed', 'Failed'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'core_outbound_email'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='core_outbound_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} -> {", ".join(self.recipients)}'
+
+
+class MetricsSnapshot(models.Model):
+    """Single row of operations dashboard KPIs, recomputed by
+    ``core.metrics`` when stale instead of on every dashboard load."""
+    total_users = models.IntegerField(default=0)
+    total_experts = models.IntegerField(default=0)
+    total_bookings = models.IntegerField(default=0)
+    recent_bookings = models.IntegerField(default=0, help_text='Bookings created in the last 30 days')
+    revenue_30d = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    pending_verifications = models.IntegerField(default=0)
+    pending_concierge = models.IntegerField(default=0)
+    disputed_bookings = models.IntegerField(default=0)
+    stale = models.BooleanField(default=True)
+    computed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'core_metrics_snapshot'
+
+    def __str__(self):
+        return f'Metrics snapshot at {self.computed_at}'
+
+
+class DailyKpi(models.Model):
+    """Per-day totals maintained by ``rollup_metrics`` so trend charts read
+    a few hundred small rows instead of grouping the source tables."""
+    day = models.DateField(primary_key=True)
+    bookings_created = models.IntegerField(default=0)
+    bookings_completed = models.IntegerField(default=0)
+    payments_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    requests_submitted = models.IntegerField(default=0)
+    requests_matched = models.IntegerField(default=0, help_text='Client requests whose first expert was proposed this day')
+    match_seconds = models.BigIntegerField(default=0, help_text='Total submission-to-first-proposal time of requests matched this day')
+    reviews_count = models.IntegerField(default=0)
+    review_rating_sum = models.IntegerField(default=0)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'core_daily_kpi'
+        ordering = ['day']
+
+    def __str__(self):
+        return f'KPIs for {self.day}'
@@ -0,0 +1,111 @@
+"""
+Transactional email outbox.
+
+Views call ``queue_email`` instead of ``send_mail``. The message is stored
+as an ``OutboundEmail`` row in the caller's transaction, so it is only sent
+if the change it describes commits, and the response never waits on SMTP.
+``send_queued_emails`` drains due rows in batches over one connection,
+retrying failures with exponential backoff.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 60
+MAX_BACKOFF_SECONDS = 6 * 60 * 60
+# Claimed rows are pushed this far into the future so concurrent workers
+# skip them; a worker that dies mid-batch releases them when it expires.
+CLAIM_SECONDS = 10 * 60
+
+
+def queue_email(subject, message, recipient_list, from_email=None):
+    """Queue a plain-text email. Takes the same arguments as ``send_mail``."""
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=list(recipient_list),
+    )
+
+
+def backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_SECONDS * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS))
+
+
+def claim_batch(batch_size, now):
+    with transaction.atomic():
+        emails = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboundEmail.Status.QUEUED, next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        OutboundEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+            next_attempt_at=now + timedelta(seconds=CLAIM_SECONDS)
+        )
+    return emails
+
+
+def deliver_queued_emails(batch_size=100, max_attempts=MAX_ATTEMPTS, now=None):
+    """Send up to ``batch_size`` due emails over a single connection.
+
+    Returns ``(sent, retrying, failed)`` counts for the batch.
+    """
+    now = now or timezone.now()
+    emails = claim_batch(batch_size, now)
+    if not emails:
+        return 0, 0, 0
+
+    sent, retrying, failed = [], [], []
+    attempted = set()
+    connection = get_connection()
+    try:
+        connection.open()
+        for email in emails:
+            email.attempts += 1
+            attempted.add(email.pk)
+            try:
+                EmailMessage(
+                    email.subject, email.body, email.from_email, email.recipients, connection=connection
+                ).send()
+            except Exception as exc:
+                email.last_error = f'{type(exc).__name__}: {exc}'
+                if email.attempts >= max_attempts:
+                    email.status = OutboundEmail.Status.FAILED
+                    failed.append(email)
+                else:
+                    email.next_attempt_at = now + backoff(email.attempts)
+                    retrying.append(email)
+            else:
+                email.status = OutboundEmail.Status.SENT
+                email.sent_at = timezone.now()
+                email.last_error = ''
+                sent.append(email)
+    except Exception as exc:
+        # The connection itself failed: every email not yet handled counts
+        # an attempt, so an SMTP outage backs off and eventually gives up.
+        handled = {email.pk for email in sent + retrying + failed}
+        for email in emails:
+            if email.pk in handled:
+                continue
+            if email.pk not in attempted:
+                email.attempts += 1
+            email.last_error = f'{type(exc).__name__}: {exc}'
+            if email.attempts >= max_attempts:
+                email.status = OutboundEmail.Status.FAILED
+                failed.append(email)
+            else:
+                email.next_attempt_at = now + backoff(email.attempts)
+                retrying.append(email)
+    finally:
+        connection.close()
+
+    OutboundEmail.objects.bulk_update(
+        emails, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+    )
+    return len(sent), len(retrying), len(failed)
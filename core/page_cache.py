@@ -0,0 +1,114 @@
+"""
+Full-page and fragment caching for the public marketing and blog pages.
+
+``cache_public_page(*groups)`` serves anonymous GET requests from the
+``listings`` cache. Requests from signed-in users or with pending flash
+messages, and responses that set cookies or a CSRF token, are never
+cached. Every response carries ``Vary: Cookie`` so shared caches keep the
+signed-in and anonymous variants apart.
+
+Pages are keyed on ``request.path`` and only the query parameters the
+view declares it reads (``params``), so tracking or cache-busting
+parameters cannot multiply the stored copies of a page.
+
+Cached entries are keyed on a generation number per group (``site``,
+``blog``, ``home``). ``invalidate_pages(*groups)`` bumps the generations,
+which orphans every page and fragment built from the old ones; the
+signal handlers in ``core.signals`` call it when blog posts, featured
+experts or site settings change.
+"""
+import hashlib
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+PAGE_CACHE_ALIAS = 'listings'
+PAGE_GROUPS = ['site', 'blog', 'home']
+
+
+def page_cache():
+    return caches[PAGE_CACHE_ALIAS]
+
+
+def page_cache_ttl():
+    return settings.PAGE_CACHE_TTL
+
+
+def generation_key(group):
+    return f'page-generation:{group}'
+
+
+def page_generations(*groups):
+    """Current generation of each group, as one string for cache keys."""
+    keys = [generation_key(group) for group in groups]
+    values = page_cache().get_many(keys)
+    missing = {key: 1 for key in keys if key not in values}
+    if missing:
+        page_cache().set_many(missing, None)
+        values.update(missing)
+    return '.'.join(str(values[key]) for key in keys)
+
+
+def invalidate_pages(*groups):
+    for group in groups or PAGE_GROUPS:
+        try:
+            page_cache().incr(generation_key(group))
+        except ValueError:
+            page_cache().set(generation_key(group), 1, None)
+
+
+def cacheable_request(request):
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and not len(get_messages(request))
+    )
+
+
+def cacheable_response(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+    )
+
+
+def page_key(view, request, groups, params):
+    query = urlencode([(name, value) for name in params for value in request.GET.getlist(name)])
+    path = hashlib.md5(f'{request.path}?{query}'.encode()).hexdigest()
+    return f'page:{view.__module__}.{view.__name__}:{page_generations(*groups)}:{path}'
+
+
+def cache_public_page(*groups, params=()):
+    """Cache the view's response for anonymous visitors. The ``site`` group
+    is always included because every page renders the site chrome.
+    ``params`` names the query parameters the view reads; any others are
+    left out of the cache key."""
+    groups = ('site',) + tuple(group for group in groups if group != 'site')
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not page_cache_ttl() or not cacheable_request(request):
+                response = view(request, *args, **kwargs)
+                patch_vary_headers(response, ['Cookie'])
+                return response
+            key = page_key(view, request, groups, params)
+            cached = page_cache().get(key)
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+            else:
+                response = view(request, *args, **kwargs)
+                if cacheable_response(request, response):
+                    page_cache().set(key, (response.content, response['Content-Type']), page_cache_ttl())
+            patch_vary_headers(response, ['Cookie'])
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,200 @@
+"""
+Keyset (cursor) pagination for listing pages.
+
+``django.core.paginator.Paginator`` counts the whole result set and then
+pages with ``OFFSET``, both of which get slower as tables grow. The cursor
+paginator instead seeks past the last row of the current page using the
+sort columns, so every page costs the same regardless of how deep it is.
+
+Cursors are opaque URL-safe tokens; templates build links with
+``{% querystring cursor=page.next_cursor %}``.
+"""
+import base64
+import binascii
+import datetime
+import json
+from collections.abc import Sequence
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """Keep full microsecond precision; DjangoJSONEncoder rounds datetimes to
+    milliseconds, which would make the seek skip or repeat rows."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(direction, values):
+    payload = json.dumps({'d': direction, 'v': values}, cls=CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction, values = payload['d'], payload['v']
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        raise InvalidCursor(token)
+    if direction not in (NEXT, PREVIOUS) or not isinstance(values, list):
+        raise InvalidCursor(token)
+    return direction, values
+
+
+class CursorPage(Sequence):
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self.object_list)} items>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Paginate a queryset by seeking on its ordering columns.
+
+    ``ordering`` defaults to the queryset's ordering; the primary key is
+    appended when missing so the sort key is always unique. Ordering columns
+    must be model fields or annotations on the queryset itself (no
+    ``__`` lookups across relations).
+
+    ``count`` is optional and never exact on large tables: it is capped at
+    ``count_limit`` rows (``count_is_estimate`` tells the template to show
+    "1000+"), and on PostgreSQL an unfiltered table uses the planner's row
+    estimate instead of ``COUNT(*)``.
+    """
+
+    def __init__(self, queryset, per_page, ordering=None, count_limit=1000):
+        ordering = list(ordering or queryset.query.order_by or queryset.model._meta.ordering)
+        if not any(name.lstrip('-') in ('pk', queryset.model._meta.pk.name) for name in ordering):
+            ordering.append('pk')
+        self.ordering = ordering
+        self.queryset = queryset.order_by(*ordering)
+        self.per_page = per_page
+        self.count_limit = count_limit
+        self._count = None
+        self.count_is_estimate = False
+
+    @property
+    def keys(self):
+        return [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    @property
+    def count(self):
+        if self._count is None:
+            self._count = self._estimate_count()
+        return self._count
+
+    def _estimate_count(self):
+        queryset = self.queryset
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] > self.count_limit:
+                self.count_is_estimate = True
+                return row[0]
+        count = queryset.order_by()[:self.count_limit].count()
+        self.count_is_estimate = count >= self.count_limit
+        return count
+
+    def get_page(self, cursor=None):
+        """Return the page for ``cursor``; a missing or invalid cursor gives
+        the first page."""
+        direction, values = NEXT, None
+        if cursor:
+            try:
+                direction, values = decode_cursor(cursor)
+                values = self._to_python(values)
+            except (InvalidCursor, ValueError, TypeError, KeyError, ValidationError):
+                direction, values = NEXT, None
+
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, forward=direction == NEXT))
+        if direction == PREVIOUS:
+            queryset = queryset.reverse()
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == PREVIOUS:
+            rows.reverse()
+
+        if not rows:
+            return CursorPage(rows, self)
+
+        if direction == NEXT:
+            has_next, has_previous = has_more, values is not None
+        else:
+            has_next, has_previous = True, has_more
+        return CursorPage(
+            rows,
+            self,
+            next_cursor=encode_cursor(NEXT, self._values(rows[-1])) if has_next else None,
+            previous_cursor=encode_cursor(PREVIOUS, self._values(rows[0])) if has_previous else None,
+        )
+
+    def _values(self, obj):
+        return [getattr(obj, name) for name, _ in self.keys]
+
+    def _to_python(self, values):
+        if len(values) != len(self.keys):
+            raise ValueError('Cursor does not match ordering')
+        return [self._field(name).to_python(value) for (name, _), value in zip(self.keys, values)]
+
+    def _field(self, name):
+        opts = self.queryset.model._meta
+        if name == 'pk':
+            return opts.pk
+        try:
+            return opts.get_field(name)
+        except FieldDoesNotExist:
+            return self.queryset.query.annotations[name].output_field
+
+    def _seek(self, values, forward):
+        """Rows strictly after (or before) ``values`` in sort order, written
+        as ``(a < x) OR (a = x AND b < y) OR ...`` so each branch can use the
+        sort index."""
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self.keys, values):
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
@@ -0,0 +1,174 @@
+"""
+In-process publish/subscribe for waking waiting async views.
+
+Long-polling requests subscribe to a channel (for example
+``thread:<id>``) and sleep until something is published on it, instead of
+re-querying the database in a loop. ``publish`` is safe to call from sync
+code, typically from ``transaction.on_commit`` after the change is visible
+to other connections.
+
+``PUBSUB_BROKER = 'local'`` only reaches subscribers in the same process,
+so waiting views still re-check the database every few seconds to pick up
+changes committed by other processes. ``'postgres'`` fans messages out
+across processes and nodes with ``LISTEN``/``NOTIFY`` on the default
+database.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Messages published on ``channels`` while the ``async with`` block is
+    open, queued on the subscriber's event loop."""
+
+    def __init__(self, broker, channels):
+        self.broker = broker
+        self.channels = channels
+        self.queue = None
+        self.loop = None
+
+    async def __aenter__(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.broker.add(self)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.broker.remove(self)
+
+    def deliver(self, message):
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, message)
+        except RuntimeError:
+            # The subscriber's loop closed before it unsubscribed.
+            pass
+
+    async def get(self, timeout=None):
+        """Next message, or ``None`` if ``timeout`` seconds pass first."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except TimeoutError:
+            return None
+
+
+class LocalBroker:
+    name = 'local'
+
+    def __init__(self):
+        self.subscribers = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def subscribe(self, *channels):
+        return Subscription(self, channels)
+
+    def add(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                self.subscribers[channel].add(subscription)
+
+    def remove(self, subscription):
+        with self.lock:
+            for channel in subscription.channels:
+                self.subscribers[channel].discard(subscription)
+                if not self.subscribers[channel]:
+                    del self.subscribers[channel]
+
+    def publish(self, channel, message):
+        with self.lock:
+            subscriptions = list(self.subscribers.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.deliver({'channel': channel, **message})
+        return len(subscriptions)
+
+
+class PostgresBroker(LocalBroker):
+    """Publishes with ``pg_notify`` and delivers to local subscribers from a
+    listener thread holding its own connection, so every process that has
+    subscribers sees every message."""
+
+    name = 'postgres'
+    notify_channel = 'kairos_pubsub'
+    reconnect_seconds = 5
+
+    def __init__(self):
+        super().__init__()
+        self.listener = None
+
+    def add(self, subscription):
+        super().add(subscription)
+        with self.lock:
+            if self.listener is None or not self.listener.is_alive():
+                self.listener = threading.Thread(target=self.listen, name='pubsub-listener', daemon=True)
+                self.listener.start()
+
+    def publish(self, channel, message):
+        payload = json.dumps({'channel': channel, 'message': message})
+        with connections['default'].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.notify_channel, payload])
+        return 1
+
+    def listen(self):
+        while True:
+            try:
+                self.listen_once()
+            except Exception:
+                logger.exception('Pub/sub listener lost its connection; reconnecting')
+            threading.Event().wait(self.reconnect_seconds)
+
+    def listen_once(self):
+        wrapper = connections['default']
+        connection = wrapper.get_new_connection(wrapper.get_connection_params())
+        connection.autocommit = True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f'LISTEN {self.notify_channel}')
+            while True:
+                if select.select([connection], [], [], self.reconnect_seconds) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    notify = connection.notifies.pop(0)
+                    event = json.loads(notify.payload)
+                    LocalBroker.publish(self, event['channel'], event['message'])
+        finally:
+            connection.close()
+
+
+BROKERS = {broker.name: broker for broker in (LocalBroker, PostgresBroker)}
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        name = getattr(settings, 'PUBSUB_BROKER', LocalBroker.name)
+        if _broker is None or _broker.name != name:
+            try:
+                _broker = BROKERS[name]()
+            except KeyError:
+                raise ImproperlyConfigured(
+                    f'PUBSUB_BROKER must be one of {", ".join(BROKERS)}, not {name!r}.'
+                )
+        return _broker
+
+
+def publish(channel, message):
+    """Publish ``message`` (a JSON-serialisable dict) on ``channel``.
+    Failures are logged, never raised, so a broker outage cannot break the
+    write that triggered it."""
+    try:
+        return get_broker().publish(channel, message)
+    except Exception:
+        logger.exception('Could not publish to %s', channel)
+        return 0
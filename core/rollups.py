@@ -0,0 +1,233 @@
+"""
+Daily KPI rollups.
+
+``rollup_days`` turns a range of days into ``DailyKpi`` rows with one
+grouped query per source table (bookings, payments, engagement requests
+and their progress events, reviews). ``rollup_metrics`` runs it
+incrementally for the days since the last rollup, re-covering a short
+lookback for late changes. The trend helpers below group at most a year
+of daily rows in Python, so the dashboard never touches the source tables.
+"""
+from collections import OrderedDict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyKpi
+
+MATCH_EVENT = 'expert_proposed'
+KPI_FIELDS = [
+    'bookings_created', 'bookings_completed', 'payments_count', 'revenue', 'requests_submitted',
+    'requests_matched', 'match_seconds', 'reviews_count', 'review_rating_sum',
+]
+
+
+def day_bounds(start, end):
+    """Aware datetimes covering ``start`` through ``end`` inclusive."""
+    return (
+        timezone.make_aware(datetime.combine(start, time.min)),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)),
+    )
+
+
+def grouped_by_day(queryset, field, **aggregates):
+    return {
+        row['day']: row
+        for row in queryset.annotate(day=TruncDate(field)).values('day').annotate(**aggregates).order_by()
+    }
+
+
+def rollup_days(start, end):
+    """Recompute ``DailyKpi`` rows for every day from ``start`` to ``end``.
+    Returns the number of rows written."""
+    from consultations.models import Booking, Review
+    from engagements.models import ClientRequest, ProgressEvent
+    from payments.models import Payment
+
+    if start > end:
+        return 0
+    lower, upper = day_bounds(start, end)
+    created = grouped_by_day(
+        Booking.objects.filter(created_at__gte=lower, created_at__lt=upper), 'created_at', count=Count('id')
+    )
+    completed = grouped_by_day(
+        Booking.objects.filter(status='completed', completed_at__gte=lower, completed_at__lt=upper),
+        'completed_at', count=Count('id')
+    )
+    payments = grouped_by_day(
+        Payment.objects.filter(status='completed', paid_at__gte=lower, paid_at__lt=upper),
+        'paid_at', count=Count('id'), total=Sum('amount')
+    )
+    submitted = grouped_by_day(
+        ClientRequest.objects.filter(created_at__gte=lower, created_at__lt=upper), 'created_at', count=Count('id')
+    )
+    reviews = grouped_by_day(
+        Review.objects.filter(is_public=True, created_at__gte=lower, created_at__lt=upper),
+        'created_at', count=Count('id'), total=Sum('rating')
+    )
+    matched = {}
+    first_proposals = ProgressEvent.objects.filter(event_type=MATCH_EVENT).values('request_id').annotate(
+        matched_at=Min('created_at'), submitted_at=Min('request__created_at')
+    ).filter(matched_at__gte=lower, matched_at__lt=upper).order_by()
+    for row in first_proposals:
+        day = timezone.localtime(row['matched_at']).date()
+        count, seconds = matched.get(day, (0, 0))
+        matched[day] = (count + 1, seconds + int((row['matched_at'] - row['submitted_at']).total_seconds()))
+
+    rows = []
+    day = start
+    while day <= end:
+        rows.append(DailyKpi(
+            day=day,
+            bookings_created=created.get(day, {}).get('count', 0),
+            bookings_completed=completed.get(day, {}).get('count', 0),
+            payments_count=payments.get(day, {}).get('count', 0),
+            revenue=payments.get(day, {}).get('total') or 0,
+            requests_submitted=submitted.get(day, {}).get('count', 0),
+            requests_matched=matched.get(day, (0, 0))[0],
+            match_seconds=matched.get(day, (0, 0))[1],
+            reviews_count=reviews.get(day, {}).get('count', 0),
+            review_rating_sum=reviews.get(day, {}).get('total') or 0,
+        ))
+        day += timedelta(days=1)
+    with transaction.atomic():
+        DailyKpi.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['day'], update_fields=KPI_FIELDS + ['computed_at']
+        )
+    return len(rows)
+
+
+def earliest_activity():
+    from consultations.models import Booking, Review
+    from engagements.models import ClientRequest
+    from payments.models import Payment
+
+    candidates = [
+        Booking.objects.aggregate(first=Min('created_at'))['first'],
+        Payment.objects.aggregate(first=Min('paid_at'))['first'],
+        ClientRequest.objects.aggregate(first=Min('created_at'))['first'],
+        Review.objects.aggregate(first=Min('created_at'))['first'],
+    ]
+    candidates = [timezone.localtime(value).date() for value in candidates if value]
+    return min(candidates) if candidates else None
+
+
+def rollup_metrics(backfill=False, since=None, lookback_days=2, chunk_days=31, today=None):
+    """Roll up new days (plus ``lookback_days`` already rolled up) through
+    today. ``backfill`` starts from the earliest activity instead; ``since``
+    forces a start date. Returns ``(first_day, last_day, rows)``."""
+    today = today or timezone.localdate()
+    if since is not None:
+        start = since
+    elif backfill:
+        start = earliest_activity()
+    else:
+        last = DailyKpi.objects.order_by('-day').values_list('day', flat=True).first()
+        start = last - timedelta(days=lookback_days) if last else earliest_activity()
+    if start is None:
+        return None, None, 0
+
+    rows = 0
+    chunk_start = start
+    while chunk_start <= today:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), today)
+        rows += rollup_days(chunk_start, chunk_end)
+        chunk_start = chunk_end + timedelta(days=1)
+    return start, today, rows
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def months_back(today, months):
+    index = today.year * 12 + today.month - 1 - (months - 1)
+    return today.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def daily_rows(start, end):
+    return {row.day: row for row in DailyKpi.objects.filter(day__gte=start, day__lte=end)}
+
+
+def bucketed(start, end, bucket, value):
+    """``[(bucket_start, [rows...])]`` for every bucket from ``start`` to
+    ``end``, including empty ones."""
+    rows = daily_rows(start, end)
+    buckets = OrderedDict()
+    day = start
+    while day <= end:
+        buckets.setdefault(bucket(day), [])
+        if day in rows:
+            buckets[bucket(day)].append(rows[day])
+        day += timedelta(days=1)
+    return [(key, value(group)) for key, group in buckets.items()]
+
+
+def ratio(numerator, denominator, places='0.01'):
+    if not denominator:
+        return None
+    return (Decimal(numerator) / denominator).quantize(Decimal(places))
+
+
+def bookings_per_day(days=90, today=None):
+    today = today or timezone.localdate()
+    return bucketed(
+        today - timedelta(days=days - 1), today, lambda day: day,
+        lambda rows: sum(row.bookings_created for row in rows)
+    )
+
+
+def revenue_per_week(weeks=52, today=None):
+    today = today or timezone.localdate()
+    return bucketed(
+        week_start(today) - timedelta(weeks=weeks - 1), today, week_start,
+        lambda rows: sum((row.revenue for row in rows), Decimal('0'))
+    )
+
+
+def time_to_match_per_month(months=12, today=None):
+    """Average hours from request submission to first expert proposal."""
+    today = today or timezone.localdate()
+    return bucketed(
+        months_back(today, months), today, month_start,
+        lambda rows: ratio(sum(row.match_seconds for row in rows), 3600 * sum(row.requests_matched for row in rows), '0.1')
+    )
+
+
+def review_average_per_month(months=12, today=None):
+    today = today or timezone.localdate()
+    return bucketed(
+        months_back(today, months), today, month_start,
+        lambda rows: ratio(sum(row.review_rating_sum for row in rows), sum(row.reviews_count for row in rows))
+    )
+
+
+def monthly_trends(months=12, today=None):
+    """One dict per month with bookings, revenue, average time-to-match
+    (hours) and review average, oldest first."""
+    today = today or timezone.localdate()
+
+    def summarise(rows):
+        return {
+            'bookings': sum(row.bookings_created for row in rows),
+            'completed': sum(row.bookings_completed for row in rows),
+            'revenue': sum((row.revenue for row in rows), Decimal('0')),
+            'requests': sum(row.requests_submitted for row in rows),
+            'match_hours': ratio(
+                sum(row.match_seconds for row in rows), 3600 * sum(row.requests_matched for row in rows), '0.1'
+            ),
+            'review_average': ratio(sum(row.review_rating_sum for row in rows), sum(row.reviews_count for row in rows)),
+        }
+
+    return [
+        {'month': month, **values}
+        for month, values in bucketed(months_back(today, months), today, month_start, summarise)
+    ]
@@ -0,0 +1,72 @@
+"""
+Signal handlers marking the dashboard metrics snapshot stale and
+invalidating cached public pages.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+
+from .metrics import invalidate_dashboard_metrics
+from .page_cache import invalidate_pages
+
+METRIC_SOURCES = [
+    settings.AUTH_USER_MODEL,
+    'experts.ExpertProfile',
+    'consultations.Booking',
+    'consultations.ConciergeRequest',
+    'payments.Payment',
+]
+
+
+def metrics_source_changed(sender, raw=False, update_fields=None, **kwargs):
+    # Every sign-in saves last_login; no dashboard metric reads it.
+    if raw or update_fields == {'last_login'}:
+        return
+    transaction.on_commit(invalidate_dashboard_metrics)
+
+
+for source in METRIC_SOURCES:
+    post_save.connect(metrics_source_changed, sender=source, dispatch_uid=f'metrics-save-{source}')
+    post_delete.connect(metrics_source_changed, sender=source, dispatch_uid=f'metrics-delete-{source}')
+
+
+def invalidate_pages_on_commit(*groups):
+    transaction.on_commit(lambda: invalidate_pages(*groups))
+
+
+def site_settings_changed(sender, raw=False, **kwargs):
+    if not raw:
+        invalidate_pages_on_commit()
+
+
+def blog_post_changed(sender, raw=False, **kwargs):
+    if not raw:
+        invalidate_pages_on_commit('blog')
+
+
+def expertise_tag_changed(sender, raw=False, **kwargs):
+    if not raw:
+        invalidate_pages_on_commit('home')
+
+
+def remember_featured(sender, instance, **kwargs):
+    instance._was_featured = instance.is_featured
+
+
+def expert_profile_changed(sender, instance, raw=False, **kwargs):
+    """Featured experts are shown on the home page, so any change to one,
+    or to whether a profile is featured, invalidates it."""
+    if not raw and (instance.is_featured or getattr(instance, '_was_featured', False)):
+        invalidate_pages_on_commit('home')
+    instance._was_featured = instance.is_featured
+
+
+post_save.connect(site_settings_changed, sender='core.SiteSettings', dispatch_uid='pages-save-site-settings')
+post_delete.connect(site_settings_changed, sender='core.SiteSettings', dispatch_uid='pages-delete-site-settings')
+post_save.connect(blog_post_changed, sender='blog.BlogPost', dispatch_uid='pages-save-blog-post')
+post_delete.connect(blog_post_changed, sender='blog.BlogPost', dispatch_uid='pages-delete-blog-post')
+post_save.connect(expertise_tag_changed, sender='experts.ExpertiseTag', dispatch_uid='pages-save-expertise-tag')
+post_delete.connect(expertise_tag_changed, sender='experts.ExpertiseTag', dispatch_uid='pages-delete-expertise-tag')
+post_init.connect(remember_featured, sender='experts.ExpertProfile', dispatch_uid='pages-init-expert-profile')
+post_save.connect(expert_profile_changed, sender='experts.ExpertProfile', dispatch_uid='pages-save-expert-profile')
+post_delete.connect(expert_profile_changed, sender='experts.ExpertProfile', dispatch_uid='pages-delete-expert-profile')
@@ -1,3 +1,433 @@
-from django.test import TestCase
+"""
+Tests for core app.
+"""
+import csv
+import json
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from smtplib import SMTPException
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import AuditLog, User
+from availability.models import AvailabilityBlock
+from availability.slots import materialise_slots
+from blog.models import BlogPost
+from consultations.models import Booking, ConciergeRequest, Review
+from core.metrics import get_dashboard_metrics, refresh_metrics_snapshot
+from core.models import DailyKpi, MetricsSnapshot, OutboundEmail
+from core.outbox import deliver_queued_emails, queue_email
+from core.pagination import CursorPaginator
+from core.pubsub import LocalBroker, get_broker
+from core.rollups import bookings_per_day, monthly_trends, revenue_per_week, rollup_days, rollup_metrics
+from engagements.models import ClientRequest, ProgressEvent
+from experts.tests import make_expert
+from kairos.caches import build_caches, cache_config
+from payments.models import Payment
+
+
+class CursorPaginatorTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='ops@test.com',
+            password='testpass123',
+            first_name='Ops',
+            last_name='Admin',
+            role=User.Role.ADMIN,
+            is_staff=True,
+        )
+        base = timezone.now()
+        for i in range(7):
+            log = AuditLog.objects.create(
+                user=self.user,
+                event_type=AuditLog.EventType.USER_LOGIN,
+                description=f'Event {i}',
+            )
+            # Two rows share each timestamp so the id tie-breaker matters.
+            AuditLog.objects.filter(pk=log.pk).update(created_at=base - timedelta(minutes=i // 2))
+        self.logs = AuditLog.objects.order_by('-created_at', 'id')
+        self.expected = list(self.logs)
+
+    def test_walks_forward_and_back_without_gaps(self):
+        paginator = CursorPaginator(self.logs, 3)
+        first = paginator.get_page()
+        self.assertEqual(list(first), self.expected[:3])
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.has_next())
+
+        second = paginator.get_page(first.next_cursor)
+        self.assertEqual(list(second), self.expected[3:6])
+        third = paginator.get_page(second.next_cursor)
+        self.assertEqual(list(third), self.expected[6:])
+        self.assertFalse(third.has_next())
+
+        back = paginator.get_page(third.previous_cursor)
+        self.assertEqual(list(back), self.expected[3:6])
+        self.assertTrue(back.has_next())
+        self.assertEqual(list(paginator.get_page(back.previous_cursor)), self.expected[:3])
+        self.assertFalse(paginator.get_page(back.previous_cursor).has_previous())
+
+    def test_invalid_cursor_returns_first_page(self):
+        paginator = CursorPaginator(self.logs, 3)
+        for cursor in ['garbage', 'e30', '!!!']:
+            self.assertEqual(list(paginator.get_page(cursor)), self.expected[:3])
+
+    def test_count_is_capped(self):
+        paginator = CursorPaginator(self.logs, 3, count_limit=5)
+        self.assertEqual(paginator.count, 5)
+        self.assertTrue(paginator.count_is_estimate)
+        paginator = CursorPaginator(self.logs, 3)
+        self.assertEqual(paginator.count, 7)
+        self.assertFalse(paginator.count_is_estimate)
+
+    def test_audit_log_view_uses_cursor(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/operations/audit-log/')
+        self.assertEqual(response.status_code, 200)
+        page = response.context['logs']
+        self.assertEqual(len(page), 7)
+        self.assertFalse(page.has_other_pages())
+
+
+class MatchConciergeTests(TestCase):
+    def test_candidates_ranked_by_availability(self):
+        staff = User.objects.create_user(
+            email='ops@test.com', password='testpass123', first_name='Ops', last_name='Admin',
+            role=User.Role.ADMIN, is_staff=True,
+        )
+        unavailable = make_expert('later@test.com', 'Later', 'Expert')
+        available = make_expert('soon@test.com', 'Soon', 'Expert')
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        AvailabilityBlock.objects.create(
+            expert=available, day_of_week=tomorrow.weekday(), start_time='09:00', end_time='10:00'
+        )
+        materialise_slots(available)
+        concierge = ConciergeRequest.objects.create(client=staff, description='Need help')
+
+        self.client.force_login(staff)
+        response = self.client.get(f'/operations/concierge/{concierge.pk}/')
+        self.assertEqual(response.status_code, 200)
+        ranked = [expert for expert, _ in response.context['experts']]
+        self.assertEqual(ranked, [available, unavailable])
+        self.assertEqual(response.context['experts'][0][1].free_hours, 1)
+
+
+class OutboxTests(TestCase):
+    def test_view_queues_email_and_worker_sends_it(self):
+        staff = User.objects.create_user(
+            email='ops@test.com', password='testpass123', first_name='Ops', last_name='Admin',
+            role=User.Role.ADMIN, is_staff=True,
+        )
+        expert = make_expert('expert@test.com', 'New', 'Expert')
+        concierge = ConciergeRequest.objects.create(client=staff, description='Need help')
+
+        self.client.force_login(staff)
+        self.client.post(f'/operations/concierge/{concierge.pk}/', {'expert_id': expert.pk})
+        self.assertEqual(mail.outbox, [])
+        queued = OutboundEmail.objects.get()
+        self.assertEqual(queued.recipients, ['ops@test.com'])
+
+        out = StringIO()
+        call_command('send_queued_emails', stdout=out)
+        self.assertIn('Sent 1 emails', out.getvalue())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'We found an expert for you - Kairos')
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, OutboundEmail.Status.SENT)
+
+    def test_failures_back_off_then_give_up(self):
+        email = queue_email('Hello', 'Body', ['someone@test.com'])
+        now = timezone.now()
+        with mock.patch('core.outbox.EmailMessage.send', side_effect=SMTPException('down')):
+            self.assertEqual(deliver_queued_emails(max_attempts=2, now=now), (0, 1, 0))
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), (OutboundEmail.Status.QUEUED, 1))
+            self.assertEqual(email.next_attempt_at, now + timedelta(seconds=60))
+            self.assertIn('down', email.last_error)
+
+            # Not due yet.
+            self.assertEqual(deliver_queued_emails(max_attempts=2, now=now + timedelta(seconds=30)), (0, 0, 0))
+            self.assertEqual(deliver_queued_emails(max_attempts=2, now=now + timedelta(seconds=60)), (0, 0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.Status.FAILED)
+        self.assertEqual(mail.outbox, [])
+
+    def test_connection_failures_count_attempts_then_give_up(self):
+        email = queue_email('Hello', 'Body', ['someone@test.com'])
+        now = timezone.now()
+        with mock.patch('core.outbox.get_connection') as get_connection:
+            get_connection.return_value.open.side_effect = SMTPException('refused')
+            self.assertEqual(deliver_queued_emails(max_attempts=3, now=now), (0, 1, 0))
+            self.assertEqual(deliver_queued_emails(max_attempts=3, now=now + timedelta(seconds=60)), (0, 1, 0))
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), (OutboundEmail.Status.QUEUED, 2))
+            self.assertIn('refused', email.last_error)
+
+            self.assertEqual(deliver_queued_emails(max_attempts=3, now=email.next_attempt_at), (0, 0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.Status.FAILED, 3))
+
+
+class AuditLogExportTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(
+            email='ops@test.com', password='testpass123', first_name='Ops', last_name='Admin',
+            role=User.Role.ADMIN, is_staff=True,
+        )
+        self.member = User.objects.create_user(
+            email='member@test.com', password='testpass123', first_name='Mem', last_name='Ber',
+        )
+        for user, event_type, days_ago in [
+            (self.member, AuditLog.EventType.USER_LOGIN, 40),
+            (self.member, AuditLog.EventType.PROFILE_UPDATED, 5),
+            (self.staff, AuditLog.EventType.USER_LOGIN, 5),
+        ]:
+            log = AuditLog.objects.create(user=user, event_type=event_type, description=event_type,
+                                          metadata={'days_ago': days_ago})
+            AuditLog.objects.filter(pk=log.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        self.client.force_login(self.staff)
+
+    def export(self, **params):
+        response = self.client.get('/operations/audit-log/export/', params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export_filters_by_user_and_range(self):
+        start = (timezone.localdate() - timedelta(days=10)).isoformat()
+        rows = list(csv.DictReader(StringIO(self.export(format='csv', user='member@test.com', start=start))))
+        self.assertEqual([row['event_type'] for row in rows], ['profile_updated'])
+        self.assertEqual(rows[0]['user_email'], 'member@test.com')
+        self.assertEqual(json.loads(rows[0]['metadata']), {'days_ago': 5})
+
+    def test_jsonl_export_filters_by_event_type(self):
+        lines = self.export(format='jsonl', event_type='user_login').splitlines()
+        self.assertEqual([json.loads(line)['user_email'] for line in lines], ['member@test.com', 'ops@test.com'])
+        # The export itself is audited.
+        self.assertTrue(AuditLog.objects.filter(description='Audit log exported', user=self.staff).exists())
+
+    def test_rejects_bad_parameters_and_non_staff(self):
+        self.assertEqual(self.client.get('/operations/audit-log/export/', {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get('/operations/audit-log/export/', {'start': 'soon'}).status_code, 400)
+        self.assertEqual(self.client.get('/operations/audit-log/export/', {'end': '2024-02-30'}).status_code, 400)
+        self.client.force_login(self.member)
+        self.assertEqual(self.client.get('/operations/audit-log/export/').status_code, 302)
+
+
+class DashboardMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user(
+            email='ops@test.com', password='testpass123', first_name='Ops', last_name='Admin',
+            role=User.Role.ADMIN, is_staff=True,
+        )
+        self.expert = make_expert('expert@test.com', 'Thandi', 'Expert')
+
+    def test_dashboard_reads_cached_snapshot(self):
+        self.client.force_login(self.staff)
+        response = self.client.get('/operations/')
+        self.assertEqual((response.context['total_users'], response.context['total_experts']), (2, 1))
+        self.assertFalse(MetricsSnapshot.objects.get().stale)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_dashboard_metrics()['total_bookings'], 0)
+
+    def test_writes_mark_snapshot_stale(self):
+        get_dashboard_metrics()
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(client=self.staff, expert=self.expert, problem_statement='Help')
+        self.assertTrue(MetricsSnapshot.objects.get().stale)
+
+        metrics = get_dashboard_metrics()
+        self.assertEqual((metrics['total_bookings'], metrics['recent_bookings']), (1, 1))
+        self.assertFalse(MetricsSnapshot.objects.get().stale)
+
+    def test_sign_in_does_not_mark_snapshot_stale(self):
+        get_dashboard_metrics()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.login(email='ops@test.com', password='testpass123')
+        self.assertFalse(MetricsSnapshot.objects.get().stale)
+
+    def test_snapshot_row_serves_cache_misses_until_ttl(self):
+        refresh_metrics_snapshot()
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(get_dashboard_metrics()['total_users'], 2)
+
+
+class KpiRollupTests(TestCase):
+    def setUp(self):
+        self.client_user = User.objects.create_user(
+            email='client@test.com', password='testpass123', first_name='C', last_name='L',
+        )
+        self.expert = make_expert('expert@test.com', 'Lindiwe', 'Expert')
+        self.today = timezone.localdate()
+        self.ten_days_ago = timezone.now() - timedelta(days=10)
+
+    def backdate(self, model, obj, **fields):
+        model.objects.filter(pk=obj.pk).update(**fields)
+
+    def test_rollup_and_trend_helpers(self):
+        booking = Booking.objects.create(client=self.client_user, expert=self.expert, problem_statement='Help')
+        self.backdate(Booking, booking, created_at=self.ten_days_ago)
+        Payment.objects.create(booking=booking, payer=self.client_user, amount=Decimal('1500.00'),
+                               status='completed', paid_at=self.ten_days_ago)
+        review = Review.objects.create(booking=booking, reviewer=self.client_user, reviewee=self.expert.user, rating=4)
+        self.backdate(Review, review, created_at=self.ten_days_ago)
+        request = ClientRequest.objects.create(client=self.client_user, organisation_name='Acme', brief='Help')
+        self.backdate(ClientRequest, request, created_at=self.ten_days_ago - timedelta(hours=6))
+        event = ProgressEvent.objects.create(request=request, event_type='expert_proposed', message='Proposed')
+        self.backdate(ProgressEvent, event, created_at=self.ten_days_ago)
+
+        out = StringIO()
+        call_command('rollup_metrics', '--backfill', stdout=out)
+        first_day = timezone.localtime(self.ten_days_ago - timedelta(hours=6)).date()
+        self.assertIn(f'from {first_day} to {self.today}', out.getvalue())
+        day = DailyKpi.objects.get(day=timezone.localtime(self.ten_days_ago).date())
+        self.assertEqual((day.bookings_created, day.payments_count, day.revenue), (1, 1, Decimal('1500.00')))
+        self.assertEqual((day.requests_matched, day.match_seconds), (1, 6 * 3600))
+
+        with self.assertNumQueries(1):
+            trends = monthly_trends(12)
+        self.assertEqual(len(trends), 12)
+        self.assertEqual(sum(month['bookings'] for month in trends), 1)
+        self.assertEqual([month['match_hours'] for month in trends if month['match_hours']], [Decimal('6.0')])
+        self.assertEqual([month['review_average'] for month in trends if month['review_average']], [Decimal('4.00')])
+        self.assertEqual(sum(value for _, value in revenue_per_week(4)), Decimal('1500.00'))
+        self.assertEqual(len(bookings_per_day(30)), 30)
+
+    def test_incremental_run_only_covers_recent_days(self):
+        rollup_days(self.today - timedelta(days=20), self.today - timedelta(days=5))
+        first, last, rows = rollup_metrics(lookback_days=2)
+        self.assertEqual((first, last, rows), (self.today - timedelta(days=7), self.today, 8))
+
+
+class CacheConfigTests(TestCase):
+    def test_defaults_to_locmem_per_alias(self):
+        caches = build_caches({})
+        self.assertEqual(sorted(caches), ['default', 'listings', 'sessions'])
+        self.assertEqual(caches['listings']['BACKEND'], 'django.core.cache.backends.locmem.LocMemCache')
+        self.assertEqual(caches['sessions']['LOCATION'], 'kairos-sessions')
+
+    def test_redis_url_with_prefix_and_version(self):
+        config = cache_config('redis://cache:6379/1?key_prefix=prod&version=3', 'listings')
+        self.assertEqual(config['LOCATION'], 'redis://cache:6379/1')
+        self.assertEqual((config['KEY_PREFIX'], config['VERSION']), ('prod:listings', 3))
+
+    def test_alias_override_and_memcached_hosts(self):
+        caches = build_caches({
+            'CACHE_URL': 'memcache://mc1:11211,mc2:11211',
+            'CACHE_URL_SESSIONS': 'file:///tmp/kairos-cache',
+        })
+        self.assertEqual(caches['default']['LOCATION'], ['mc1:11211', 'mc2:11211'])
+        self.assertEqual(caches['sessions']['LOCATION'], '/tmp/kairos-cache/sessions')
+
+    def test_unknown_scheme_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            cache_config('couchbase://cache')
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        caches['listings'].clear()
+
+    def test_anonymous_page_is_served_from_cache(self):
+        self.client.get('/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_signed_in_users_are_not_served_cached_pages(self):
+        self.client.get('/terms/')
+        user = User.objects.create_user(
+            email='client@test.com', password='testpass123', first_name='Ama', last_name='Client',
+        )
+        self.client.force_login(user)
+        self.assertContains(self.client.get('/terms/'), 'Ama')
+
+    def test_featuring_an_expert_invalidates_the_home_page(self):
+        expert = make_expert(
+            'featured@test.com', 'Lerato', 'Featured', verification_status='active',
+            is_publicly_listed=True, privacy_level='public',
+        )
+        self.assertNotContains(self.client.get('/'), 'Lerato Featured')
+        with self.captureOnCommitCallbacks(execute=True):
+            expert.is_featured = True
+            expert.save()
+        self.assertContains(self.client.get('/'), 'Lerato Featured')
+
+    def test_blog_post_changes_invalidate_blog_pages(self):
+        self.assertNotContains(self.client.get('/blog/'), 'Pricing research')
+        with self.captureOnCommitCallbacks(execute=True):
+            BlogPost.objects.create(title='Pricing research', excerpt='Notes', content='Body', is_published=True)
+        self.assertContains(self.client.get('/blog/'), 'Pricing research')
+
+    def test_key_ignores_query_params_the_view_does_not_read(self):
+        for i in range(10):
+            BlogPost.objects.create(title=f'Post number {i}', excerpt='Notes', content='Body', is_published=True)
+        self.assertNotContains(self.client.get('/blog/'), 'Post number 0<')
+        with self.assertNumQueries(0):
+            self.client.get('/blog/', {'utm_source': 'newsletter'})
+        self.assertContains(self.client.get('/blog/', {'page': 2, 'utm_source': 'newsletter'}), 'Post number 0<')
+
+
+class PubSubTests(TestCase):
+    def test_publish_from_another_thread_wakes_subscriber(self):
+        broker = LocalBroker()
+
+        async def listen():
+            async with broker.subscribe('thread:1') as subscription:
+                threading.Timer(0.05, broker.publish, args=('thread:1', {'type': 'message'})).start()
+                return await subscription.get(timeout=5)
+
+        self.assertEqual(async_to_sync(listen)(), {'channel': 'thread:1', 'type': 'message'})
+        self.assertEqual(broker.subscribers, {})
+
+    def test_get_times_out_and_other_channels_are_ignored(self):
+        broker = LocalBroker()
+
+        async def listen():
+            async with broker.subscribe('thread:1') as subscription:
+                broker.publish('thread:2', {'type': 'message'})
+                return await subscription.get(timeout=0.05)
+
+        self.assertIsNone(async_to_sync(listen)())
+
+
+class EventStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='client@test.com', password='testpass123', first_name='Carol', last_name='Client',
+        )
+
+    @override_settings(LIVE_EVENTS=True)
+    async def test_streams_events_published_to_the_user(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/events/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b'retry:'))
+        get_broker().publish(f'user:{self.user.pk}', {'type': 'booking.status', 'booking': 'b1', 'status': 'accepted'})
+        chunk = await anext(stream)
+        self.assertTrue(chunk.startswith(b'event: booking.status\n'))
+        self.assertEqual(json.loads(chunk.split(b'data: ')[1])['status'], 'accepted')
+        await stream.aclose()
+
+    async def test_no_stream_while_live_events_are_off(self):
+        await self.async_client.aforce_login(self.user)
+        self.assertEqual((await self.async_client.get('/events/')).status_code, 204)
+
+    @override_settings(LIVE_EVENTS=True)
+    def test_no_stream_under_wsgi(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/events/').status_code, 204)
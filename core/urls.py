@@ -17,8 +17,10 @@ urlpatterns = [
     path('for-businesses/', views.why_businesses, name='why_businesses'),
     path('why-kairos/', views.why_kairos, name='why_kairos'),
     path('contact/', views.contact, name='contact'),
+    path('events/', views.event_stream, name='event_stream'),
     path('operations/', views.admin_dashboard, name='admin_dashboard'),
     path('operations/verify/<uuid:pk>/', views.admin_verify_expert, name='admin_verify_expert'),
     path('operations/concierge/<uuid:pk>/', views.admin_match_concierge, name='admin_match_concierge'),
     path('operations/audit-log/', views.admin_audit_log, name='admin_audit_log'),
+    path('operations/audit-log/export/', views.admin_audit_log_export, name='admin_audit_log_export'),
 ]
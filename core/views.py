@@ -1,33 +1,60 @@
 """
 Views for core functionality including home, search, legal pages, and admin dashboard.
 """
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-from django.db.models import Count, Sum, Q
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Count
+from django.http import HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils import timezone
-from datetime import timedelta
+from django.utils.dateparse import parse_date
+from datetime import datetime, time, timedelta
+from time import monotonic
+import json
 
 from accounts.decorators import verified_client_required
+from accounts.audit import log_event
 from accounts.models import User, AuditLog
+from availability.engines import get_availability_engine, rank_by_availability
 from experts.models import ExpertProfile, ExpertiseTag
+from experts.search import search_experts
 from consultations.models import Booking, ConciergeRequest
-from payments.models import Payment
+from .events import user_channel
+from .exports import EXPORT_FORMATS, audit_log_export_rows
+from .metrics import get_dashboard_metrics
+from .outbox import queue_email
+from .page_cache import cache_public_page, page_cache_ttl, page_generations
+from .pagination import CursorPaginator
+from .pubsub import get_broker
+from .rollups import monthly_trends
 
+EVENT_STREAM_SECONDS = 300
+EVENT_STREAM_HEARTBEAT_SECONDS = 20
+EVENT_STREAM_RETRY_MS = 3000
 
+
+@cache_public_page('home')
 def home(request):
-    verified_experts = ExpertProfile.objects.filter(
-        verification_status='verified',
-        is_publicly_listed=True
+    # Left lazy so the template's cached fragments skip the queries on a hit.
+    featured_experts = ExpertProfile.objects.filter(
+        is_featured=True,
+        is_publicly_listed=True,
+        privacy_level=ExpertProfile.PrivacyLevel.PUBLIC,
+        verification_status__in=[ExpertProfile.VerificationStatus.VETTED, ExpertProfile.VerificationStatus.ACTIVE],
     ).select_related('user').order_by('-average_rating')[:6]
     
     discipline_tags = ExpertiseTag.objects.filter(tag_type='discipline')[:12]
     
     context = {
-        'experts': verified_experts,
+        'experts': featured_experts,
         'tags': discipline_tags,
+        'fragment_generation': page_generations('site', 'home'),
+        'fragment_ttl': page_cache_ttl(),
     }
     return render(request, 'core/home.html', context)
 
@@ -43,25 +70,20 @@ def search(request):
     ).select_related('user')
     
     if query:
-        experts = experts.filter(
-            Q(user__first_name__icontains=query) |
-            Q(user__last_name__icontains=query) |
-            Q(headline__icontains=query) |
-            Q(bio__icontains=query) |
-            Q(expertise_tags__name__icontains=query)
-        ).distinct()
+        experts = search_experts(experts, query)
     
-    paginator = Paginator(experts, 12)
-    page = request.GET.get('page')
-    experts = paginator.get_page(page)
+    paginator = CursorPaginator(experts, 12)
+    experts = paginator.get_page(request.GET.get('cursor'))
     
     return render(request, 'core/search.html', {'experts': experts, 'query': query})
 
 
+@cache_public_page()
 def terms(request):
     return render(request, 'core/terms.html')
 
 
+@cache_public_page()
 def privacy(request):
     return render(request, 'core/privacy.html')
 
@@ -70,6 +92,7 @@ def acceptable_use(request):
     return render(request, 'core/acceptable_use.html')
 
 
+@cache_public_page()
 def how_it_works(request):
     return render(request, 'core/how_it_works.html')
 
@@ -78,10 +101,12 @@ def why_businesses(request):
     return render(request, 'core/why_businesses.html')
 
 
+@cache_public_page()
 def why_kairos(request):
     return render(request, 'core/why_kairos.html')
 
 
+@cache_public_page()
 def expertise(request):
     return render(request, 'core/expertise.html')
 
@@ -93,11 +118,10 @@ def contact(request):
         form = ContactInquiryForm(request.POST)
         if form.is_valid():
             inquiry = form.save()
-            AuditLog.objects.create(
-                user=request.user if request.user.is_authenticated else None,
+            log_event(
+                request,
                 event_type=AuditLog.EventType.ADMIN_ACTION,
                 description=f'Contact inquiry submitted: {inquiry.name} ({inquiry.email})',
-                ip_address=request.META.get('REMOTE_ADDR'),
                 metadata={
                     'inquiry_id': str(inquiry.id),
                     'inquiry_type': inquiry.inquiry_type,
@@ -115,10 +139,9 @@ def contact(request):
 @staff_member_required
 def admin_dashboard(request):
     now = timezone.now()
-    thirty_days_ago = now - timedelta(days=30)
     
     pending_verifications = ExpertProfile.objects.filter(
-        verification_status='pending'
+        verification_status=ExpertProfile.VerificationStatus.APPLIED
     ).select_related('user').order_by('-verification_submitted_at')
     
     pending_concierge = ConciergeRequest.objects.filter(
@@ -134,33 +157,25 @@ def admin_dashboard(request):
         status='disputed'
     ).select_related('client', 'expert__user')
     
-    total_users = User.objects.count()
-    total_experts = ExpertProfile.objects.filter(verification_status='verified').count()
-    total_bookings = Booking.objects.count()
-    total_revenue = Payment.objects.filter(
-        status='completed',
-        paid_at__gte=thirty_days_ago
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    recent_bookings = Booking.objects.filter(
-        created_at__gte=thirty_days_ago
-    ).count()
+    metrics = get_dashboard_metrics()
     
     context = {
         'pending_verifications': pending_verifications,
         'pending_concierge': pending_concierge,
         'upcoming_sessions': upcoming_sessions,
         'disputed_bookings': disputed_bookings,
-        'total_users': total_users,
-        'total_experts': total_experts,
-        'total_bookings': total_bookings,
-        'total_revenue': total_revenue,
-        'recent_bookings': recent_bookings,
+        'total_users': metrics['total_users'],
+        'total_experts': metrics['total_experts'],
+        'total_bookings': metrics['total_bookings'],
+        'total_revenue': metrics['revenue_30d'],
+        'recent_bookings': metrics['recent_bookings'],
+        'trends': monthly_trends(12),
     }
     return render(request, 'core/admin_dashboard.html', context)
 
 
 @staff_member_required
+@transaction.atomic
 def admin_verify_expert(request, pk):
     expert = get_object_or_404(ExpertProfile, pk=pk)
     
@@ -176,21 +191,17 @@ def admin_verify_expert(request, pk):
             expert.verification_notes = notes
             expert.save()
             
-            AuditLog.objects.create(
-                user=request.user,
+            log_event(
+                request,
                 event_type=AuditLog.EventType.VERIFICATION_STATUS_CHANGED,
                 description=f'Expert {expert.user.email} verified',
                 metadata={'expert_id': str(expert.id)}
             )
             
-            from django.core.mail import send_mail
-            from django.conf import settings
-            send_mail(
+            queue_email(
                 subject='Your Kairos expert profile has been verified',
                 message='Congratulations! Your expert profile has been verified and is now publicly visible.',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[expert.user.email],
-                fail_silently=True
+                recipient_list=[expert.user.email]
             )
             
             messages.success(request, f'Expert {expert.user.full_name} has been verified.')
@@ -202,21 +213,17 @@ def admin_verify_expert(request, pk):
             expert.verification_notes = notes
             expert.save()
             
-            AuditLog.objects.create(
-                user=request.user,
+            log_event(
+                request,
                 event_type=AuditLog.EventType.VERIFICATION_STATUS_CHANGED,
                 description=f'Expert {expert.user.email} needs changes',
                 metadata={'expert_id': str(expert.id), 'notes': notes}
             )
             
-            from django.core.mail import send_mail
-            from django.conf import settings
-            send_mail(
+            queue_email(
                 subject='Changes needed for your Kairos expert profile',
                 message=f'Your expert profile needs some changes before it can be verified:\n\n{notes}',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[expert.user.email],
-                fail_silently=True
+                recipient_list=[expert.user.email]
             )
             
             messages.warning(request, f'Expert {expert.user.full_name} has been asked to make changes.')
@@ -228,8 +235,8 @@ def admin_verify_expert(request, pk):
             expert.verification_notes = notes
             expert.save()
             
-            AuditLog.objects.create(
-                user=request.user,
+            log_event(
+                request,
                 event_type=AuditLog.EventType.VERIFICATION_STATUS_CHANGED,
                 description=f'Expert {expert.user.email} rejected',
                 metadata={'expert_id': str(expert.id), 'notes': notes}
@@ -247,6 +254,7 @@ def admin_verify_expert(request, pk):
 
 
 @staff_member_required
+@transaction.atomic
 def admin_match_concierge(request, pk):
     concierge = get_object_or_404(ConciergeRequest, pk=pk)
     
@@ -262,23 +270,29 @@ def admin_match_concierge(request, pk):
             concierge.admin_notes = request.POST.get('admin_notes', '')
             concierge.save()
             
-            from django.core.mail import send_mail
-            from django.conf import settings
-            send_mail(
+            queue_email(
                 subject='We found an expert for you - Kairos',
                 message=f'We have matched you with {expert.user.full_name}. Please log in to book a consultation.',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[concierge.client.email],
-                fail_silently=True
+                recipient_list=[concierge.client.email]
             )
             
             messages.success(request, 'Concierge request matched with expert.')
             return redirect('core:admin_dashboard')
     
-    experts = ExpertProfile.objects.filter(
-        verification_status='verified',
-        is_publicly_listed=True
-    ).select_related('user')
+    experts = {
+        expert.pk: expert
+        for expert in ExpertProfile.objects.filter(
+            verification_status__in=['vetted', 'active'],
+            is_publicly_listed=True
+        ).select_related('user')
+    }
+    
+    # Rank candidates by availability over the next week in one batch.
+    now = timezone.now()
+    summaries = get_availability_engine().availability_summaries(list(experts), now, now + timedelta(days=7))
+    experts = [
+        (experts[expert_id], summary) for expert_id, summary in rank_by_availability(summaries)
+    ]
     
     context = {
         'concierge': concierge,
@@ -289,15 +303,14 @@ def admin_match_concierge(request, pk):
 
 @staff_member_required
 def admin_audit_log(request):
-    logs = AuditLog.objects.select_related('user').order_by('-created_at')
+    logs = AuditLog.objects.select_related('user').order_by('-created_at', 'id')
     
     event_type = request.GET.get('event_type')
     if event_type:
         logs = logs.filter(event_type=event_type)
     
-    paginator = Paginator(logs, 50)
-    page = request.GET.get('page')
-    logs = paginator.get_page(page)
+    paginator = CursorPaginator(logs, 50)
+    logs = paginator.get_page(request.GET.get('cursor'))
     
     context = {
         'logs': logs,
@@ -305,3 +318,91 @@ def admin_audit_log(request):
         'selected_type': event_type,
     }
     return render(request, 'core/admin_audit_log.html', context)
+
+
+@staff_member_required
+def admin_audit_log_export(request):
+    """Stream every matching audit entry as CSV or JSONL.
+
+    Filters: ``user`` (id or email), ``event_type``, and ``start``/``end``
+    dates (inclusive).
+    """
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return HttpResponseBadRequest(f'format must be one of {", ".join(EXPORT_FORMATS)}.')
+
+    user = None
+    user_param = request.GET.get('user', '').strip()
+    if user_param:
+        lookup = {'email__iexact': user_param} if '@' in user_param else {'pk': user_param}
+        try:
+            user = User.objects.get(**lookup)
+        except (User.DoesNotExist, ValidationError):
+            return HttpResponseBadRequest('Unknown user.')
+
+    bounds = {}
+    for name in ('start', 'end'):
+        value = request.GET.get(name)
+        if not value:
+            continue
+        try:
+            day = parse_date(value)
+        except ValueError:
+            # Well formed but not a real day, such as 2024-02-30.
+            day = None
+        if day is None:
+            return HttpResponseBadRequest(f'{name} must be a YYYY-MM-DD date.')
+        if name == 'end':
+            day += timedelta(days=1)
+        bounds[name] = timezone.make_aware(datetime.combine(day, time.min))
+
+    event_type = request.GET.get('event_type') or None
+    log_event(
+        request,
+        event_type=AuditLog.EventType.ADMIN_ACTION,
+        description='Audit log exported',
+        metadata={
+            'format': export_format,
+            'user': str(user.pk) if user else None,
+            'event_type': event_type,
+            'start': request.GET.get('start'),
+            'end': request.GET.get('end'),
+        }
+    )
+
+    stream, content_type = EXPORT_FORMATS[export_format]
+    rows = audit_log_export_rows(user=user, event_type=event_type, **bounds)
+    response = StreamingHttpResponse(stream(rows), content_type=content_type)
+    filename = f'audit-log-{timezone.localtime():%Y%m%d-%H%M%S}.{export_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+async def event_stream(request):
+    """Server-sent events for the signed-in user: booking status changes,
+    new messages and new booking notes. The stream ends after
+    ``EVENT_STREAM_SECONDS`` and the browser reconnects.
+
+    Answers 204, which tells ``EventSource`` to stop reconnecting, unless
+    ``LIVE_EVENTS`` is on and the request came through ASGI: under WSGI an
+    open stream would hold a worker for its whole life."""
+    if not settings.LIVE_EVENTS or not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    user = await request.auser()
+    
+    async def events():
+        async with get_broker().subscribe(user_channel(user.pk)) as subscription:
+            yield f'retry: {EVENT_STREAM_RETRY_MS}\n\n'
+            deadline = monotonic() + EVENT_STREAM_SECONDS
+            while (remaining := deadline - monotonic()) > 0:
+                event = await subscription.get(timeout=min(EVENT_STREAM_HEARTBEAT_SECONDS, remaining))
+                if event is None:
+                    yield ': keep-alive\n\n'
+                else:
+                    yield f'event: {event["type"]}\ndata: {json.dumps(event)}\n\n'
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
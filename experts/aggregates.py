@@ -0,0 +1,186 @@
+"""
+Incremental per-expert aggregates.
+
+Rating, response-time and completed-consultation figures used to be
+recomputed from every booking and review on each render or new review.
+``ExpertAggregates`` keeps running sums and counts plus a rolling window of
+the most recent response latencies, updated inside the same transaction as
+the booking or review change. The derived read-side values are copied onto
+``ExpertProfile`` (``average_rating``, ``total_reviews``,
+``average_response_hours``, ``total_consultations``) so pages read them
+without extra queries.
+
+Delete paths only touch existing aggregate rows, so they are safe while an
+expert is being cascade-deleted; ``recompute_expert_aggregates`` backfills
+missing rows and repairs drift.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum, Window
+from django.db.models.functions import RowNumber
+from django.utils.dateparse import parse_datetime
+
+from .models import ExpertAggregates, ExpertProfile
+
+RESPONSE_WINDOW = 10
+COMPLETED_STATUS = 'completed'
+
+
+def average_rating(aggregates):
+    if not aggregates.rating_count:
+        return Decimal('0')
+    return (Decimal(aggregates.rating_sum) / aggregates.rating_count).quantize(Decimal('0.01'), ROUND_HALF_UP)
+
+
+def average_response_hours(aggregates):
+    if not aggregates.response_window:
+        return None
+    seconds = sum(latency for _, latency in aggregates.response_window)
+    return Decimal(seconds / len(aggregates.response_window) / 3600).quantize(Decimal('0.1'), ROUND_HALF_UP)
+
+
+def profile_values(aggregates):
+    return {
+        'average_rating': average_rating(aggregates),
+        'total_reviews': aggregates.rating_count,
+        'average_response_hours': average_response_hours(aggregates),
+        'total_consultations': aggregates.completed_count,
+    }
+
+
+def update_aggregates(expert_id, change, create=True):
+    """Apply ``change(aggregates)`` under a row lock and copy the results to
+    the profile. Returns False when there was no row to update."""
+    with transaction.atomic():
+        queryset = ExpertAggregates.objects.select_for_update()
+        if create:
+            aggregates, _ = queryset.get_or_create(expert_id=expert_id)
+        else:
+            aggregates = queryset.filter(expert_id=expert_id).first()
+            if aggregates is None:
+                return False
+        change(aggregates)
+        aggregates.save()
+        ExpertProfile.objects.filter(pk=expert_id).update(**profile_values(aggregates))
+    return True
+
+
+def record_rating(expert_id, rating_delta, count_delta, create=True):
+    def change(aggregates):
+        aggregates.rating_sum += rating_delta
+        aggregates.rating_count += count_delta
+    return update_aggregates(expert_id, change, create=create)
+
+
+def record_completion(expert_id, delta, create=True):
+    def change(aggregates):
+        aggregates.completed_count = max(aggregates.completed_count + delta, 0)
+    return update_aggregates(expert_id, change, create=create)
+
+
+def record_response(expert_id, created_at, responded_at):
+    """Add a newly responded booking to the rolling latency window."""
+    def change(aggregates):
+        window = aggregates.response_window + [
+            [created_at.isoformat(), (responded_at - created_at).total_seconds()]
+        ]
+        window.sort(key=lambda entry: parse_datetime(entry[0]), reverse=True)
+        aggregates.response_window = window[:RESPONSE_WINDOW]
+    return update_aggregates(expert_id, change)
+
+
+def response_windows(expert_ids):
+    """Most recent ``RESPONSE_WINDOW`` response latencies per expert, in one
+    windowed query."""
+    from consultations.models import Booking
+
+    windows = {expert_id: [] for expert_id in expert_ids}
+    rows = Booking.objects.filter(
+        expert_id__in=expert_ids, responded_at__isnull=False
+    ).annotate(
+        position=Window(RowNumber(), partition_by=F('expert_id'), order_by=F('created_at').desc())
+    ).filter(position__lte=RESPONSE_WINDOW).order_by('expert_id', '-created_at').values_list(
+        'expert_id', 'created_at', 'responded_at'
+    )
+    for expert_id, created_at, responded_at in rows:
+        windows[expert_id].append([created_at.isoformat(), (responded_at - created_at).total_seconds()])
+    return windows
+
+
+def refresh_response_window(expert_id):
+    """Rebuild one expert's latency window after a response was edited or
+    a responded booking removed."""
+    window = response_windows([expert_id])[expert_id]
+
+    def change(aggregates):
+        aggregates.response_window = window
+    return update_aggregates(expert_id, change, create=False)
+
+
+def recompute_expert_aggregates(expert_ids=None, batch_size=500):
+    """Rebuild aggregates from bookings and reviews with grouped queries per
+    batch. Returns ``(experts, drifted)`` where ``drifted`` counts experts
+    whose stored values were wrong or missing."""
+    from consultations.models import Booking, Review
+
+    from .listings import refresh_expert_listing
+
+    profiles = ExpertProfile.objects.order_by('pk')
+    if expert_ids is not None:
+        profiles = profiles.filter(pk__in=expert_ids)
+    profile_fields = list(profile_values(ExpertAggregates()))
+    stored = list(profiles.values('pk', 'user_id', *profile_fields))
+
+    experts = drifted = 0
+    for offset in range(0, len(stored), batch_size):
+        batch = {row['pk']: row for row in stored[offset:offset + batch_size]}
+        ids = list(batch)
+        expert_by_user = {row['user_id']: expert_id for expert_id, row in batch.items()}
+
+        ratings = {
+            expert_by_user[row['reviewee_id']]: row
+            for row in Review.objects.filter(reviewee_id__in=list(expert_by_user), is_public=True)
+            .values('reviewee_id').annotate(total=Sum('rating'), count=Count('id')).order_by()
+        }
+        completed = dict(
+            Booking.objects.filter(expert_id__in=ids, status=COMPLETED_STATUS)
+            .values('expert_id').annotate(count=Count('id')).order_by().values_list('expert_id', 'count')
+        )
+        windows = response_windows(ids)
+        existing = ExpertAggregates.objects.in_bulk(ids)
+
+        rows, drifted_ids = [], []
+        for expert_id in ids:
+            rating = ratings.get(expert_id, {})
+            aggregates = ExpertAggregates(
+                expert_id=expert_id,
+                rating_sum=rating.get('total') or 0,
+                rating_count=rating.get('count') or 0,
+                response_window=windows[expert_id],
+                completed_count=completed.get(expert_id, 0),
+            )
+            current = existing.get(expert_id)
+            values = profile_values(aggregates)
+            if current is None or any(
+                getattr(current, name) != getattr(aggregates, name)
+                for name in ('rating_sum', 'rating_count', 'response_window', 'completed_count')
+            ) or any(batch[expert_id][name] != value for name, value in values.items()):
+                drifted_ids.append(expert_id)
+            rows.append(aggregates)
+
+        with transaction.atomic():
+            ExpertAggregates.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['expert'],
+                update_fields=['rating_sum', 'rating_count', 'response_window', 'completed_count', 'updated_at'],
+            )
+            for aggregates in rows:
+                if aggregates.expert_id in drifted_ids:
+                    ExpertProfile.objects.filter(pk=aggregates.expert_id).update(**profile_values(aggregates))
+        for expert_id in drifted_ids:
+            refresh_expert_listing(expert_id)
+        experts += len(rows)
+        drifted += len(drifted_ids)
+    return experts, drifted
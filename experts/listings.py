@@ -0,0 +1,123 @@
+"""
+Maintenance of the ``ExpertListing`` read model used by the listing pages.
+
+The catalogue, directory and careers pages read a single pre-flattened row
+per expert instead of joining profiles, users and tags on every request.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ExpertListing, ExpertProfile
+
+LISTABLE_STATUSES = [ExpertProfile.VerificationStatus.VETTED, ExpertProfile.VerificationStatus.ACTIVE]
+LISTABLE_PRIVACY_LEVELS = [ExpertProfile.PrivacyLevel.PUBLIC, ExpertProfile.PrivacyLevel.SEMI_PRIVATE]
+
+
+def is_listable(profile):
+    return (
+        profile.verification_status in LISTABLE_STATUSES and
+        profile.is_publicly_listed and
+        profile.privacy_level in LISTABLE_PRIVACY_LEVELS
+    )
+
+
+def next_available_slot(expert_id):
+    from availability.engines import get_availability_engine
+    return get_availability_engine().next_available(expert_id, timezone.now())
+
+
+def build_listing(profile):
+    """Return the listing column values for an expert profile."""
+    tags = list(profile.expertise_tags.all())
+    return {
+        'first_name': profile.user.first_name,
+        'last_name': profile.user.last_name,
+        'full_name': profile.user.full_name,
+        'headline': profile.headline,
+        'bio': profile.bio,
+        'affiliation': profile.affiliation,
+        'location': profile.location,
+        'avatar': profile.avatar.name if profile.avatar else None,
+        'privacy_level': profile.privacy_level,
+        'tag_names': [tag.name for tag in tags],
+        'tag_slugs': ''.join(f' {tag.slug} ' for tag in tags),
+        'average_rating': profile.average_rating,
+        'total_reviews': profile.total_reviews,
+        'years_experience': profile.years_experience,
+        'project_work_available': profile.project_work_available,
+        'next_available_slot': next_available_slot(profile.pk),
+        'profile_created_at': profile.created_at,
+    }
+
+
+def sync_expert_listing(profile):
+    """Insert, update or remove the listing row for ``profile``."""
+    if not is_listable(profile):
+        ExpertListing.objects.filter(expert_id=profile.pk).delete()
+        return
+    ExpertListing.objects.update_or_create(expert=profile, defaults=build_listing(profile))
+
+
+def refresh_expert_listing(expert_id):
+    """Reload an expert and refresh their listing after a related row changed.
+
+    Only existing rows are updated (rows are created when the profile itself
+    is saved), so this is safe to call from delete signals fired while the
+    expert is being cascade-deleted.
+    """
+    profile = ExpertProfile.objects.select_related('user').filter(pk=expert_id).first()
+    if profile is None:
+        return
+    if not is_listable(profile):
+        ExpertListing.objects.filter(expert_id=expert_id).delete()
+        return
+    ExpertListing.objects.filter(expert_id=expert_id).update(
+        updated_at=timezone.now(),
+        **build_listing(profile)
+    )
+
+
+def refresh_next_available_slot(expert_id):
+    """Recompute only the next-available-slot column for an expert."""
+    ExpertListing.objects.filter(expert_id=expert_id).update(
+        next_available_slot=next_available_slot(expert_id),
+        updated_at=timezone.now()
+    )
+
+
+def slot_became_available(expert_id, start_datetime):
+    """Cheap update when a single slot opens: only move the column earlier."""
+    if start_datetime < timezone.now():
+        return
+    ExpertListing.objects.filter(expert_id=expert_id).filter(
+        Q(next_available_slot__isnull=True) | Q(next_available_slot__gt=start_datetime)
+    ).update(next_available_slot=start_datetime, updated_at=timezone.now())
+
+
+def rebuild_expert_listings(batch_size=500):
+    """Resync every expert's listing row. Returns the number of rows kept."""
+    profiles = ExpertProfile.objects.select_related('user').prefetch_related('expertise_tags').order_by('pk')
+    listed = 0
+    for profile in profiles.iterator(chunk_size=batch_size):
+        sync_expert_listing(profile)
+        listed += is_listable(profile)
+    return listed
+
+
+def refresh_stale_slots():
+    """Recompute ``next_available_slot`` for rows whose slot has already started."""
+    stale = ExpertListing.objects.filter(next_available_slot__lt=timezone.now())
+    expert_ids = list(stale.values_list('expert_id', flat=True))
+    for expert_id in expert_ids:
+        refresh_next_available_slot(expert_id)
+    return len(expert_ids)
+
+
+def filter_by_tags(listings, slugs):
+    """Keep listings tagged with any of ``slugs``."""
+    if not slugs:
+        return listings
+    return listings.filter(reduce(or_, (Q(tag_slugs__contains=f' {slug} ') for slug in slugs)))
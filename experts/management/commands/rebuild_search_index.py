@@ -0,0 +1,23 @@
+"""
+Management command to rebuild expert full-text search documents.
+"""
+from django.core.management.base import BaseCommand
+
+from experts.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search document for every expert profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of profiles loaded per database round-trip',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding expert search index...')
+        count = rebuild_search_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} expert profiles.'))
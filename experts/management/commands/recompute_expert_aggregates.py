@@ -0,0 +1,31 @@
+"""
+Management command to rebuild expert rating, response-time and consultation aggregates.
+"""
+from django.core.management.base import BaseCommand
+
+from experts.aggregates import recompute_expert_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Recomputes expert aggregates from bookings and reviews, backfilling missing rows and repairing drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'expert_ids',
+            nargs='*',
+            help='Only recompute these expert profile ids',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of experts aggregated per set of grouped queries',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Recomputing expert aggregates...')
+        experts, drifted = recompute_expert_aggregates(
+            expert_ids=options['expert_ids'] or None,
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Recomputed {experts} experts; {drifted} had drifted and were repaired.'))
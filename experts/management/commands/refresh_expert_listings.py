@@ -0,0 +1,33 @@
+"""
+Management command to rebuild or refresh the expert listing read model.
+"""
+from django.core.management.base import BaseCommand
+
+from experts.listings import rebuild_expert_listings, refresh_stale_slots
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the precomputed expert listing rows used by the catalogue pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale-slots',
+            action='store_true',
+            help='Only recompute next available slots that have already started',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of profiles loaded per database round-trip',
+        )
+
+    def handle(self, *args, **options):
+        if options['stale_slots']:
+            count = refresh_stale_slots()
+            self.stdout.write(self.style.SUCCESS(f'Refreshed next available slot for {count} listings.'))
+            return
+
+        self.stdout.write('Rebuilding expert listings...')
+        count = rebuild_expert_listings(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{count} experts listed.'))
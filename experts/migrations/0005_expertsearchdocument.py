@@ -0,0 +1,112 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE experts_search_document ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(headline, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(keywords, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(body, '')), 'C')
+    ) STORED
+    """,
+    'CREATE INDEX experts_search_vector_gin ON experts_search_document USING GIN (search_vector)',
+]
+
+POSTGRES_REVERSE = [
+    'DROP INDEX IF EXISTS experts_search_vector_gin',
+    'ALTER TABLE experts_search_document DROP COLUMN IF EXISTS search_vector',
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE experts_search_fts USING fts5(
+        expert_id UNINDEXED, name, headline, body, keywords,
+        tokenize = 'porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER experts_search_fts_insert AFTER INSERT ON experts_search_document BEGIN
+        INSERT INTO experts_search_fts (expert_id, name, headline, body, keywords)
+        VALUES (new.expert_id, new.name, new.headline, new.body, new.keywords);
+    END
+    """,
+    """
+    CREATE TRIGGER experts_search_fts_update AFTER UPDATE ON experts_search_document BEGIN
+        DELETE FROM experts_search_fts WHERE expert_id = old.expert_id;
+        INSERT INTO experts_search_fts (expert_id, name, headline, body, keywords)
+        VALUES (new.expert_id, new.name, new.headline, new.body, new.keywords);
+    END
+    """,
+    """
+    CREATE TRIGGER experts_search_fts_delete AFTER DELETE ON experts_search_document BEGIN
+        DELETE FROM experts_search_fts WHERE expert_id = old.expert_id;
+    END
+    """,
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS experts_search_fts_insert',
+    'DROP TRIGGER IF EXISTS experts_search_fts_update',
+    'DROP TRIGGER IF EXISTS experts_search_fts_delete',
+    'DROP TABLE IF EXISTS experts_search_fts',
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}.get(vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'postgresql': POSTGRES_REVERSE, 'sqlite': SQLITE_REVERSE}.get(vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def backfill_documents(apps, schema_editor):
+    ExpertProfile = apps.get_model('experts', 'ExpertProfile')
+    ExpertSearchDocument = apps.get_model('experts', 'ExpertSearchDocument')
+    profiles = ExpertProfile.objects.select_related('user').prefetch_related('expertise_tags', 'publications')
+    for profile in profiles.iterator(chunk_size=500):
+        keywords = [tag.name for tag in profile.expertise_tags.all()]
+        keywords += [pub.title for pub in profile.publications.all()]
+        ExpertSearchDocument.objects.create(
+            expert=profile,
+            name=f'{profile.user.first_name} {profile.user.last_name}'.strip(),
+            headline=profile.headline,
+            body='\n'.join(filter(None, [profile.bio, profile.sector_expertise, profile.senior_roles])),
+            keywords='\n'.join(keywords),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('experts', '0004_expertprofile_cv_file_expertprofile_github_url_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpertSearchDocument',
+            fields=[
+                ('expert', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='experts.expertprofile')),
+                ('name', models.CharField(blank=True, max_length=200)),
+                ('headline', models.CharField(blank=True, max_length=200)),
+                ('body', models.TextField(blank=True, help_text='Bio, sector expertise and senior roles')),
+                ('keywords', models.TextField(blank=True, help_text='Expertise tag names and publication titles')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'experts_search_document',
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_listings(apps, schema_editor):
+    ExpertProfile = apps.get_model('experts', 'ExpertProfile')
+    ExpertListing = apps.get_model('experts', 'ExpertListing')
+    TimeSlot = apps.get_model('availability', 'TimeSlot')
+    profiles = ExpertProfile.objects.filter(
+        verification_status__in=['vetted', 'active'],
+        is_publicly_listed=True,
+        privacy_level__in=['public', 'semi_private'],
+    ).select_related('user').prefetch_related('expertise_tags')
+    now = timezone.now()
+    for profile in profiles.iterator(chunk_size=500):
+        tags = list(profile.expertise_tags.all())
+        next_slot = TimeSlot.objects.filter(
+            expert=profile, status='available', start_datetime__gte=now
+        ).order_by('start_datetime').values_list('start_datetime', flat=True).first()
+        ExpertListing.objects.create(
+            expert=profile,
+            first_name=profile.user.first_name,
+            last_name=profile.user.last_name,
+            full_name=f'{profile.user.first_name} {profile.user.last_name}'.strip(),
+            headline=profile.headline,
+            bio=profile.bio,
+            affiliation=profile.affiliation,
+            location=profile.location,
+            avatar=profile.avatar.name if profile.avatar else None,
+            privacy_level=profile.privacy_level,
+            tag_names=[tag.name for tag in tags],
+            tag_slugs=''.join(f' {tag.slug} ' for tag in tags),
+            average_rating=profile.average_rating,
+            total_reviews=profile.total_reviews,
+            years_experience=profile.years_experience,
+            project_work_available=profile.project_work_available,
+            next_available_slot=next_slot,
+            profile_created_at=profile.created_at,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('availability', '0001_initial'),
+        ('experts', '0005_expertsearchdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpertListing',
+            fields=[
+                ('expert', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='listing', serialize=False, to='experts.expertprofile')),
+                ('first_name', models.CharField(max_length=100)),
+                ('last_name', models.CharField(max_length=100)),
+                ('full_name', models.CharField(max_length=200)),
+                ('headline', models.CharField(blank=True, max_length=200)),
+                ('bio', models.TextField(blank=True)),
+                ('affiliation', models.CharField(blank=True, max_length=200)),
+                ('location', models.CharField(blank=True, max_length=100)),
+                ('avatar', models.ImageField(blank=True, null=True, upload_to='avatars/')),
+                ('privacy_level', models.CharField(choices=[('public', 'Public'), ('semi_private', 'Semi-private'), ('private', 'Private')], max_length=20)),
+                ('tag_names', models.JSONField(blank=True, default=list)),
+                ('tag_slugs', models.TextField(blank=True, help_text='Space-padded tag slugs used for tag filtering')),
+                ('average_rating', models.DecimalField(decimal_places=2, default=0, max_digits=3)),
+                ('total_reviews', models.IntegerField(default=0)),
+                ('years_experience', models.IntegerField(default=0)),
+                ('project_work_available', models.BooleanField(default=False)),
+                ('next_available_slot', models.DateTimeField(blank=True, null=True)),
+                ('profile_created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'experts_listing',
+                'ordering': ['-average_rating', '-total_reviews'],
+                'indexes': [models.Index(fields=['-average_rating', '-total_reviews'], name='experts_listing_rating_idx'), models.Index(fields=['-total_reviews', '-average_rating'], name='experts_listing_reviews_idx'), models.Index(fields=['-years_experience'], name='experts_listing_exp_idx'), models.Index(fields=['-profile_created_at'], name='experts_listing_recent_idx'), models.Index(fields=['next_available_slot'], name='experts_listing_slot_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_listings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:03
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_aggregates(apps, schema_editor):
+    """Create aggregate rows from existing bookings and reviews. Profile
+    ratings are left as they are; ``recompute_expert_aggregates`` repairs
+    them explicitly."""
+    ExpertProfile = apps.get_model('experts', 'ExpertProfile')
+    ExpertAggregates = apps.get_model('experts', 'ExpertAggregates')
+    Booking = apps.get_model('consultations', 'Booking')
+    Review = apps.get_model('consultations', 'Review')
+    for profile in ExpertProfile.objects.iterator(chunk_size=500):
+        ratings = Review.objects.filter(reviewee_id=profile.user_id, is_public=True).aggregate(
+            total=models.Sum('rating'), count=models.Count('id')
+        )
+        window = [
+            [booking.created_at.isoformat(), (booking.responded_at - booking.created_at).total_seconds()]
+            for booking in Booking.objects.filter(
+                expert=profile, responded_at__isnull=False
+            ).order_by('-created_at')[:10]
+        ]
+        ExpertAggregates.objects.create(
+            expert=profile,
+            rating_sum=ratings['total'] or 0,
+            rating_count=ratings['count'],
+            response_window=window,
+            completed_count=Booking.objects.filter(expert=profile, status='completed').count(),
+        )
+        if window:
+            hours = sum(latency for _, latency in window) / len(window) / 3600
+            ExpertProfile.objects.filter(pk=profile.pk).update(
+                average_response_hours=Decimal(hours).quantize(Decimal('0.1'))
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultations', '0004_add_phone_budget_file_consent'),
+        ('experts', '0006_expertlisting'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpertAggregates',
+            fields=[
+                ('expert', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='aggregates', serialize=False, to='experts.expertprofile')),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('rating_count', models.IntegerField(default=0)),
+                ('response_window', models.JSONField(blank=True, default=list, help_text='[booking created_at, response seconds] for the most recent responded bookings')),
+                ('completed_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'experts_aggregates',
+            },
+        ),
+        migrations.AddField(
+            model_name='expertprofile',
+            name='average_response_hours',
+            field=models.DecimalField(blank=True, decimal_places=1, max_digits=7, null=True),
+        ),
+        migrations.RunPython(backfill_aggregates, migrations.RunPython.noop),
+    ]
@@ -4,6 +4,23 @@ Expert profile models with verification workflow.
 import uuid
 from django.conf import settings
 from django.db import models
+from django.db.models import Exists, OuterRef
+
+# Profile sections in display order. Bit ``1 << i`` of
+# ``ExpertProfile.completeness_mask`` is set when section ``i`` is filled in.
+COMPLETENESS_SECTIONS = [
+    ('headline', 'Add a headline describing your expertise'),
+    ('bio', 'Write a detailed biography'),
+    ('avatar', 'Upload a professional photo'),
+    ('affiliation', 'Add your current affiliation'),
+    ('location', 'Specify your location'),
+    ('expertise_tags', 'Select your areas of expertise'),
+    ('years_experience', 'Specify your years of experience'),
+    ('publications', 'Add at least one publication or project'),
+    ('verification_documents', 'Upload verification documents'),
+    ('languages', 'Specify languages you speak'),
+]
+COMPLETENESS_RELATIONS = ['expertise_tags', 'publications', 'verification_documents']
 
 
 class ExpertiseTag(models.Model):
@@ -25,6 +42,20 @@ class ExpertiseTag(models.Model):
         return self.name
 
 
+class ExpertProfileQuerySet(models.QuerySet):
+    def with_completeness(self):
+        """Annotate ``has_<relation>`` flags so ``profile_completeness`` and
+        ``missing_sections`` need no further queries for any profile in the
+        list."""
+        return self.annotate(
+            has_expertise_tags=Exists(
+                ExpertProfile.expertise_tags.through.objects.filter(expertprofile_id=OuterRef('pk'))
+            ),
+            has_publications=Exists(Publication.objects.filter(expert_id=OuterRef('pk'))),
+            has_verification_documents=Exists(VerificationDocument.objects.filter(expert_id=OuterRef('pk'))),
+        )
+
+
 class ExpertProfile(models.Model):
     class VerificationStatus(models.TextChoices):
         APPLIED = 'applied', 'Applied'
@@ -85,6 +116,7 @@ class ExpertProfile(models.Model):
     average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0)
     total_reviews = models.IntegerField(default=0)
     total_consultations = models.IntegerField(default=0)
+    average_response_hours = models.DecimalField(max_digits=7, decimal_places=1, blank=True, null=True)
     total_earnings = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -104,60 +136,52 @@ class ExpertProfile(models.Model):
     def is_active(self):
         return self.verification_status == self.VerificationStatus.ACTIVE
 
+    objects = ExpertProfileQuerySet.as_manager()
+
+    def _relation_flags(self):
+        """``{relation: bool}`` from ``with_completeness`` annotations, or
+        from a single annotated query cached on the instance."""
+        if not all(hasattr(self, f'has_{name}') for name in COMPLETENESS_RELATIONS):
+            if self.pk is None or self._state.adding:
+                flags = dict.fromkeys(COMPLETENESS_RELATIONS, False)
+            else:
+                flags = ExpertProfile.objects.with_completeness().filter(pk=self.pk).values(
+                    *(f'has_{name}' for name in COMPLETENESS_RELATIONS)
+                ).first() or {}
+            for name in COMPLETENESS_RELATIONS:
+                setattr(self, f'has_{name}', bool(flags.get(f'has_{name}')))
+        return {name: getattr(self, f'has_{name}') for name in COMPLETENESS_RELATIONS}
+
+    @property
+    def completeness_mask(self):
+        filled = {
+            'headline': bool(self.headline),
+            'bio': bool(self.bio),
+            'avatar': bool(self.avatar),
+            'affiliation': bool(self.affiliation),
+            'location': bool(self.location),
+            'years_experience': self.years_experience > 0,
+            'languages': bool(self.languages),
+            **self._relation_flags(),
+        }
+        mask = 0
+        for bit, (name, _) in enumerate(COMPLETENESS_SECTIONS):
+            if filled[name]:
+                mask |= 1 << bit
+        return mask
+
     @property
     def profile_completeness(self):
-        fields = [
-            bool(self.headline),
-            bool(self.bio),
-            bool(self.avatar),
-            bool(self.affiliation),
-            bool(self.location),
-            self.expertise_tags.exists(),
-            self.years_experience > 0,
-            self.publications.exists(),
-            self.verification_documents.exists(),
-            bool(self.languages),
-        ]
-        return int((sum(fields) / len(fields)) * 100)
+        return int((bin(self.completeness_mask).count('1') / len(COMPLETENESS_SECTIONS)) * 100)
 
     @property
     def missing_sections(self):
-        missing = []
-        if not self.headline:
-            missing.append('Add a headline describing your expertise')
-        if not self.bio:
-            missing.append('Write a detailed biography')
-        if not self.avatar:
-            missing.append('Upload a professional photo')
-        if not self.affiliation:
-            missing.append('Add your current affiliation')
-        if not self.location:
-            missing.append('Specify your location')
-        if not self.expertise_tags.exists():
-            missing.append('Select your areas of expertise')
-        if self.years_experience == 0:
-            missing.append('Specify your years of experience')
-        if not self.publications.exists():
-            missing.append('Add at least one publication or project')
-        if not self.verification_documents.exists():
-            missing.append('Upload verification documents')
-        if not self.languages:
-            missing.append('Specify languages you speak')
-        return missing
+        mask = self.completeness_mask
+        return [message for bit, (_, message) in enumerate(COMPLETENESS_SECTIONS) if not mask & (1 << bit)]
 
     def calculate_average_response_time(self):
-        from consultations.models import Booking
-        recent_bookings = Booking.objects.filter(
-            expert=self,
-            responded_at__isnull=False
-        ).order_by('-created_at')[:10]
-        if not recent_bookings:
-            return None
-        total_hours = sum(
-            (b.responded_at - b.created_at).total_seconds() / 3600
-            for b in recent_bookings
-        )
-        return round(total_hours / len(recent_bookings), 1)
+        # Maintained incrementally by ``experts.aggregates``.
+        return self.average_response_hours
 
 
 class Publication(models.Model):
@@ -262,3 +286,109 @@ class ExpertApplication(models.Model):
 
     def __str__(self):
         return f'{self.full_name} - {self.get_status_display()}'
+
+
+class ExpertSearchDocument(models.Model):
+    """Denormalised full-text search document for an expert profile.
+
+    Rows are maintained by the signal handlers in ``experts.signals`` and
+    indexed by the database-specific backend in ``experts.search``.
+    """
+    expert = models.OneToOneField(
+        ExpertProfile,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document'
+    )
+    name = models.CharField(max_length=200, blank=True)
+    headline = models.CharField(max_length=200, blank=True)
+    body = models.TextField(blank=True, help_text='Bio, sector expertise and senior roles')
+    keywords = models.TextField(blank=True, help_text='Expertise tag names and publication titles')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'experts_search_document'
+
+    def __str__(self):
+        return f'Search document for {self.expert_id}'
+
+
+class ExpertListing(models.Model):
+    """Read-optimised projection of an expert for the listing pages.
+
+    One row exists per publicly listable expert (vetted or active, publicly
+    listed, not private). Rows are maintained by ``experts.listings`` from
+    the signal handlers in ``experts.signals``; never edit them directly.
+    """
+    expert = models.OneToOneField(
+        ExpertProfile,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='listing'
+    )
+    first_name = models.CharField(max_length=100)
+    last_name = models.CharField(max_length=100)
+    full_name = models.CharField(max_length=200)
+    headline = models.CharField(max_length=200, blank=True)
+    bio = models.TextField(blank=True)
+    affiliation = models.CharField(max_length=200, blank=True)
+    location = models.CharField(max_length=100, blank=True)
+    avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+    privacy_level = models.CharField(max_length=20, choices=ExpertProfile.PrivacyLevel.choices)
+    tag_names = models.JSONField(default=list, blank=True)
+    tag_slugs = models.TextField(blank=True, help_text='Space-padded tag slugs used for tag filtering')
+    average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+    total_reviews = models.IntegerField(default=0)
+    years_experience = models.IntegerField(default=0)
+    project_work_available = models.BooleanField(default=False)
+    next_available_slot = models.DateTimeField(blank=True, null=True)
+    profile_created_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'experts_listing'
+        ordering = ['-average_rating', '-total_reviews']
+        indexes = [
+            models.Index(fields=['-average_rating', '-total_reviews'], name='experts_listing_rating_idx'),
+            models.Index(fields=['-total_reviews', '-average_rating'], name='experts_listing_reviews_idx'),
+            models.Index(fields=['-years_experience'], name='experts_listing_exp_idx'),
+            models.Index(fields=['-profile_created_at'], name='experts_listing_recent_idx'),
+            models.Index(fields=['next_available_slot'], name='experts_listing_slot_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.full_name} - Listing'
+
+    @property
+    def is_verified(self):
+        # Only vetted and active experts are ever projected into listings.
+        return True
+
+
+class ExpertAggregates(models.Model):
+    """Running totals behind the rating, response-time and consultation
+    figures shown on ``ExpertProfile``.
+
+    Maintained incrementally by ``experts.aggregates`` as bookings and
+    reviews change; ``recompute_expert_aggregates`` rebuilds them.
+    """
+    expert = models.OneToOneField(
+        ExpertProfile,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='aggregates'
+    )
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    response_window = models.JSONField(
+        default=list, blank=True,
+        help_text='[booking created_at, response seconds] for the most recent responded bookings'
+    )
+    completed_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'experts_aggregates'
+
+    def __str__(self):
+        return f'{self.expert} - Aggregates'
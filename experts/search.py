@@ -0,0 +1,182 @@
+"""
+Full-text search service for expert discovery.
+
+Every expert profile has an ``ExpertSearchDocument`` holding the flattened
+text that clients search over. The database backend decides how that
+document is indexed:
+
+- PostgreSQL: a generated, weighted ``tsvector`` column with a GIN index.
+- SQLite: an FTS5 virtual table kept in sync by triggers.
+- Anything else: a plain ``icontains`` scan of the document table.
+
+Views should only ever call ``search_experts``.
+"""
+import re
+
+from django.db import connection
+from django.db.models import F, FloatField, IntegerField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Round
+from django.utils import timezone
+
+from .models import ExpertProfile, ExpertSearchDocument
+
+SEARCH_TABLE = 'experts_search_document'
+FTS_TABLE = 'experts_search_fts'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+# search_rank is scaled by this and rounded to give an exact integer sort key.
+RANK_SCALE = 10000
+
+
+def build_document(profile):
+    """Return the searchable fields for an expert profile."""
+    body = '\n'.join(filter(None, [profile.bio, profile.sector_expertise, profile.senior_roles]))
+    keywords = [tag.name for tag in profile.expertise_tags.all()]
+    keywords += [pub.title for pub in profile.publications.all()]
+    return {
+        'name': profile.user.full_name,
+        'headline': profile.headline,
+        'body': body,
+        'keywords': '\n'.join(keywords),
+    }
+
+
+def update_search_document(profile):
+    """Create or refresh the search document for a single expert."""
+    ExpertSearchDocument.objects.update_or_create(
+        expert=profile,
+        defaults=build_document(profile),
+    )
+
+
+def refresh_search_document(expert_id):
+    """Re-render an existing search document after a related row changed.
+
+    Only updates rows that already exist, so it is safe to call from delete
+    signals fired while the expert itself is being cascade-deleted.
+    """
+    profile = ExpertProfile.objects.select_related('user').filter(pk=expert_id).first()
+    if profile is None:
+        return
+    ExpertSearchDocument.objects.filter(expert_id=expert_id).update(
+        updated_at=timezone.now(),
+        **build_document(profile)
+    )
+
+
+def rebuild_search_index(batch_size=500):
+    """Rebuild every expert's search document. Returns the number indexed."""
+    profiles = ExpertProfile.objects.select_related('user').prefetch_related(
+        'expertise_tags', 'publications'
+    ).order_by('pk')
+    count = 0
+    for profile in profiles.iterator(chunk_size=batch_size):
+        update_search_document(profile)
+        count += 1
+    return count
+
+
+def outer_expert_column(queryset):
+    """Column of the outer query holding the expert id, for correlated subqueries."""
+    opts = queryset.model._meta
+    return f'{opts.db_table}.{opts.pk.column}'
+
+
+class BaseSearchBackend:
+    """Fallback backend: case-insensitive match against the document table."""
+
+    def search(self, queryset, query):
+        terms = TOKEN_RE.findall(query)
+        documents = ExpertSearchDocument.objects.all()
+        for term in terms:
+            documents = documents.filter(
+                Q(name__icontains=term) |
+                Q(headline__icontains=term) |
+                Q(body__icontains=term) |
+                Q(keywords__icontains=term)
+            )
+        return queryset.filter(pk__in=documents.values('expert_id')).annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """Ranked search over the GIN-indexed ``search_vector`` column."""
+
+    def search(self, queryset, query):
+        tsquery = "websearch_to_tsquery('english', %s)"
+        matches = RawSQL(
+            f'SELECT expert_id FROM {SEARCH_TABLE} WHERE search_vector @@ {tsquery}',
+            [query],
+        )
+        rank = RawSQL(
+            f'SELECT ts_rank(search_vector, {tsquery}) FROM {SEARCH_TABLE} '
+            f'WHERE expert_id = {outer_expert_column(queryset)}',
+            [query],
+            output_field=FloatField(),
+        )
+        return queryset.filter(pk__in=matches).annotate(search_rank=rank)
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """Ranked search over the FTS5 table used in development."""
+
+    # bm25 column weights: expert_id, name, headline, body, keywords
+    BM25_WEIGHTS = '0.0, 10.0, 5.0, 1.0, 3.0'
+
+    def search(self, queryset, query):
+        match = self.match_expression(query)
+        matches = RawSQL(
+            f'SELECT expert_id FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [match],
+        )
+        rank = RawSQL(
+            f'SELECT -bm25({FTS_TABLE}, {self.BM25_WEIGHTS}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND expert_id = {outer_expert_column(queryset)}',
+            [match],
+            output_field=FloatField(),
+        )
+        return queryset.filter(pk__in=matches).annotate(search_rank=rank)
+
+    @staticmethod
+    def match_expression(query):
+        """Quote each term so user input cannot inject FTS5 syntax; the last
+        term is a prefix match so results update as the user types."""
+        terms = [f'"{term}"' for term in TOKEN_RE.findall(query)]
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+
+BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+}
+
+
+def get_search_backend():
+    return BACKENDS.get(connection.vendor, BaseSearchBackend)()
+
+
+def search_experts(queryset, query):
+    """Filter a queryset keyed by expert to the experts matching ``query``.
+
+    Works on any model whose primary key is the expert profile id, i.e.
+    ``ExpertProfile`` itself or ``ExpertListing``. Results are annotated with
+    ``search_rank`` and ordered by ``search_score``, the rank scaled and
+    rounded to an integer, keeping the queryset's existing ordering as
+    tie-breakers. The float rank (``float4`` on PostgreSQL) does not survive
+    a round trip through a pagination cursor exactly, so it is never used as
+    a seek key.
+    """
+    query = (query or '').strip()
+    if not query:
+        return queryset
+    if not TOKEN_RE.search(query):
+        return queryset.none()
+    ordering = queryset.query.order_by or queryset.model._meta.ordering
+    results = get_search_backend().search(queryset, query)
+    results = results.annotate(
+        search_score=Cast(Round(F('search_rank') * RANK_SCALE), output_field=IntegerField())
+    )
+    return results.order_by('-search_score', *ordering)
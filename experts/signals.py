@@ -0,0 +1,167 @@
+"""
+Signal handlers keeping expert search documents, listing rows and
+aggregates in sync with their sources.
+"""
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .aggregates import COMPLETED_STATUS, record_completion, record_rating, record_response, refresh_response_window
+from .listings import refresh_expert_listing, refresh_next_available_slot, slot_became_available, sync_expert_listing
+from .models import ExpertProfile, ExpertiseTag, Publication
+from .search import refresh_search_document, update_search_document
+
+# The only User fields the search documents and listing rows copy.
+INDEXED_USER_FIELDS = {'first_name', 'last_name'}
+
+
+def reindex_expert(expert_id):
+    refresh_search_document(expert_id)
+    refresh_expert_listing(expert_id)
+
+
+@receiver(post_save, sender=ExpertProfile)
+def index_expert_profile(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    update_search_document(instance)
+    sync_expert_listing(instance)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def index_expert_name(sender, instance, raw=False, created=False, update_fields=None, **kwargs):
+    # Sign-ins save only last_login; skip saves that cannot change a name.
+    if raw or created or (update_fields is not None and not INDEXED_USER_FIELDS & update_fields):
+        return
+    for expert_id in ExpertProfile.objects.filter(user=instance).values_list('pk', flat=True):
+        reindex_expert(expert_id)
+
+
+@receiver(post_save, sender=Publication)
+@receiver(post_delete, sender=Publication)
+def index_expert_publications(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    refresh_search_document(instance.expert_id)
+
+
+@receiver(post_save, sender=ExpertiseTag)
+def index_renamed_tag(sender, instance, raw=False, created=False, **kwargs):
+    if raw or created:
+        return
+    for expert_id in instance.experts.values_list('pk', flat=True):
+        reindex_expert(expert_id)
+
+
+@receiver(m2m_changed, sender=ExpertProfile.expertise_tags.through)
+def index_expert_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            reindex_expert(instance.pk)
+        return
+
+    # Reverse side: ``instance`` is a tag and ``pk_set`` holds expert ids.
+    if action == 'pre_clear':
+        instance._search_cleared_experts = list(instance.experts.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        for expert_id in getattr(instance, '_search_cleared_experts', []):
+            reindex_expert(expert_id)
+    elif action in ('post_add', 'post_remove'):
+        for expert_id in pk_set or ():
+            reindex_expert(expert_id)
+
+
+def rating_contribution(review):
+    return (review.rating, 1) if review.is_public else (0, 0)
+
+
+def reviewed_expert_id(review):
+    return ExpertProfile.objects.filter(user_id=review.reviewee_id).values_list('pk', flat=True).first()
+
+
+@receiver(pre_save, sender='consultations.Review')
+def remember_review_rating(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        return
+    previous = sender.objects.filter(pk=instance.pk).values_list('rating', 'is_public').first()
+    instance._previous_rating = (previous[0], 1) if previous and previous[1] else (0, 0)
+
+
+@receiver(post_save, sender='consultations.Review')
+def aggregate_review(sender, instance, raw=False, created=False, **kwargs):
+    if raw:
+        return
+    expert_id = reviewed_expert_id(instance)
+    if not expert_id:
+        return
+    previous_sum, previous_count = (0, 0) if created else getattr(instance, '_previous_rating', (0, 0))
+    rating_sum, rating_count = rating_contribution(instance)
+    if (rating_sum, rating_count) != (previous_sum, previous_count):
+        record_rating(expert_id, rating_sum - previous_sum, rating_count - previous_count)
+    refresh_expert_listing(expert_id)
+
+
+@receiver(post_delete, sender='consultations.Review')
+def unaggregate_review(sender, instance, **kwargs):
+    expert_id = reviewed_expert_id(instance)
+    if not expert_id:
+        return
+    rating_sum, rating_count = rating_contribution(instance)
+    if rating_count:
+        record_rating(expert_id, -rating_sum, -rating_count, create=False)
+    refresh_expert_listing(expert_id)
+
+
+@receiver(pre_save, sender='consultations.Booking')
+def remember_booking_state(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        return
+    instance._previous_state = sender.objects.filter(pk=instance.pk).values_list('responded_at', 'status').first()
+
+
+@receiver(post_save, sender='consultations.Booking')
+def aggregate_booking(sender, instance, raw=False, created=False, **kwargs):
+    if raw:
+        return
+    previous_responded_at, previous_status = (None, None) if created else (
+        getattr(instance, '_previous_state', None) or (None, None)
+    )
+    if instance.responded_at != previous_responded_at:
+        if previous_responded_at is None:
+            record_response(instance.expert_id, instance.created_at, instance.responded_at)
+        else:
+            refresh_response_window(instance.expert_id)
+
+    was_completed = previous_status == COMPLETED_STATUS
+    is_completed = instance.status == COMPLETED_STATUS
+    if was_completed != is_completed:
+        record_completion(instance.expert_id, 1 if is_completed else -1)
+
+
+@receiver(post_delete, sender='consultations.Booking')
+def unaggregate_booking(sender, instance, **kwargs):
+    if instance.responded_at:
+        refresh_response_window(instance.expert_id)
+    if instance.status == COMPLETED_STATUS:
+        record_completion(instance.expert_id, -1, create=False)
+
+
+@receiver(post_save, sender='availability.TimeSlot')
+@receiver(post_delete, sender='availability.TimeSlot')
+def relist_expert_slots(sender, instance, raw=False, created=False, **kwargs):
+    if raw:
+        return
+    if created and instance.status == instance.Status.AVAILABLE:
+        slot_became_available(instance.expert_id, instance.start_datetime)
+    else:
+        refresh_next_available_slot(instance.expert_id)
+
+
+@receiver(post_save, sender='consultations.Booking')
+@receiver(post_delete, sender='consultations.Booking')
+def relist_booked_expert(sender, instance, raw=False, **kwargs):
+    # With the interval engine bookings are the only record of busy time.
+    from availability.engines import IntervalEngine, get_availability_engine
+    if raw or get_availability_engine().name != IntervalEngine.name:
+        return
+    refresh_next_available_slot(instance.expert_id)
@@ -1,3 +1,296 @@
+"""
+Tests for experts app.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import User
+from availability.models import TimeSlot
+from consultations.models import Booking, Review
+from core.pagination import CursorPaginator
+from experts.listings import filter_by_tags
+from experts.models import ExpertAggregates, ExpertListing, ExpertProfile, ExpertiseTag, ExpertSearchDocument, Publication
+from experts.search import search_experts
+
+
+def make_expert(email, first_name, last_name, **profile_fields):
+    user = User.objects.create_user(
+        email=email,
+        password='testpass123',
+        first_name=first_name,
+        last_name=last_name,
+        role=User.Role.EXPERT,
+        expert_status=User.ExpertStatusChoices.ACTIVE,
+    )
+    profile_fields.setdefault('verification_status', ExpertProfile.VerificationStatus.ACTIVE)
+    profile_fields.setdefault('is_publicly_listed', True)
+    return ExpertProfile.objects.create(user=user, **profile_fields)
+
+
+class ExpertSearchTests(TestCase):
+    def setUp(self):
+        self.ai_expert = make_expert(
+            'thabo@test.com', 'Thabo', 'Molefe',
+            headline='Machine learning researcher',
+            bio='Builds credit risk models for banks.',
+        )
+        self.finance_expert = make_expert(
+            'naledi@test.com', 'Naledi', 'Khumalo',
+            headline='Financial strategy consultant',
+            bio='Advises on mergers and acquisitions.',
+            sector_expertise='Banking',
+        )
+        self.profiles = ExpertProfile.objects.all()
+
+    def test_document_created_with_profile(self):
+        document = ExpertSearchDocument.objects.get(expert=self.ai_expert)
+        self.assertEqual(document.name, 'Thabo Molefe')
+        self.assertEqual(document.headline, 'Machine learning researcher')
+
+    def test_matches_name_headline_and_body(self):
+        self.assertEqual(list(search_experts(self.profiles, 'Khumalo')), [self.finance_expert])
+        self.assertEqual(list(search_experts(self.profiles, 'machine learning')), [self.ai_expert])
+        self.assertEqual(list(search_experts(self.profiles, 'mergers')), [self.finance_expert])
+
+    def test_prefix_match_on_last_term(self):
+        self.assertEqual(list(search_experts(self.profiles, 'strat')), [self.finance_expert])
+
+    def test_results_ranked_by_relevance(self):
+        # A headline match outranks a passing mention in the biography.
+        self.ai_expert.bio = 'Builds credit risk models and advises on data strategy.'
+        self.ai_expert.save()
+        results = list(search_experts(self.profiles, 'strategy'))
+        self.assertEqual(results, [self.finance_expert, self.ai_expert])
+
+    def test_ranked_results_page_with_cursors(self):
+        make_expert('sipho@test.com', 'Sipho', 'Dube', headline='Strategy adviser')
+        expected = list(search_experts(self.profiles, 'strategy'))
+        paginator = CursorPaginator(search_experts(self.profiles, 'strategy'), 1)
+        seen, cursor = [], None
+        while True:
+            page = paginator.get_page(cursor)
+            seen += list(page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, expected)
+        self.assertEqual(paginator.keys[0], ('search_score', True))
+
+    def test_tags_and_publications_are_indexed(self):
+        tag = ExpertiseTag.objects.create(name='Epidemiology', slug='epidemiology')
+        self.ai_expert.expertise_tags.add(tag)
+        Publication.objects.create(expert=self.finance_expert, title='Liquidity under stress')
+
+        self.assertEqual(list(search_experts(self.profiles, 'epidemiology')), [self.ai_expert])
+        self.assertEqual(list(search_experts(self.profiles, 'liquidity')), [self.finance_expert])
+
+        self.ai_expert.expertise_tags.remove(tag)
+        self.assertEqual(list(search_experts(self.profiles, 'epidemiology')), [])
+
+    def test_user_rename_updates_document(self):
+        user = self.ai_expert.user
+        user.last_name = 'Nkosi'
+        user.save()
+        self.assertEqual(list(search_experts(self.profiles, 'Nkosi')), [self.ai_expert])
+
+    def test_sign_in_does_not_reindex(self):
+        with mock.patch('experts.signals.reindex_expert') as reindex:
+            self.assertTrue(self.client.login(email='thabo@test.com', password='testpass123'))
+            self.ai_expert.user.save(update_fields=['first_name'])
+        reindex.assert_called_once_with(self.ai_expert.pk)
+
+    def test_fts_syntax_in_query_is_escaped(self):
+        self.assertEqual(list(search_experts(self.profiles, '"Thabo" (')), [self.ai_expert])
+        self.assertEqual(list(search_experts(self.profiles, '***')), [])
+
+    def test_deleting_expert_removes_document(self):
+        Publication.objects.create(expert=self.ai_expert, title='Deep credit scoring')
+        self.ai_expert.delete()
+        self.assertFalse(ExpertSearchDocument.objects.filter(pk=self.ai_expert.pk).exists())
+        self.assertEqual(list(search_experts(ExpertProfile.objects.all(), 'Thabo')), [])
+
+    def test_catalogue_search_view(self):
+        staff = User.objects.create_user(
+            email='ops@test.com', password='testpass123', first_name='Ops', last_name='Admin',
+            role=User.Role.ADMIN, is_staff=True,
+        )
+        self.client.force_login(staff)
+        response = self.client.get('/experts/catalogue/', {'search': 'mergers'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([listing.pk for listing in response.context['experts']], [self.finance_expert.pk])
+
+
+class ExpertListingTests(TestCase):
+    def setUp(self):
+        self.expert = make_expert(
+            'zanele@test.com', 'Zanele', 'Dlamini',
+            headline='Digital transformation lead',
+            years_experience=12,
+        )
+        self.tag = ExpertiseTag.objects.create(name='Technology', slug='technology')
+        self.expert.expertise_tags.add(self.tag)
+
+    def test_listable_expert_is_projected(self):
+        listing = ExpertListing.objects.get(expert=self.expert)
+        self.assertEqual(listing.full_name, 'Zanele Dlamini')
+        self.assertEqual(listing.tag_names, ['Technology'])
+        self.assertEqual(listing.years_experience, 12)
+        self.assertEqual(list(filter_by_tags(ExpertListing.objects.all(), ['technology'])), [listing])
+        self.assertEqual(list(filter_by_tags(ExpertListing.objects.all(), ['tech'])), [])
+
+    def test_private_or_unlisted_experts_are_removed(self):
+        self.expert.privacy_level = ExpertProfile.PrivacyLevel.PRIVATE
+        self.expert.save()
+        self.assertFalse(ExpertListing.objects.filter(expert=self.expert).exists())
+
+        self.expert.privacy_level = ExpertProfile.PrivacyLevel.PUBLIC
+        self.expert.save()
+        self.assertTrue(ExpertListing.objects.filter(expert=self.expert).exists())
+
+        self.expert.verification_status = ExpertProfile.VerificationStatus.APPLIED
+        self.expert.save()
+        self.assertFalse(ExpertListing.objects.filter(expert=self.expert).exists())
+
+    def test_tag_removal_updates_listing(self):
+        self.expert.expertise_tags.remove(self.tag)
+        self.assertEqual(ExpertListing.objects.get(expert=self.expert).tag_names, [])
+
+    def test_next_available_slot_tracks_time_slots(self):
+        start = timezone.now() + timedelta(days=2)
+        later = TimeSlot.objects.create(
+            expert=self.expert, start_datetime=start, end_datetime=start + timedelta(minutes=30)
+        )
+        earlier = TimeSlot.objects.create(
+            expert=self.expert, start_datetime=start - timedelta(days=1),
+            end_datetime=start - timedelta(days=1) + timedelta(minutes=30)
+        )
+        self.assertEqual(ExpertListing.objects.get(expert=self.expert).next_available_slot, earlier.start_datetime)
+
+        earlier.status = TimeSlot.Status.BOOKED
+        earlier.save()
+        self.assertEqual(ExpertListing.objects.get(expert=self.expert).next_available_slot, later.start_datetime)
+
+        later.delete()
+        self.assertIsNone(ExpertListing.objects.get(expert=self.expert).next_available_slot)
+
+    def test_review_refreshes_rating(self):
+        client = User.objects.create_user(
+            email='client@test.com', password='testpass123', first_name='C', last_name='L',
+        )
+        booking = Booking.objects.create(client=client, expert=self.expert, problem_statement='Help')
+        ExpertProfile.objects.filter(pk=self.expert.pk).update(average_rating=4, total_reviews=1)
+        Review.objects.create(booking=booking, reviewer=client, reviewee=self.expert.user, rating=4)
+        listing = ExpertListing.objects.get(expert=self.expert)
+        self.assertEqual(listing.average_rating, 4)
+        self.assertEqual(listing.total_reviews, 1)
+
+    def test_deleting_expert_with_bookings(self):
+        client = User.objects.create_user(
+            email='client@test.com', password='testpass123', first_name='C', last_name='L',
+        )
+        booking = Booking.objects.create(client=client, expert=self.expert, problem_statement='Help')
+        Review.objects.create(booking=booking, reviewer=client, reviewee=self.expert.user, rating=5)
+        self.expert.delete()
+        self.assertFalse(ExpertListing.objects.exists())
+
+
+class ExpertAggregatesTests(TestCase):
+    def setUp(self):
+        self.expert = make_expert('sipho@test.com', 'Sipho', 'Ndlovu')
+        self.client_user = User.objects.create_user(
+            email='client@test.com', password='testpass123', first_name='C', last_name='L',
+        )
+
+    def booking(self, **fields):
+        return Booking.objects.create(client=self.client_user, expert=self.expert, problem_statement='Help', **fields)
+
+    def profile(self):
+        return ExpertProfile.objects.get(pk=self.expert.pk)
+
+    def test_ratings_are_maintained_incrementally(self):
+        first = Review.objects.create(booking=self.booking(), reviewer=self.client_user, reviewee=self.expert.user, rating=5)
+        second = Review.objects.create(booking=self.booking(), reviewer=self.client_user, reviewee=self.expert.user, rating=2)
+        self.assertEqual((self.profile().average_rating, self.profile().total_reviews), (Decimal('3.50'), 2))
+
+        second.is_public = False
+        second.save()
+        self.assertEqual((self.profile().average_rating, self.profile().total_reviews), (Decimal('5.00'), 1))
+        self.assertEqual(ExpertListing.objects.get(expert=self.expert).average_rating, Decimal('5.00'))
+
+        first.delete()
+        self.assertEqual((self.profile().average_rating, self.profile().total_reviews), (Decimal('0.00'), 0))
+
+    def test_response_window_and_completions(self):
+        base = timezone.now() - timedelta(days=30)
+        for hours in range(1, 13):
+            booking = self.booking()
+            Booking.objects.filter(pk=booking.pk).update(created_at=base + timedelta(days=hours))
+            booking.refresh_from_db()
+            booking.responded_at = booking.created_at + timedelta(hours=hours)
+            booking.status = 'completed'
+            booking.save()
+
+        # Only the ten most recent bookings (3..12 hours) count.
+        profile = self.profile()
+        self.assertEqual(profile.average_response_hours, Decimal('7.5'))
+        self.assertEqual(profile.total_consultations, 12)
+        with self.assertNumQueries(0):
+            self.assertEqual(profile.calculate_average_response_time(), Decimal('7.5'))
+
+        Booking.objects.filter(expert=self.expert).order_by('-created_at').first().delete()
+        self.assertEqual(self.profile().average_response_hours, Decimal('6.5'))
+        self.assertEqual(self.profile().total_consultations, 11)
+
+    def test_recompute_repairs_drift(self):
+        Review.objects.create(booking=self.booking(), reviewer=self.client_user, reviewee=self.expert.user, rating=4)
+        ExpertProfile.objects.filter(pk=self.expert.pk).update(average_rating=1, total_reviews=9)
+        ExpertAggregates.objects.filter(expert=self.expert).delete()
+
+        out = StringIO()
+        call_command('recompute_expert_aggregates', stdout=out)
+        self.assertIn('1 had drifted', out.getvalue())
+        self.assertEqual((self.profile().average_rating, self.profile().total_reviews), (Decimal('4.00'), 1))
+        self.assertEqual(ExpertAggregates.objects.get(expert=self.expert).rating_sum, 4)
+
+        out = StringIO()
+        call_command('recompute_expert_aggregates', stdout=out)
+        self.assertIn('0 had drifted', out.getvalue())
+
+
+class ProfileCompletenessTests(TestCase):
+    def setUp(self):
+        self.expert = make_expert('complete@example.com', 'Cora', 'Complete', headline='Hydrologist', bio='Rivers.')
+        self.expert.expertise_tags.add(ExpertiseTag.objects.create(name='Hydrology', slug='hydrology'))
+        Publication.objects.create(expert=self.expert, title='Flood plains')
+
+    def test_annotated_profiles_need_no_further_queries(self):
+        make_expert('empty@example.com', 'Eve', 'Empty')
+        with self.assertNumQueries(1):
+            profiles = {p.user.email: p for p in ExpertProfile.objects.with_completeness().select_related('user')}
+            complete = profiles['complete@example.com']
+            empty = profiles['empty@example.com']
+            self.assertEqual(complete.profile_completeness, 40)
+            self.assertEqual(empty.profile_completeness, 0)
+            self.assertEqual(len(empty.missing_sections), 10)
+
+        self.assertEqual(complete.missing_sections, [
+            'Upload a professional photo',
+            'Add your current affiliation',
+            'Specify your location',
+            'Specify your years of experience',
+            'Upload verification documents',
+            'Specify languages you speak',
+        ])
+        self.assertEqual(complete.completeness_mask, 0b0010100011)
 
-# Create your tests here.
+    def test_unannotated_profile_checks_relations_once(self):
+        profile = ExpertProfile.objects.get(pk=self.expert.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(profile.profile_completeness, 40)
+            self.assertEqual(len(profile.missing_sections), 6)
@@ -1,17 +1,22 @@
 """
 Views for expert profile management and directory.
 """
+from datetime import timedelta
+
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-from django.db.models import Q, Avg
+from django.db.models import Avg
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils import timezone
 
 from accounts.decorators import verified_client_required
+from core.pagination import CursorPaginator
+from accounts.audit import log_event
 from accounts.models import AuditLog, User
 from consultations.models import Booking
-from .models import ExpertProfile, ExpertiseTag, Publication, Patent, NotableProject, VerificationDocument
+from .listings import filter_by_tags
+from .models import ExpertProfile, ExpertListing, ExpertiseTag, Publication, Patent, NotableProject, VerificationDocument
+from .search import search_experts
 from .forms import (
     ExpertProfileBasicForm, ExpertProfileAvatarForm, ExpertProfileExpertiseForm,
     ExpertProfileExperienceForm, PublicationForm, PatentForm, NotableProjectForm, VerificationDocumentForm
@@ -41,29 +46,19 @@ def expert_catalogue(request):
         messages.warning(request, 'Please sign in to browse the expert catalogue.')
         return redirect('accounts:login')
     
-    # Build expert list
-    experts = ExpertProfile.objects.filter(
-        verification_status__in=['vetted', 'active'],
-        is_publicly_listed=True,
-        privacy_level__in=['public', 'semi_private']
-    ).select_related('user').prefetch_related('expertise_tags').order_by('-average_rating', '-total_reviews')
+    # Build expert list from the precomputed listing rows
+    experts = ExpertListing.objects.order_by('-average_rating', '-total_reviews')
     
     search = request.GET.get('search', '')
     if search:
-        experts = experts.filter(
-            Q(user__first_name__icontains=search) |
-            Q(user__last_name__icontains=search) |
-            Q(headline__icontains=search) |
-            Q(bio__icontains=search)
-        )
+        experts = search_experts(experts, search)
     
     expertise = request.GET.getlist('expertise')
     if expertise:
-        experts = experts.filter(expertise_tags__slug__in=expertise).distinct()
+        experts = filter_by_tags(experts, expertise)
     
-    paginator = Paginator(experts, 12)
-    page = request.GET.get('page')
-    experts = paginator.get_page(page)
+    paginator = CursorPaginator(experts, 12)
+    experts = paginator.get_page(request.GET.get('cursor'))
     
     discipline_tags = ExpertiseTag.objects.filter(tag_type='discipline')
     
@@ -85,10 +80,7 @@ def expert_directory(request):
     - semi_private: Visible to verified clients, admins, ops
     - private: Never shown in directory (matched by admin only)
     """
-    base_query = ExpertProfile.objects.filter(
-        verification_status__in=['vetted', 'active'],
-        is_publicly_listed=True,
-    ).select_related('user').prefetch_related('expertise_tags')
+    base_query = ExpertListing.objects.all()
     
     is_verified_client = (
         request.user.is_authenticated and 
@@ -108,28 +100,22 @@ def expert_directory(request):
     else:
         experts = base_query.filter(privacy_level='public')
     
-    search = request.GET.get('search', '')
-    if search:
-        experts = experts.filter(
-            Q(user__first_name__icontains=search) |
-            Q(user__last_name__icontains=search) |
-            Q(headline__icontains=search) |
-            Q(bio__icontains=search)
-        )
-    
-    expertise = request.GET.getlist('expertise')
-    if expertise:
-        experts = experts.filter(expertise_tags__slug__in=expertise).distinct()
-    
     sort = request.GET.get('sort', 'rating')
     if sort == 'experience_high':
         experts = experts.order_by('-years_experience')
     else:
         experts = experts.order_by('-average_rating', '-total_reviews')
     
-    paginator = Paginator(experts, 12)
-    page = request.GET.get('page')
-    experts = paginator.get_page(page)
+    search = request.GET.get('search', '')
+    if search:
+        experts = search_experts(experts, search)
+    
+    expertise = request.GET.getlist('expertise')
+    if expertise:
+        experts = filter_by_tags(experts, expertise)
+    
+    paginator = CursorPaginator(experts, 12)
+    experts = paginator.get_page(request.GET.get('cursor'))
     
     discipline_tags = ExpertiseTag.objects.filter(tag_type='discipline')
     
@@ -151,11 +137,10 @@ def join_as_expert(request):
         form = ExpertApplicationForm(request.POST, request.FILES)
         if form.is_valid():
             application = form.save()
-            AuditLog.objects.create(
-                user=request.user if request.user.is_authenticated else None,
+            log_event(
+                request,
                 event_type=AuditLog.EventType.ADMIN_ACTION,
                 description=f'Expert application submitted: {application.full_name} ({application.email})',
-                ip_address=request.META.get('REMOTE_ADDR'),
                 metadata={
                     'application_id': str(application.id),
                     'expertise_areas': application.expertise_areas,
@@ -174,45 +159,32 @@ def join_as_expert(request):
 @verified_client_required
 def careers(request):
     """Careers page with skill/expertise-based search - requires verified client status."""
-    experts = ExpertProfile.objects.filter(
-        verification_status__in=['vetted', 'active'],
-        is_publicly_listed=True,
-        privacy_level__in=['public', 'semi_private']
-    ).select_related('user')
+    experts = ExpertListing.objects.all()
+    
+    sort = request.GET.get('sort', 'rating')
+    if sort == 'reviews':
+        experts = experts.order_by('-total_reviews', '-average_rating')
+    elif sort == 'recent':
+        experts = experts.order_by('-profile_created_at')
+    else:
+        experts = experts.order_by('-average_rating', '-total_reviews')
     
     skills = request.GET.get('skills', '')
     if skills:
-        experts = experts.filter(
-            Q(headline__icontains=skills) |
-            Q(bio__icontains=skills)
-        )
+        experts = search_experts(experts, skills)
     
     expertise = request.GET.getlist('expertise')
     if expertise:
-        experts = experts.filter(expertise_tags__slug__in=expertise).distinct()
+        experts = filter_by_tags(experts, expertise)
     
     availability = request.GET.get('availability', '')
     if availability == 'project_work':
         experts = experts.filter(project_work_available=True)
     elif availability == 'available_now':
-        from availability.models import TimeSlot
-        available_expert_ids = TimeSlot.objects.filter(
-            status='available',
-            start_datetime__gte=timezone.now()
-        ).values_list('expert_id', flat=True).distinct()
-        experts = experts.filter(pk__in=available_expert_ids)
-    
-    sort = request.GET.get('sort', 'rating')
-    if sort == 'reviews':
-        experts = experts.order_by('-total_reviews', '-average_rating')
-    elif sort == 'recent':
-        experts = experts.order_by('-created_at')
-    else:
-        experts = experts.order_by('-average_rating', '-total_reviews')
+        experts = experts.filter(next_available_slot__gte=timezone.now())
     
-    paginator = Paginator(experts, 12)
-    page = request.GET.get('page')
-    experts = paginator.get_page(page)
+    paginator = CursorPaginator(experts, 12)
+    experts = paginator.get_page(request.GET.get('cursor'))
     
     discipline_tags = ExpertiseTag.objects.filter(tag_type='discipline')
     
@@ -260,12 +232,9 @@ def expert_profile(request, pk):
         review__is_public=True
     ).select_related('review', 'client')[:10]
     
-    from availability.models import TimeSlot
-    next_slots = TimeSlot.objects.filter(
-        expert=expert,
-        status='available',
-        start_datetime__gte=timezone.now()
-    ).order_by('start_datetime')[:5]
+    from availability.engines import get_availability_engine
+    now = timezone.now()
+    next_slots = get_availability_engine().available_slots(expert.pk, now, now + timedelta(days=7), 30)[:5]
     
     avg_response_time = expert.calculate_average_response_time()
     
@@ -283,9 +252,8 @@ def dashboard(request):
     if not request.user.is_expert:
         return redirect('accounts:dashboard')
     
-    try:
-        profile = request.user.expert_profile
-    except ExpertProfile.DoesNotExist:
+    profile = ExpertProfile.objects.with_completeness().filter(user=request.user).first()
+    if profile is None:
         profile = ExpertProfile.objects.create(user=request.user)
     
     pending_requests = Booking.objects.filter(
@@ -359,11 +327,10 @@ def profile_wizard(request):
             doc = form.save(commit=False)
             doc.expert = profile
             doc.save()
-            AuditLog.objects.create(
-                user=request.user,
+            log_event(
+                request,
                 event_type=AuditLog.EventType.FILE_UPLOADED,
-                description=f'Verification document uploaded: {doc.get_document_type_display()}',
-                ip_address=request.META.get('REMOTE_ADDR')
+                description=f'Verification document uploaded: {doc.get_document_type_display()}'
             )
             return redirect('experts:profile_wizard') + '?step=6'
         template = 'experts/wizard/step5_verification.html'
@@ -371,11 +338,10 @@ def profile_wizard(request):
         if profile.verification_status == 'applied':
             profile.verification_submitted_at = timezone.now()
             profile.save()
-            AuditLog.objects.create(
-                user=request.user,
+            log_event(
+                request,
                 event_type=AuditLog.EventType.VERIFICATION_STATUS_CHANGED,
-                description='Profile submitted for vetting',
-                ip_address=request.META.get('REMOTE_ADDR')
+                description='Profile submitted for vetting'
             )
             messages.success(request, 'Your profile has been submitted for review. Our team will vet your application shortly.')
         return redirect('experts:dashboard')
@@ -394,7 +360,7 @@ def edit_profile(request):
     if not request.user.is_expert:
         return redirect('accounts:dashboard')
     
-    profile = get_object_or_404(ExpertProfile, user=request.user)
+    profile = get_object_or_404(ExpertProfile.objects.with_completeness(), user=request.user)
     
     if request.method == 'POST':
         basic_form = ExpertProfileBasicForm(request.POST, instance=profile)
@@ -407,11 +373,10 @@ def edit_profile(request):
             avatar_form.save()  # Handles both avatar and cv_file
             expertise_form.save()
             experience_form.save()
-            AuditLog.objects.create(
-                user=request.user,
+            log_event(
+                request,
                 event_type=AuditLog.EventType.PROFILE_UPDATED,
-                description='Expert profile updated',
-                ip_address=request.META.get('REMOTE_ADDR')
+                description='Expert profile updated'
             )
             messages.success(request, 'Your profile has been updated.')
             return redirect('experts:dashboard')
@@ -0,0 +1,66 @@
+"""
+Cache configuration from URLs.
+
+``CACHE_URL`` selects the shared backend for every alias:
+
+- ``redis://host:6379/0`` or ``rediss://...`` (Redis)
+- ``memcache://host:11211`` or ``pymemcache://...`` (pymemcache), ``pylibmc://...``;
+  several hosts may be comma-separated
+- ``file:///var/tmp/kairos-cache`` (file-based, one directory per alias)
+- ``locmem://`` (per-process memory; the default, so dev and CI need no services)
+- ``dummy://`` (no caching)
+
+Query parameters ``key_prefix``, ``version`` and ``timeout`` are applied to
+the alias. ``CACHE_URL_<ALIAS>`` (e.g. ``CACHE_URL_SESSIONS``) overrides
+the backend for a single alias.
+"""
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.exceptions import ImproperlyConfigured
+
+BACKENDS = {
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'rediss': 'django.core.cache.backends.redis.RedisCache',
+    'memcache': 'django.core.cache.backends.memcached.PyMemcacheCache',
+    'pymemcache': 'django.core.cache.backends.memcached.PyMemcacheCache',
+    'pylibmc': 'django.core.cache.backends.memcached.PyLibMCCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'dummy': 'django.core.cache.backends.dummy.DummyCache',
+}
+CACHE_ALIASES = ['default', 'listings', 'sessions']
+
+
+def cache_config(url, alias='default', key_prefix='kairos', version=1, timeout=300):
+    """Build one ``CACHES`` entry from ``url`` for ``alias``."""
+    parts = urlsplit(url)
+    if parts.scheme not in BACKENDS:
+        raise ImproperlyConfigured(
+            f'Unsupported cache URL scheme {parts.scheme!r}; use one of {", ".join(BACKENDS)}.'
+        )
+    params = {name: values[-1] for name, values in parse_qs(parts.query).items()}
+    config = {
+        'BACKEND': BACKENDS[parts.scheme],
+        'KEY_PREFIX': f'{params.get("key_prefix", key_prefix)}:{alias}',
+        'VERSION': int(params.get('version', version)),
+        'TIMEOUT': int(params['timeout']) if 'timeout' in params else timeout,
+    }
+    if parts.scheme in ('redis', 'rediss'):
+        config['LOCATION'] = f'{parts.scheme}://{parts.netloc}{parts.path}'
+    elif parts.scheme in ('memcache', 'pymemcache', 'pylibmc'):
+        hosts = parts.netloc.split(',')
+        config['LOCATION'] = hosts if len(hosts) > 1 else hosts[0]
+    elif parts.scheme == 'file':
+        config['LOCATION'] = f'{parts.path.rstrip("/")}/{alias}'
+    elif parts.scheme == 'locmem':
+        config['LOCATION'] = f'kairos-{alias}'
+    return config
+
+
+def build_caches(environ, **defaults):
+    """``CACHES`` for every alias in ``CACHE_ALIASES`` from ``environ``."""
+    url = environ.get('CACHE_URL') or 'locmem://'
+    return {
+        alias: cache_config(environ.get(f'CACHE_URL_{alias.upper()}') or url, alias, **defaults)
+        for alias in CACHE_ALIASES
+    }
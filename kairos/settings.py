@@ -7,6 +7,8 @@ from pathlib import Path
 
 import environ
 
+from kairos.caches import build_caches
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 env = environ.Env(
@@ -81,6 +83,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'kairos.wsgi.application'
+ASGI_APPLICATION = 'kairos.asgi.application'
 
 DATABASE_URL = os.environ.get('DATABASE_URL', '')
 if DATABASE_URL:
@@ -158,6 +161,58 @@ DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024
 ALLOWED_UPLOAD_EXTENSIONS = ['.pdf', '.doc', '.docx', '.png', '.jpg', '.jpeg']
 MAX_UPLOAD_SIZE_MB = 10
 
+# 'slots' materialises 30-minute TimeSlot rows; 'intervals' computes free
+# time from availability blocks and bookings on the fly.
+AVAILABILITY_ENGINE = os.environ.get('AVAILABILITY_ENGINE', 'slots')
+
+# Unread messages are emailed as one digest per thread once the oldest has
+# waited this long (see the send_message_digests command).
+MESSAGE_DIGEST_WINDOW_MINUTES = int(os.environ.get('MESSAGE_DIGEST_WINDOW_MINUTES', 15))
+
+# Audit log buffering is opt-in. The default of 1 saves each event
+# immediately in the request's transaction. Larger values buffer committed
+# events (spooled to AUDIT_SPOOL_DIR first) and a background thread writes
+# them with one bulk insert once this many are pending or every
+# AUDIT_FLUSH_SECONDS.
+AUDIT_BUFFER_SIZE = int(os.environ.get('AUDIT_BUFFER_SIZE', 1))
+AUDIT_FLUSH_SECONDS = float(os.environ.get('AUDIT_FLUSH_SECONDS', 5))
+AUDIT_SPOOL_DIR = os.environ.get('AUDIT_SPOOL_DIR', str(BASE_DIR / 'var' / 'audit'))
+
+# archive_audit_log moves whole months older than this to gzipped JSONL
+# files in AUDIT_ARCHIVE_DIR and removes them from the database.
+AUDIT_LOG_RETENTION_DAYS = int(os.environ.get('AUDIT_LOG_RETENTION_DAYS', 730))
+AUDIT_ARCHIVE_DIR = os.environ.get('AUDIT_ARCHIVE_DIR', str(BASE_DIR / 'var' / 'audit-archive'))
+
+# Seconds the operations dashboard KPIs may be served from the cache before
+# the snapshot is recomputed; writes to the underlying tables invalidate it.
+DASHBOARD_METRICS_TTL = int(os.environ.get('DASHBOARD_METRICS_TTL', 60))
+
+# Session storage: 'db', 'cached_db' (reads from the sessions cache) or
+# 'cache' (cache only). Unchanged sessions are never re-saved; see
+# accounts/sessions.py.
+SESSION_ENGINE = 'accounts.sessions'
+SESSION_STORE = os.environ.get('SESSION_STORE', 'db')
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Seconds anonymous copies of the public pages and the home page fragments
+# stay in the listings cache (0 disables); content changes invalidate them.
+PAGE_CACHE_TTL = int(os.environ.get('PAGE_CACHE_TTL', 600))
+
+# Pub/sub that wakes long-polling requests and feeds the /events/ stream.
+# 'local' reaches waiters in the same process only; 'postgres' uses
+# LISTEN/NOTIFY on the default database to reach every process and node.
+PUBSUB_BROKER = os.environ.get('PUBSUB_BROKER', 'local')
+
+# Let open conversations long-poll for new messages. Only enable this when
+# the app is served over ASGI; under WSGI each waiting poll holds a worker,
+# so the page polls on an interval instead.
+MESSAGE_LONG_POLL = os.environ.get('MESSAGE_LONG_POLL', 'False').lower() in ('true', '1', 'yes')
+
+# Open the /events/ stream from the booking page and expert dashboard so they
+# update live. Only enable this when the app is served over ASGI; under WSGI
+# /events/ answers 204 and pages are left to manual reloads.
+LIVE_EVENTS = os.environ.get('LIVE_EVENTS', 'False').lower() in ('true', '1', 'yes')
+
 if not DEBUG:
     SECURE_BROWSER_XSS_FILTER = True
     SECURE_CONTENT_TYPE_NOSNIFF = True
@@ -168,11 +223,13 @@ if not DEBUG:
     SECURE_HSTS_INCLUDE_SUBDOMAINS = True
     SECURE_HSTS_PRELOAD = True
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
-}
+# Shared cache from CACHE_URL (redis://, memcache://, file://, locmem://); see
+# kairos/caches.py. Without it every alias falls back to per-process memory.
+CACHES = build_caches(
+    os.environ,
+    key_prefix=os.environ.get('CACHE_KEY_PREFIX', 'kairos'),
+    version=int(os.environ.get('CACHE_VERSION', 1)),
+)
 
 LOGGING = {
     'version': 1,
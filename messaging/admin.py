@@ -2,7 +2,7 @@
 Admin configuration for messaging app.
 """
 from django.contrib import admin
-from .models import MessageThread, Message
+from .models import MessageThread, Message, ThreadReadCursor
 
 
 @admin.register(MessageThread)
@@ -13,6 +13,11 @@ class MessageThreadAdmin(admin.ModelAdmin):
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
-    list_display = ['thread', 'sender', 'is_read', 'created_at']
-    list_filter = ['is_read']
+    list_display = ['thread', 'sender', 'created_at', 'notified_at']
     search_fields = ['sender__email', 'content']
+
+
+@admin.register(ThreadReadCursor)
+class ThreadReadCursorAdmin(admin.ModelAdmin):
+    list_display = ['thread', 'user', 'last_read_at']
+    search_fields = ['user__email']
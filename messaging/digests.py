@@ -0,0 +1,87 @@
+"""
+Message notification digests.
+
+Posting a message no longer emails the other party straight away. Unread
+messages are collected per recipient, and once the oldest has waited
+``MESSAGE_DIGEST_WINDOW_MINUTES`` they are sent as a single digest email
+per thread (or per recipient). Messages the recipient has read in the
+meantime are never mailed; each run stamps them ``notified_at`` as well, so
+the pending set only holds messages still waiting for a digest.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from core.outbox import queue_email
+
+from .models import Message, ThreadReadCursor
+
+PREVIEW_CHARS = 200
+
+
+def recipient_for(message):
+    booking = message.thread.booking
+    return booking.expert.user if message.sender_id == booking.client_id else booking.client
+
+
+def digest_body(recipient, messages):
+    lines = [f'Hi {recipient.first_name},', '', f'You have {len(messages)} unread message(s) on Kairos:', '']
+    for message in messages:
+        content = message.content if len(message.content) <= PREVIEW_CHARS else f'{message.content[:PREVIEW_CHARS]}...'
+        lines += [f'{message.sender.full_name} ({timezone.localtime(message.created_at):%d %b %H:%M}):', content, '']
+    lines.append('Log in to reply.')
+    return '\n'.join(lines)
+
+
+def send_message_digests(window=None, per_user=False, now=None):
+    """Queue digests for unread messages whose group has waited ``window``.
+
+    Groups are keyed by recipient and thread, or by recipient only when
+    ``per_user`` is set. Returns ``(digests, messages)`` queued.
+    """
+    now = now or timezone.now()
+    if window is None:
+        window = timedelta(minutes=settings.MESSAGE_DIGEST_WINDOW_MINUTES)
+    cutoff = now - window
+
+    with transaction.atomic():
+        # The recipient is the thread participant who is not the sender.
+        read_by_recipient = ThreadReadCursor.objects.filter(
+            thread=OuterRef('thread'), last_read_at__gte=OuterRef('created_at')
+        ).exclude(user=OuterRef('sender'))
+        pending = Message.objects.select_for_update(skip_locked=True, of=('self',)).filter(
+            notified_at__isnull=True, created_at__lte=now
+        ).exclude(Exists(read_by_recipient)).select_related(
+            'sender', 'thread__booking__client', 'thread__booking__expert__user'
+        ).order_by('created_at')
+
+        groups = defaultdict(list)
+        for message in pending:
+            recipient = recipient_for(message)
+            key = recipient.pk if per_user else (recipient.pk, message.thread_id)
+            groups[key].append((recipient, message))
+
+        notified = []
+        digests = 0
+        for entries in groups.values():
+            # Ordered by created_at, so the first entry is the oldest.
+            if entries[0][1].created_at > cutoff:
+                continue
+            recipient = entries[0][0]
+            messages = [message for _, message in entries]
+            queue_email(
+                subject=f'{len(messages)} new message(s) - Kairos',
+                message=digest_body(recipient, messages),
+                recipient_list=[recipient.email]
+            )
+            notified += [message.pk for message in messages]
+            digests += 1
+        Message.objects.filter(pk__in=notified).update(notified_at=now)
+        Message.objects.filter(notified_at__isnull=True, created_at__lte=now).filter(
+            Exists(read_by_recipient)
+        ).update(notified_at=now)
+    return digests, len(notified)
@@ -0,0 +1,43 @@
+"""
+Management command to email digests of unread messages.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from messaging.digests import send_message_digests
+
+
+class Command(BaseCommand):
+    help = 'Queues one email per thread (or per user) for unread messages that have waited the digest window'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--window',
+            type=int,
+            default=settings.MESSAGE_DIGEST_WINDOW_MINUTES,
+            help='Minutes the oldest unread message waits before its digest is sent',
+        )
+        parser.add_argument(
+            '--per-user',
+            action='store_true',
+            help='Send one digest per recipient covering all their threads',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep running, repeating every N seconds (0 runs once)',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            digests, messages = send_message_digests(
+                window=timedelta(minutes=options['window']), per_user=options['per_user']
+            )
+            self.stdout.write(self.style.SUCCESS(f'Queued {digests} digests covering {messages} messages.'))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
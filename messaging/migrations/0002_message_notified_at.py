@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_existing_notified(apps, schema_editor):
+    """Existing messages were already emailed one by one when posted."""
+    Message = apps.get_model('messaging', 'Message')
+    Message.objects.update(notified_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='notified_at',
+            field=models.DateTimeField(blank=True, help_text='When the recipient was emailed a digest including this message', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['is_read', 'notified_at', 'created_at'], name='messaging_digest_pending_idx'),
+        ),
+        migrations.RunPython(mark_existing_notified, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:42
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Substr
+
+
+def backfill_last_message(apps, schema_editor):
+    MessageThread = apps.get_model('messaging', 'MessageThread')
+    Message = apps.get_model('messaging', 'Message')
+    latest = Message.objects.filter(thread=OuterRef('pk')).order_by('-created_at')
+    MessageThread.objects.update(
+        last_message_at=Subquery(latest.values('created_at')[:1]),
+        last_message_preview=Coalesce(
+            Subquery(latest.annotate(preview=Substr('content', 1, 200)).values('preview')[:1]), Value('')
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0002_message_notified_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='messagethread',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='messagethread',
+            name='last_message_preview',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.RunPython(backfill_last_message, migrations.RunPython.noop),
+    ]
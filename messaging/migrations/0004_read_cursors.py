@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:45
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def cursors_from_read_flags(apps, schema_editor):
+    """Each participant has read up to the newest message from the other
+    party that was flagged as read."""
+    Message = apps.get_model('messaging', 'Message')
+    ThreadReadCursor = apps.get_model('messaging', 'ThreadReadCursor')
+    rows = Message.objects.filter(is_read=True).values(
+        'thread_id', 'sender_id', 'thread__booking__client_id', 'thread__booking__expert__user_id'
+    ).annotate(last_read_at=Max('created_at')).order_by()
+    cursors = {}
+    for row in rows:
+        if row['sender_id'] == row['thread__booking__client_id']:
+            reader = row['thread__booking__expert__user_id']
+        else:
+            reader = row['thread__booking__client_id']
+        key = (row['thread_id'], reader)
+        cursors[key] = max(cursors.get(key, row['last_read_at']), row['last_read_at'])
+    ThreadReadCursor.objects.bulk_create(
+        [ThreadReadCursor(thread_id=thread, user_id=user, last_read_at=at) for (thread, user), at in cursors.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0003_thread_last_message'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThreadReadCursor',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('last_read_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'messaging_read_cursor',
+            },
+        ),
+        migrations.AddField(
+            model_name='threadreadcursor',
+            name='thread',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_cursors', to='messaging.messagethread'),
+        ),
+        migrations.AddField(
+            model_name='threadreadcursor',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='thread_read_cursors', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='threadreadcursor',
+            constraint=models.UniqueConstraint(fields=('thread', 'user'), name='messaging_read_cursor_unique'),
+        ),
+        migrations.RunPython(cursors_from_read_flags, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='message',
+            name='messaging_digest_pending_idx',
+        ),
+        migrations.RemoveField(
+            model_name='message',
+            name='is_read',
+        ),
+        migrations.RemoveField(
+            model_name='message',
+            name='read_at',
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['thread', 'created_at'], name='messaging_thread_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['notified_at', 'created_at'], name='messaging_digest_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0004_read_cursors'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='message',
+            name='notified_at',
+            field=models.DateTimeField(blank=True, help_text='When the recipient was emailed a digest including this message, or when the digest run found it already read', null=True),
+        ),
+    ]
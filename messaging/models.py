@@ -2,16 +2,62 @@
 Messaging models for per-booking communication.
 """
 import uuid
+from datetime import datetime, timezone as dt_timezone
+
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.events import publish_to_users
+from core.pubsub import publish
+
+PREVIEW_LENGTH = 200
+NEVER_READ = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# bulk_create arguments that turn inserting a read cursor into an upsert.
+READ_CURSOR_UPSERT = {
+    'update_conflicts': True,
+    'unique_fields': ['thread', 'user'],
+    'update_fields': ['last_read_at', 'updated_at'],
+}
+
+
+def thread_channel(thread_id):
+    return f'thread:{thread_id}'
+
+
+class MessageThreadQuerySet(models.QuerySet):
+    def with_read_cursor(self, user):
+        """Annotate ``last_read_at``: when ``user`` last read the thread
+        (``None`` if never)."""
+        cursor = ThreadReadCursor.objects.filter(thread=OuterRef('pk'), user=user).values('last_read_at')[:1]
+        return self.annotate(last_read_at=Subquery(cursor))
+
+    def with_summary(self, user):
+        """Annotate ``last_read_at`` and ``unread_count``: messages from the
+        other participant posted after ``user``'s read cursor, counted on
+        the (thread, created_at) index. The last message snippet and time
+        are the denormalised ``last_message_*`` columns, so the inbox is
+        one query."""
+        unread = Message.objects.filter(
+            thread=OuterRef('pk'),
+            created_at__gt=Coalesce(OuterRef('last_read_at'), Value(NEVER_READ, output_field=models.DateTimeField())),
+        ).exclude(sender=user).order_by().values('thread').annotate(count=Count('pk')).values('count')
+        return self.with_read_cursor(user).annotate(unread_count=Coalesce(Subquery(unread), 0))
 
 
 class MessageThread(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     booking = models.OneToOneField('consultations.Booking', on_delete=models.CASCADE, related_name='message_thread')
+    last_message_at = models.DateTimeField(blank=True, null=True)
+    last_message_preview = models.CharField(max_length=PREVIEW_LENGTH, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = MessageThreadQuerySet.as_manager()
+
     class Meta:
         db_table = 'messaging_thread'
         ordering = ['-updated_at']
@@ -19,13 +65,16 @@ class MessageThread(models.Model):
     def __str__(self):
         return f'Thread for booking {self.booking_id}'
 
-    @property
-    def last_message(self):
-        return self.messages.order_by('-created_at').first()
+    def read_cursor(self, user, at=None):
+        return ThreadReadCursor(thread=self, user=user, last_read_at=at or self.last_message_at or timezone.now())
+
+    def mark_read(self, user, at=None):
+        """Move ``user``'s read cursor to ``at`` (default: the last
+        message) with a single upsert."""
+        ThreadReadCursor.objects.bulk_create([self.read_cursor(user, at)], **READ_CURSOR_UPSERT)
 
-    @property
-    def unread_count(self):
-        return self.messages.filter(is_read=False).count()
+    async def amark_read(self, user, at=None):
+        await ThreadReadCursor.objects.abulk_create([self.read_cursor(user, at)], **READ_CURSOR_UPSERT)
 
 
 class Message(models.Model):
@@ -33,17 +82,59 @@ class Message(models.Model):
     thread = models.ForeignKey(MessageThread, on_delete=models.CASCADE, related_name='messages')
     sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sent_messages')
     content = models.TextField()
-    is_read = models.BooleanField(default=False)
-    read_at = models.DateTimeField(blank=True, null=True)
+    notified_at = models.DateTimeField(blank=True, null=True, help_text='When the recipient was emailed a digest including this message, or when the digest run found it already read')
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = 'messaging_message'
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['thread', 'created_at'], name='messaging_thread_created_idx'),
+            models.Index(fields=['notified_at', 'created_at'], name='messaging_digest_pending_idx'),
+        ]
 
     def __str__(self):
         return f'Message from {self.sender} at {self.created_at}'
 
+    def save(self, *args, **kwargs):
+        created = self._state.adding
+        super().save(*args, **kwargs)
+        if created:
+            MessageThread.objects.filter(pk=self.thread_id).update(
+                last_message_at=self.created_at,
+                last_message_preview=self.content[:PREVIEW_LENGTH],
+                updated_at=timezone.now(),
+            )
+            message = {'type': 'message', 'thread': str(self.thread_id), 'message': str(self.pk)}
+            transaction.on_commit(lambda: publish(thread_channel(self.thread_id), message))
+            booking_id, client_id, expert_user_id = MessageThread.objects.filter(pk=self.thread_id).values_list(
+                'booking_id', 'booking__client_id', 'booking__expert__user_id'
+            ).get()
+            publish_to_users(
+                [user_id for user_id in (client_id, expert_user_id) if user_id != self.sender_id],
+                {**message, 'booking': str(booking_id)},
+            )
+
+
+class ThreadReadCursor(models.Model):
+    """How far a participant has read a thread. Messages from the other
+    participant created after ``last_read_at`` are unread."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    thread = models.ForeignKey(MessageThread, on_delete=models.CASCADE, related_name='read_cursors')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='thread_read_cursors')
+    last_read_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'messaging_read_cursor'
+        constraints = [
+            models.UniqueConstraint(fields=['thread', 'user'], name='messaging_read_cursor_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} read {self.thread_id} to {self.last_read_at}'
+
 
 class MessageAttachment(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -0,0 +1,107 @@
+"""
+Incremental message fetching for open conversations.
+
+The thread page asks for messages after the newest one it has shown
+(``?since=<message id or ISO timestamp>``) instead of reloading the whole
+history. Responses carry an ETag derived from the thread's
+``last_message_at``, so an unchanged poll is answered with 304. With
+``?wait=<seconds>`` the request is held until a new message arrives or the
+wait runs out: it sleeps on the thread's pub/sub channel (see
+``core.pubsub``) and only re-reads ``last_message_at`` when woken, or every
+``RECHECK_SECONDS`` for messages posted through another process.
+
+These helpers use the async ORM; they back the async views in
+``messaging.views``.
+"""
+import hashlib
+import time
+import uuid
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.pubsub import get_broker
+
+from .models import Message, MessageThread, thread_channel
+
+MAX_WAIT_SECONDS = 25
+RECHECK_SECONDS = 5
+MAX_BATCH = 200
+
+
+class SinceError(ValueError):
+    pass
+
+
+async def parse_since(thread, value):
+    """``(created_at, id)`` position of the ``since`` cursor in ``thread``:
+    a message id or an ISO timestamp. ``None`` means from the start."""
+    if not value:
+        return None
+    try:
+        message_id = uuid.UUID(value)
+    except ValueError:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise SinceError('since must be a message id or an ISO 8601 timestamp')
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment, None
+    position = await Message.objects.filter(thread=thread, pk=message_id).values_list('created_at', 'id').afirst()
+    if position is None:
+        raise SinceError('since does not identify a message in this thread')
+    return position
+
+
+async def messages_after(thread, position, limit=MAX_BATCH):
+    queryset = Message.objects.filter(thread=thread).select_related('sender').order_by('created_at', 'id')
+    if position is not None:
+        created_at, message_id = position
+        after = Q(created_at__gt=created_at)
+        if message_id is not None:
+            after |= Q(created_at=created_at, id__gt=message_id)
+        queryset = queryset.filter(after)
+    return [message async for message in queryset[:limit]]
+
+
+def has_news(last_message_at, position):
+    return last_message_at is not None and (position is None or last_message_at > position[0])
+
+
+def thread_etag(thread_id, last_message_at, since):
+    stamp = last_message_at.isoformat() if last_message_at else ''
+    return '"%s"' % hashlib.md5(f'{thread_id}:{stamp}:{since}'.encode()).hexdigest()
+
+
+async def last_message_at_for(thread_id):
+    return await MessageThread.objects.filter(pk=thread_id).values_list('last_message_at', flat=True).afirst()
+
+
+async def wait_for_news(thread_id, last_message_at, position, wait):
+    """Hold until the thread has a message after ``position`` or ``wait``
+    seconds pass. Returns the thread's ``last_message_at``."""
+    if has_news(last_message_at, position) or wait <= 0:
+        return last_message_at
+    deadline = time.monotonic() + wait
+    async with get_broker().subscribe(thread_channel(thread_id)) as subscription:
+        # Re-read once subscribed so a message committed in between is not missed.
+        last_message_at = await last_message_at_for(thread_id)
+        while not has_news(last_message_at, position):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await subscription.get(timeout=min(remaining, RECHECK_SECONDS))
+            last_message_at = await last_message_at_for(thread_id)
+    return last_message_at
+
+
+def serialize_message(message, viewer):
+    return {
+        'id': str(message.pk),
+        'sender_id': str(message.sender_id),
+        'sender_name': message.sender.first_name,
+        'content': message.content,
+        'created_at': message.created_at.isoformat(),
+        'is_own': message.sender_id == viewer.pk,
+    }
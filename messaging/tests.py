@@ -1,3 +1,195 @@
-from django.test import TestCase
+"""
+Tests for messaging app.
+"""
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from consultations.models import Booking
+from core.models import OutboundEmail
+from experts.tests import make_expert
+from messaging.digests import send_message_digests
+from messaging.models import Message, MessageThread, ThreadReadCursor
+
+
+class MessageDigestTests(TestCase):
+    def setUp(self):
+        self.expert = make_expert('expert@test.com', 'Ayanda', 'Expert')
+        self.client_user = User.objects.create_user(
+            email='client@test.com', password='testpass123', first_name='Carol', last_name='Client',
+        )
+        booking = Booking.objects.create(client=self.client_user, expert=self.expert, problem_statement='Help')
+        self.thread = MessageThread.objects.create(booking=booking)
+
+    def post(self, sender, content, minutes_ago):
+        message = Message.objects.create(thread=self.thread, sender=sender, content=content)
+        Message.objects.filter(pk=message.pk).update(created_at=timezone.now() - timedelta(minutes=minutes_ago))
+        return message
+
+    def test_posting_a_message_sends_nothing_immediately(self):
+        self.client.force_login(self.client_user)
+        self.client.post(f'/messaging/thread/{self.thread.pk}/', {'content': 'Hello'})
+        self.assertEqual(Message.objects.count(), 1)
+        self.assertFalse(OutboundEmail.objects.exists())
+
+    def test_unread_messages_are_coalesced_per_thread(self):
+        self.post(self.client_user, 'First', minutes_ago=20)
+        self.post(self.client_user, 'Second', minutes_ago=5)
+        self.post(self.expert.user, 'Already seen', minutes_ago=30)
+        self.thread.mark_read(self.client_user, at=timezone.now())
+
+        out = StringIO()
+        call_command('send_message_digests', '--window', '15', stdout=out)
+        self.assertIn('Queued 1 digests covering 2 messages', out.getvalue())
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.recipients, ['expert@test.com'])
+        self.assertIn('First', email.body)
+        self.assertIn('Second', email.body)
+        self.assertNotIn('Already seen', email.body)
+
+        # Nothing is sent twice.
+        self.assertEqual(send_message_digests(window=timedelta(minutes=15)), (0, 0))
+
+    def test_waits_for_the_window_and_skips_messages_read_meanwhile(self):
+        self.post(self.expert.user, 'Reply', minutes_ago=5)
+        self.assertEqual(send_message_digests(window=timedelta(minutes=15)), (0, 0))
+
+        self.thread.mark_read(self.client_user, at=timezone.now())
+        later = timezone.now() + timedelta(minutes=15)
+        self.assertEqual(send_message_digests(window=timedelta(minutes=15), now=later), (0, 0))
+        self.assertFalse(OutboundEmail.objects.exists())
+        # Read messages leave the pending set instead of being rescanned every run.
+        self.assertFalse(Message.objects.filter(notified_at__isnull=True).exists())
+
+
+class ThreadSummaryTests(TestCase):
+    def setUp(self):
+        self.expert = make_expert('expert@test.com', 'Ayanda', 'Expert')
+        self.client_user = User.objects.create_user(
+            email='client@test.com', password='testpass123', first_name='Carol', last_name='Client',
+        )
+        self.threads = [
+            MessageThread.objects.create(booking=Booking.objects.create(
+                client=self.client_user, expert=self.expert, problem_statement=f'Question {index}'
+            ))
+            for index in range(3)
+        ]
+
+    def test_posting_updates_last_message_columns(self):
+        Message.objects.create(thread=self.threads[0], sender=self.client_user, content='Hello there')
+        thread = MessageThread.objects.get(pk=self.threads[0].pk)
+        self.assertEqual(thread.last_message_preview, 'Hello there')
+        self.assertIsNotNone(thread.last_message_at)
+
+    def test_unread_count_excludes_own_messages(self):
+        thread = self.threads[0]
+        Message.objects.create(thread=thread, sender=self.client_user, content='Mine')
+        Message.objects.create(thread=thread, sender=self.expert.user, content='Theirs')
+        Message.objects.create(thread=thread, sender=self.expert.user, content='Theirs again')
+        summary = MessageThread.objects.with_summary(self.client_user).get(pk=thread.pk)
+        self.assertEqual(summary.unread_count, 2)
+        summary = MessageThread.objects.with_summary(self.expert.user).get(pk=thread.pk)
+        self.assertEqual(summary.unread_count, 1)
+
+    def test_inbox_query_count_is_constant(self):
+        for thread in self.threads:
+            Message.objects.create(thread=thread, sender=self.expert.user, content='Update')
+        self.client.force_login(self.client_user)
+        self.client.get('/messaging/')
+        with self.assertNumQueries(3):
+            response = self.client.get('/messaging/')
+        self.assertContains(response, 'Update', count=3)
+
+    def test_viewing_a_thread_moves_the_read_cursor(self):
+        thread = self.threads[0]
+        Message.objects.create(thread=thread, sender=self.expert.user, content='First')
+        Message.objects.create(thread=thread, sender=self.expert.user, content='Second')
+        self.client.force_login(self.client_user)
+        self.client.get(f'/messaging/thread/{thread.pk}/')
+        cursor = ThreadReadCursor.objects.get(thread=thread, user=self.client_user)
+        self.assertEqual(cursor.last_read_at, MessageThread.objects.get(pk=thread.pk).last_message_at)
+        self.assertEqual(MessageThread.objects.with_summary(self.client_user).get(pk=thread.pk).unread_count, 0)
+
+        Message.objects.create(thread=thread, sender=self.expert.user, content='Third')
+        self.assertEqual(MessageThread.objects.with_summary(self.client_user).get(pk=thread.pk).unread_count, 1)
+        self.client.get(f'/messaging/thread/{thread.pk}/')
+        self.assertEqual(MessageThread.objects.with_summary(self.client_user).get(pk=thread.pk).unread_count, 0)
+        self.assertEqual(ThreadReadCursor.objects.count(), 1)
+
+
+class ThreadPollingTests(TestCase):
+    def setUp(self):
+        self.expert = make_expert('expert@test.com', 'Ayanda', 'Expert')
+        self.client_user = User.objects.create_user(
+            email='client@test.com', password='testpass123', first_name='Carol', last_name='Client',
+        )
+        booking = Booking.objects.create(client=self.client_user, expert=self.expert, problem_statement='Help')
+        self.thread = MessageThread.objects.create(booking=booking)
+        self.url = f'/messaging/thread/{self.thread.pk}/messages/'
+        self.client.force_login(self.client_user)
+
+    def test_thread_page_long_polls_only_when_enabled(self):
+        page = f'/messaging/thread/{self.thread.pk}/'
+        self.assertEqual(self.client.get(page).context['poll_wait'], 0)
+        with override_settings(MESSAGE_LONG_POLL=True):
+            self.assertContains(self.client.get(page), 'data-wait="25"')
+
+    def test_returns_only_messages_after_the_cursor(self):
+        first = Message.objects.create(thread=self.thread, sender=self.expert.user, content='First')
+        Message.objects.create(thread=self.thread, sender=self.expert.user, content='Second')
+        data = self.client.get(self.url, {'since': str(first.pk)}).json()
+        self.assertEqual([message['content'] for message in data['messages']], ['Second'])
+        self.assertEqual(MessageThread.objects.with_summary(self.client_user).get(pk=self.thread.pk).unread_count, 0)
+
+    def test_unchanged_thread_returns_304(self):
+        message = Message.objects.create(thread=self.thread, sender=self.expert.user, content='Hello')
+        response = self.client.get(self.url, {'since': str(message.pk)})
+        self.assertEqual(response.json()['messages'], [])
+        response = self.client.get(
+            self.url, {'since': str(message.pk)}, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+
+        Message.objects.create(thread=self.thread, sender=self.expert.user, content='News')
+        response = self.client.get(self.url, {'since': str(message.pk)}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual([item['content'] for item in response.json()['messages']], ['News'])
+
+    def test_long_poll_wakes_when_a_message_arrives(self):
+        message = Message.objects.create(thread=self.thread, sender=self.expert.user, content='Hello')
+
+        async def arrives(subscription, timeout=None):
+            await Message.objects.acreate(thread=self.thread, sender=self.expert.user, content='Arrived')
+            return {'type': 'message'}
+
+        with mock.patch('core.pubsub.Subscription.get', arrives):
+            data = self.client.get(self.url, {'since': str(message.pk), 'wait': '10'}).json()
+        self.assertEqual([item['content'] for item in data['messages']], ['Arrived'])
+
+    def test_long_poll_times_out_with_304(self):
+        message = Message.objects.create(thread=self.thread, sender=self.expert.user, content='Hello')
+        etag = self.client.get(self.url, {'since': str(message.pk)})['ETag']
+        response = self.client.get(self.url, {'since': str(message.pk), 'wait': '0.1'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_sending_publishes_to_the_thread_channel(self):
+        with mock.patch('messaging.models.publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(f'/messaging/thread/{self.thread.pk}/send/', {'content': 'Quick one'})
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.json()['is_own'])
+        channel, payload = publish.call_args.args
+        self.assertEqual(channel, f'thread:{self.thread.pk}')
+        self.assertEqual(payload['message'], response.json()['id'])
+
+    def test_rejects_non_participants_and_bad_cursors(self):
+        outsider = User.objects.create_user(
+            email='outsider@test.com', password='testpass123', first_name='Olu', last_name='Outsider',
+        )
+        self.assertEqual(self.client.get(self.url, {'since': 'yesterday'}).status_code, 400)
+        self.client.force_login(outsider)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
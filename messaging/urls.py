@@ -9,4 +9,6 @@ app_name = 'messaging'
 urlpatterns = [
     path('', views.my_messages, name='my_messages'),
     path('thread/<uuid:pk>/', views.thread_detail, name='thread'),
+    path('thread/<uuid:pk>/messages/', views.thread_messages, name='thread_messages'),
+    path('thread/<uuid:pk>/send/', views.send_message, name='send_message'),
 ]
@@ -1,26 +1,33 @@
 """
 Views for messaging.
 """
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.mail import send_mail
-from django.conf import settings
-from django.http import HttpResponseForbidden
-from django.shortcuts import render, redirect, get_object_or_404
-from django.utils import timezone
+from django.http import HttpResponseForbidden, HttpResponseNotModified, JsonResponse
+from django.shortcuts import aget_object_or_404, render, redirect, get_object_or_404
+from django.views.decorators.http import require_POST
 
 from .models import MessageThread, Message
+from .polling import (
+    MAX_WAIT_SECONDS, SinceError, has_news, messages_after, parse_since, serialize_message, thread_etag,
+    wait_for_news,
+)
 
 
 @login_required
 def thread_detail(request, pk):
-    thread = get_object_or_404(MessageThread.objects.select_related('booking__client', 'booking__expert__user'), pk=pk)
+    thread = get_object_or_404(
+        MessageThread.objects.with_read_cursor(request.user).select_related('booking__client', 'booking__expert__user'),
+        pk=pk
+    )
     booking = thread.booking
     
     if not (request.user == booking.client or request.user == booking.expert.user):
         return HttpResponseForbidden()
     
-    thread.messages.exclude(sender=request.user).update(is_read=True, read_at=timezone.now())
+    if thread.last_message_at and (thread.last_read_at is None or thread.last_read_at < thread.last_message_at):
+        thread.mark_read(request.user)
     
     if request.method == 'POST':
         content = request.POST.get('content', '').strip()
@@ -30,20 +37,6 @@ def thread_detail(request, pk):
                 sender=request.user,
                 content=content
             )
-            thread.save()
-            
-            if request.user == booking.client:
-                recipient = booking.expert.user
-            else:
-                recipient = booking.client
-            
-            send_mail(
-                subject=f'New message - Kairos',
-                message=f'You have a new message from {request.user.full_name}:\n\n{content[:200]}...\n\nLog in to reply.',
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[recipient.email],
-                fail_silently=True
-            )
             
             messages.success(request, 'Message sent.')
         return redirect('messaging:thread', pk=pk)
@@ -54,6 +47,7 @@ def thread_detail(request, pk):
         'thread': thread,
         'booking': booking,
         'messages_list': thread_messages,
+        'poll_wait': MAX_WAIT_SECONDS if settings.MESSAGE_LONG_POLL else 0,
     }
     return render(request, 'messaging/thread.html', context)
 
@@ -71,6 +65,72 @@ def my_messages(request):
     else:
         bookings = Booking.objects.filter(client=request.user)
     
-    threads = MessageThread.objects.filter(booking__in=bookings).select_related('booking__client', 'booking__expert__user').order_by('-updated_at')
+    threads = MessageThread.objects.filter(booking__in=bookings).with_summary(request.user).select_related('booking__client', 'booking__expert__user').order_by('-updated_at')
     
     return render(request, 'messaging/my_messages.html', {'threads': threads})
+
+
+@login_required
+async def thread_messages(request, pk):
+    """Messages after ``?since=`` as JSON, for refreshing an open thread.
+
+    ``?wait=<seconds>`` (up to ``MAX_WAIT_SECONDS``) long-polls until a new
+    message arrives. An unchanged result is a 304 when the client sends the
+    previous ETag.
+    """
+    user = await request.auser()
+    thread = await aget_object_or_404(
+        MessageThread.objects.with_read_cursor(user).select_related('booking__expert'), pk=pk
+    )
+    booking = thread.booking
+    if user.pk not in (booking.client_id, booking.expert.user_id):
+        return HttpResponseForbidden()
+    
+    since = request.GET.get('since', '')
+    try:
+        position = await parse_since(thread, since)
+    except SinceError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    try:
+        wait = min(max(float(request.GET.get('wait', 0)), 0), MAX_WAIT_SECONDS)
+    except ValueError:
+        return JsonResponse({'error': 'wait must be a number of seconds'}, status=400)
+    
+    last_message_at = await wait_for_news(thread.pk, thread.last_message_at, position, wait)
+    etag = thread_etag(thread.pk, last_message_at, since)
+    news = has_news(last_message_at, position)
+    if not news and etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+    
+    new_messages = await messages_after(thread, position) if news else []
+    if new_messages and (thread.last_read_at is None or thread.last_read_at < new_messages[-1].created_at):
+        await thread.amark_read(user, at=new_messages[-1].created_at)
+    
+    response = JsonResponse({
+        'messages': [serialize_message(message, user) for message in new_messages],
+        'cursor': str(new_messages[-1].pk) if new_messages else since or None,
+    })
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required
+@require_POST
+async def send_message(request, pk):
+    """Post a message without reloading the thread page. Waiting
+    ``thread_messages`` requests are woken when it commits."""
+    user = await request.auser()
+    thread = await aget_object_or_404(MessageThread.objects.select_related('booking__expert'), pk=pk)
+    booking = thread.booking
+    if user.pk not in (booking.client_id, booking.expert.user_id):
+        return HttpResponseForbidden()
+    
+    content = request.POST.get('content', '').strip()
+    if not content:
+        return JsonResponse({'error': 'content is required'}, status=400)
+    message = await Message.objects.acreate(thread=thread, sender=user, content=content)
+    message.sender = user
+    return JsonResponse(serialize_message(message, user), status=201)
@@ -11,6 +11,7 @@ from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 
+from accounts.audit import log_event
 from accounts.models import AuditLog
 from consultations.models import Booking
 from .models import Payment, Invoice
@@ -91,8 +92,8 @@ def payment_success(request, booking_id):
                 booking.status = 'scheduled'
                 booking.save()
                 
-                AuditLog.objects.create(
-                    user=request.user,
+                log_event(
+                    request,
                     event_type=AuditLog.EventType.PAYMENT_RECEIVED,
                     description=f'Payment of {payment.amount} {payment.currency} received',
                     metadata={'booking_id': str(booking.id), 'payment_id': str(payment.id)}